@@ -0,0 +1,69 @@
+# agendador_prazos.py
+
+import asyncio
+import heapq
+import itertools
+
+
+# Um prazo por chave, guardado num heap. Reagendar é O(log n): entra uma
+# entrada nova e a antiga fica no heap como obsoleta, sendo descartada
+# quando chega ao topo. O laço dorme exatamente até o próximo prazo (ou
+# até alguém agendar algo mais cedo), sem varrer todas as chaves.
+class AgendadorPrazos:
+
+    def __init__(self, ao_vencer):
+        self.ao_vencer = ao_vencer  # corrotina chamada com a chave vencida
+        self._heap = []  # [(prazo, seq, chave)]
+        self._atuais = {}  # {chave: seq da entrada válida}
+        self._seq = itertools.count()
+        self._sinal = asyncio.Event()
+        self._tarefa = None
+
+    def __len__(self):
+        return len(self._atuais)
+
+    def _agora(self):
+        return asyncio.get_running_loop().time()
+
+    def agendar(self, chave, segundos):
+        seq = next(self._seq)
+        prazo = self._agora() + max(0.0, segundos)
+        self._atuais[chave] = seq
+        heapq.heappush(self._heap, (prazo, seq, chave))
+        # Entradas obsoletas demais: reconstrói o heap só com as válidas
+        if len(self._heap) > 2 * len(self._atuais) + 64:
+            self._heap = [e for e in self._heap if self._atuais.get(e[2]) == e[1]]
+            heapq.heapify(self._heap)
+        if self._heap[0][1] == seq:
+            self._sinal.set()
+
+    def cancelar(self, chave):
+        self._atuais.pop(chave, None)
+
+    def proximo_prazo(self):
+        while self._heap and self._atuais.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def iniciar(self):
+        if self._tarefa is None or self._tarefa.done():
+            self._tarefa = asyncio.create_task(self._executar())
+        return self._tarefa
+
+    async def _executar(self):
+        while True:
+            self._sinal.clear()
+            prazo = self.proximo_prazo()
+            if prazo is None:
+                await self._sinal.wait()
+                continue
+            espera = prazo - self._agora()
+            if espera > 0:
+                try:
+                    await asyncio.wait_for(self._sinal.wait(), timeout=espera)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, chave = heapq.heappop(self._heap)
+            del self._atuais[chave]
+            asyncio.create_task(self.ao_vencer(chave))
@@ -0,0 +1,7 @@
+# agregacao.py
+
+
+def chave_deposito(market_id, nome_instalacao):
+    # Clientes antigos não mandam o MarketID; nesse caso vale o nome
+    return str(market_id) if market_id is not None else nome_instalacao
+
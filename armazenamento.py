@@ -0,0 +1,221 @@
+# armazenamento.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from deposito_compacto import DepositoCompacto
+
+ARQUIVO_BANCO = os.getenv("ARQUIVO_BANCO", "botElite.db")
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS depositos (
+    chave TEXT PRIMARY KEY,
+    dados TEXT NOT NULL,
+    atualizado_em REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS mensagens (
+    chave TEXT PRIMARY KEY,
+    canal_id INTEGER,
+    mensagem_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS mensagens_bots (
+    market_id INTEGER PRIMARY KEY,
+    canal_id INTEGER,
+    mensagem_id INTEGER NOT NULL,
+    dados TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    caminho TEXT PRIMARY KEY,
+    dados TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS valores (
+    chave TEXT PRIMARY KEY,
+    valor TEXT
+);
+CREATE TABLE IF NOT EXISTS historico (
+    arquivo TEXT NOT NULL,
+    linha INTEGER NOT NULL,
+    market_id INTEGER NOT NULL,
+    timestamp TEXT,
+    evento TEXT NOT NULL,
+    dados TEXT NOT NULL,
+    PRIMARY KEY (arquivo, linha)
+);
+CREATE INDEX IF NOT EXISTS historico_market ON historico (market_id, timestamp);
+CREATE TABLE IF NOT EXISTS contribuicoes (
+    id TEXT PRIMARY KEY,
+    comandante TEXT NOT NULL,
+    market_id INTEGER NOT NULL,
+    timestamp TEXT,
+    itens TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS arquivos_historico (
+    arquivo TEXT PRIMARY KEY,
+    hash TEXT NOT NULL
+);
+"""
+
+
+# Guarda em disco (SQLite) o que antes só existia em memória: o último
+# estado de cada depósito, os IDs das mensagens do Discord e até onde cada
+# journal já foi lido. Cada alteração é gravada na hora, uma linha por vez,
+# então reiniciar o processo não custa um reparse nem posts duplicados.
+class Armazenamento:
+
+    def __init__(self, caminho=ARQUIVO_BANCO):
+        self.caminho = caminho
+        self._trava = threading.Lock()
+        self.conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self.conexao.execute("PRAGMA journal_mode=WAL")
+        self.conexao.execute("PRAGMA synchronous=NORMAL")
+        self.conexao.executescript(_ESQUEMA)
+        self.conexao.commit()
+
+    def _executar(self, sql, parametros=()):
+        with self._trava:
+            self.conexao.execute(sql, parametros)
+            self.conexao.commit()
+
+    def _consultar(self, sql, parametros=()):
+        with self._trava:
+            return self.conexao.execute(sql, parametros).fetchall()
+
+    def fechar(self):
+        with self._trava:
+            self.conexao.close()
+
+    # Depósitos: {chave: dict serializável em JSON}
+    def salvar_deposito(self, chave, dados):
+        self._executar(
+            "INSERT OR REPLACE INTO depositos (chave, dados, atualizado_em) VALUES (?, ?, ?)",
+            (str(chave), json.dumps(dados, ensure_ascii=False), time.time()),
+        )
+
+    def remover_deposito(self, chave):
+        self._executar("DELETE FROM depositos WHERE chave = ?", (str(chave),))
+
+    def depositos(self):
+        return {chave: json.loads(dados) for chave, dados in self._consultar("SELECT chave, dados FROM depositos")}
+
+    # Mensagens do Discord: {chave: (canal_id, mensagem_id)}
+    def salvar_mensagem(self, chave, canal_id, mensagem_id):
+        self._executar(
+            "INSERT OR REPLACE INTO mensagens (chave, canal_id, mensagem_id) VALUES (?, ?, ?)",
+            (str(chave), canal_id, mensagem_id),
+        )
+
+    def remover_mensagem(self, chave):
+        self._executar("DELETE FROM mensagens WHERE chave = ?", (str(chave),))
+
+    def mensagens(self):
+        return {chave: (canal_id, mensagem_id)
+                for chave, canal_id, mensagem_id in self._consultar("SELECT chave, canal_id, mensagem_id FROM mensagens")}
+
+    # Checkpoints de leitura dos journals (offset + estado do rastreador)
+    def salvar_checkpoint(self, caminho, dados):
+        self._executar(
+            "INSERT OR REPLACE INTO checkpoints (caminho, dados) VALUES (?, ?)",
+            (caminho, json.dumps(dados, ensure_ascii=False)),
+        )
+
+    def checkpoint(self, caminho):
+        linhas = self._consultar("SELECT dados FROM checkpoints WHERE caminho = ?", (caminho,))
+        return json.loads(linhas[0][0]) if linhas else None
+
+    def salvar_valor(self, chave, valor):
+        self._executar("INSERT OR REPLACE INTO valores (chave, valor) VALUES (?, ?)", (chave, json.dumps(valor)))
+
+    def valor(self, chave, padrao=None):
+        linhas = self._consultar("SELECT valor FROM valores WHERE chave = ?", (chave,))
+        return json.loads(linhas[0][0]) if linhas else padrao
+
+    def remover_valor(self, chave):
+        self._executar("DELETE FROM valores WHERE chave = ?", (chave,))
+
+    # Entregas do LivroContribuicoes: [(id, comandante, MarketID, timestamp,
+    # itens)]. Só as novas são gravadas; um id que já existe é ignorado.
+    def salvar_contribuicoes(self, eventos):
+        with self._trava:
+            with self.conexao:
+                self.conexao.executemany(
+                    "INSERT OR IGNORE INTO contribuicoes (id, comandante, market_id, timestamp, itens) VALUES (?, ?, ?, ?, ?)",
+                    ((chave, comandante, market_id, timestamp, json.dumps(itens, ensure_ascii=False))
+                     for chave, comandante, market_id, timestamp, itens in eventos),
+                )
+
+    # [(comandante, MarketID, timestamp, itens)] na ordem em que foram gravadas
+    def contribuicoes(self):
+        return [(comandante, market_id, timestamp, json.loads(itens)) for comandante, market_id, timestamp, itens in
+                self._consultar("SELECT comandante, market_id, timestamp, itens FROM contribuicoes ORDER BY rowid")]
+
+    # Linha do tempo dos depósitos reconstruída dos journals (historico.py).
+    # eventos: [(timestamp, linha, market_id, evento, linha do journal em
+    # JSON)]. Os eventos de um arquivo são trocados de uma vez, junto com o
+    # hash do conteúdo, numa única transação.
+    def substituir_historico(self, arquivo, hash_conteudo, eventos):
+        with self._trava:
+            with self.conexao:
+                self.conexao.execute("DELETE FROM historico WHERE arquivo = ?", (arquivo,))
+                self.conexao.executemany(
+                    "INSERT INTO historico (arquivo, linha, market_id, timestamp, evento, dados) VALUES (?, ?, ?, ?, ?, ?)",
+                    ((arquivo, linha, market_id, timestamp, evento, dados)
+                     for timestamp, linha, market_id, evento, dados in eventos),
+                )
+                self.conexao.execute(
+                    "INSERT OR REPLACE INTO arquivos_historico (arquivo, hash) VALUES (?, ?)", (arquivo, hash_conteudo)
+                )
+
+    def hashes_historico(self):
+        return dict(self._consultar("SELECT arquivo, hash FROM arquivos_historico"))
+
+    # [(timestamp, evento, dict do journal)] do depósito, em ordem cronológica
+    def historico(self, market_id):
+        return [(timestamp, evento, json.loads(dados)) for timestamp, evento, dados in self._consultar(
+            "SELECT timestamp, evento, dados FROM historico WHERE market_id = ? ORDER BY timestamp, arquivo, linha",
+            (market_id,),
+        )]
+
+    # Mensagens dos bots, por MarketID: devolve ({MarketID: (mensagem, nome,
+    # DepositoCompacto)}, {MarketIDs finalizados}). As mensagens são parciais:
+    # não custam chamada à API até serem editadas. Ficam numa tabela só dos
+    # bots: o servidor pode usar o mesmo banco, com outro formato em depositos.
+    def mensagens_enviadas(self, canal):
+        self._migrar_mensagens_bots()
+        enviadas, finalizadas = {}, set()
+        for market_id, mensagem_id, dados in self._consultar(
+                "SELECT market_id, mensagem_id, dados FROM mensagens_bots"):
+            dados = json.loads(dados)
+            if dados.get("finalizado"):
+                finalizadas.add(market_id)
+            else:
+                enviadas[market_id] = (canal.get_partial_message(mensagem_id), dados["nome"],
+                                       DepositoCompacto.de_materiais(dados["materiais"]))
+        return enviadas, finalizadas
+
+    def salvar_mensagem_enviada(self, market_id, canal_id, mensagem, nome, materiais, finalizado=False):
+        self._executar(
+            "INSERT OR REPLACE INTO mensagens_bots (market_id, canal_id, mensagem_id, dados) VALUES (?, ?, ?, ?)",
+            (market_id, canal_id, mensagem.id,
+             json.dumps({"nome": nome, "materiais": materiais, "finalizado": finalizado}, ensure_ascii=False)),
+        )
+
+    # Versões antigas dos bots gravavam em depositos/mensagens, no lugar das
+    # linhas do servidor; passam para mensagens_bots uma vez só
+    def _migrar_mensagens_bots(self):
+        with self._trava:
+            with self.conexao:
+                for chave, dados in self.conexao.execute("SELECT chave, dados FROM depositos").fetchall():
+                    dados = json.loads(dados)
+                    if "ultima_atualizacao" in dados or not chave.isdigit():
+                        continue
+                    mensagem = self.conexao.execute(
+                        "SELECT canal_id, mensagem_id FROM mensagens WHERE chave = ?", (chave,)).fetchone()
+                    if mensagem is not None:
+                        self.conexao.execute(
+                            "INSERT OR IGNORE INTO mensagens_bots (market_id, canal_id, mensagem_id, dados) "
+                            "VALUES (?, ?, ?, ?)", (int(chave), *mensagem, json.dumps(dados, ensure_ascii=False)))
+                    self.conexao.execute("DELETE FROM depositos WHERE chave = ?", (chave,))
+                    self.conexao.execute("DELETE FROM mensagens WHERE chave = ?", (chave,))
@@ -0,0 +1,347 @@
+# benchmark.py
+
+import argparse
+import asyncio
+import functools
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import gerador_journal
+
+PASTA_JOURNALS = "bench_journals"  # journals sintéticos gerados, reaproveitados entre execuções
+ARQUIVO_RESULTADOS = "benchmark_resultados.jsonl"
+TAMANHOS_PADRAO = "1MB,4MB,16MB"
+LIMITE_REGRESSAO = 0.2  # 20% mais lento que a execução anterior
+BYTES_INCREMENTO = 64 * 1024
+# (processos do Discord, shards): 0 processos = tudo no processo da ingestão
+CONFIGURACOES_DISCORD = ((0, 1), (0, 4), (1, 4), (2, 4), (4, 4))
+CANAIS_DISCORD = 256  # canais (e guilds) espalhados entre os shards
+
+# O servidor e o bot leem a configuração na importação; o banco é sempre
+# temporário, para não mexer no botElite.db de verdade
+os.environ.setdefault("DISCORD_CHANNEL_ID", "1")
+os.environ.setdefault("DISCORD_BOT_TOKEN", "falso")
+os.environ["ARQUIVO_BANCO"] = BANCO_TEMPORARIO = os.path.join(tempfile.gettempdir(), f"benchmark-{os.getpid()}.db")
+
+
+def commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def journal_sintetico(tamanho, args):
+    os.makedirs(PASTA_JOURNALS, exist_ok=True)
+    nome = f"Journal.bench-{tamanho}-d{args.depositos}-c{args.contribuicoes}-r{args.ruido}-s{args.semente}.log"
+    caminho = os.path.join(PASTA_JOURNALS, nome)
+    if not os.path.exists(caminho):
+        inicio = time.perf_counter()
+        gerador_journal.gerar(caminho, gerador_journal.tamanho_em_bytes(tamanho), args.depositos,
+                              args.contribuicoes, args.ruido, args.semente)
+        print(f"Gerado {caminho} em {time.perf_counter() - inicio:.1f}s")
+    return caminho
+
+
+def parsers():
+    import bot_discord_ed
+    import cliente
+    import parserMaterials
+    return {
+        "extrair_materiais_construcao": parserMaterials.extrair_materiais_construcao,
+        "extrair_ultima_instalacao_e_materiais": cliente.extrair_ultima_instalacao_e_materiais,
+        "extrair_ultimas_instalacoes": bot_discord_ed.extrair_ultimas_instalacoes,
+    }
+
+
+# Leitura a frio: sem o fluxo que instalacoes.rastrear() guarda por caminho
+def _frio(funcao, caminho):
+    import instalacoes
+    instalacoes._fluxos.clear()
+    return funcao(caminho)
+
+
+def _melhor_tempo(funcao, repeticoes):
+    melhor = math.inf
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+# Pico de memória alocada em Python; numa passada separada porque o
+# tracemalloc deixa tudo bem mais lento
+def _pico_memoria(funcao):
+    tracemalloc.start()
+    try:
+        funcao()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def medir_parsers(caminho, tamanho, repeticoes):
+    import instalacoes
+    megabytes = os.path.getsize(caminho) / (1 << 20)
+    resultados = []
+    for nome, funcao in parsers().items():
+        tempo = _melhor_tempo(lambda: _frio(funcao, caminho), repeticoes)
+        pico = _pico_memoria(lambda: _frio(funcao, caminho))
+
+        # Incremental: o journal cresce BYTES_INCREMENTO e só o final é lido
+        _frio(funcao, caminho)
+        with open(caminho, "rb") as f:
+            f.seek(-min(BYTES_INCREMENTO, os.path.getsize(caminho)), os.SEEK_END)
+            f.readline()
+            final = f.read()
+        tamanho_original = os.path.getsize(caminho)
+        try:
+            with open(caminho, "ab") as f:
+                f.write(final)
+            inicio = time.perf_counter()
+            funcao(caminho)
+            incremental = time.perf_counter() - inicio
+        finally:
+            os.truncate(caminho, tamanho_original)
+            instalacoes._fluxos.clear()
+
+        resultados.append({
+            "teste": nome, "tamanho": tamanho, "megabytes": round(megabytes, 2), "segundos": tempo,
+            "mb_por_segundo": megabytes / tempo, "pico_bytes": pico, "incremental_segundos": incremental,
+        })
+    return resultados
+
+
+# Leituras completas de cada depósito do journal, com o fornecido subindo
+# aos poucos e timestamps sempre novos, para o servidor aplicar todas
+def _cargas(caminho, requisicoes):
+    import bot_discord_ed
+    depositos = _frio(bot_discord_ed.extrair_ultimas_instalacoes, caminho)[0]
+    cargas = []
+    for i in range(requisicoes):
+        market_id, nome, materiais = depositos[i % len(depositos)]
+        fracao = (i // len(depositos) + 1) / (requisicoes // len(depositos) + 1)
+        cargas.append({
+            "market_id": market_id,
+            "instalacao": nome,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(1_750_000_000 + i)),
+            "materiais": [dict(m, ProvidedAmount=int(m["RequiredAmount"] * fracao)) for m in materiais],
+        })
+    return cargas
+
+
+# /logdata com o servidor de verdade (FastAPI TestClient) e o ClienteFalso no
+# lugar do Discord: vazão dos POSTs e tempo até a fila de ingestão esvaziar
+def medir_logdata(caminho, requisicoes):
+    from discord_falso import ClienteFalso
+    from fastapi.testclient import TestClient
+
+    import servidor
+
+    servidor.client = falso = ClienteFalso()
+    cargas = _cargas(caminho, requisicoes)
+    tracemalloc.start()
+    with TestClient(servidor.app) as http:
+        inicio = time.perf_counter()
+        for carga in cargas:
+            resposta = http.post("/logdata", json=carga)
+            while resposta.status_code == 429:
+                time.sleep(0.01)
+                resposta = http.post("/logdata", json=carga)
+        aceitas = time.perf_counter() - inicio
+        while http.get("/fila").json()["ingestao"]:
+            time.sleep(0.005)
+        processadas = time.perf_counter() - inicio
+        fila = http.get("/fila").json()
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return [{
+        "teste": "logdata", "requisicoes": requisicoes, "segundos": processadas,
+        "requisicoes_por_segundo": requisicoes / processadas, "aceitas_por_segundo": requisicoes / aceitas,
+        "pico_bytes": pico, "discord": dict(falso.operacoes), "fila_discord": fila,
+    }]
+
+
+# Memória do estado de `sites` depósitos no servidor: listas de dicts como
+# chegam no JSON (o formato antigo) contra DepositoCompacto
+def medir_memoria_sites(caminho, sites):
+    from deposito_compacto import DepositoCompacto
+
+    _, _, materiais = _frio(__import__("bot_discord_ed").extrair_ultimas_instalacoes, caminho)[0][0]
+    corpo = json.dumps(list(materiais))
+    resultados = []
+    for nome, montar in (("sites_dicts", lambda m: (m, {x["Name"]: "2025-05-20T14:18:29Z" for x in m})),
+                         ("sites_compacto", lambda m: DepositoCompacto.de_materiais(m))):
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        estado = {str(i): montar(json.loads(corpo)) for i in range(sites)}
+        segundos = time.perf_counter() - inicio
+        atual = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del estado
+        resultados.append({"teste": nome, "requisicoes": sites, "segundos": segundos, "memoria_bytes": atual,
+                           "bytes_por_site": atual / sites})
+    return resultados
+
+
+async def _medir_saida(processos, shards, mensagens, latencia, custo):
+    from discord_falso import ClienteFalso
+    from roteamento import Destino
+    from saida_discord import ProcessosDiscord, SaidaDiscord
+
+    publicadas = 0
+
+    async def publicada(chave, canal_id, mensagem_id):
+        nonlocal publicadas
+        publicadas += 1
+
+    fabrica = functools.partial(ClienteFalso, latencia=latencia, custo=custo)
+    if processos:
+        saida = ProcessosDiscord(processos, shards, "falso", publicada, fabrica)
+    else:
+        saida = SaidaDiscord(fabrica(shards), shards, publicada)
+    saida.iniciar()
+    if processos:
+        # Começa a contar com todos os processos de trabalho de pé
+        while len(saida.relatorios) < len(saida.processos):
+            await asyncio.sleep(0.05)
+    inicio = time.perf_counter()
+    for i in range(mensagens):
+        canal = i % CANAIS_DISCORD
+        saida.agendar(str(i), Destino(canal << 22, 1000 + canal), f"depósito {i}")
+    while publicadas < mensagens:
+        await asyncio.sleep(0.005)
+    segundos = time.perf_counter() - inicio
+    if processos:
+        await saida.encerrar()
+    return segundos
+
+
+# Vazão da saída para o Discord (SaidaDiscord / ProcessosDiscord) contra o
+# ClienteFalso, com `latencia` de rede e `custo` de CPU por chamada, para
+# cada combinação de processos e shards. A quantidade de canais fica abaixo
+# do limite por canal, então mede os shards e os processos, não o balde.
+def medir_discord(mensagens, latencia, custo):
+    resultados = []
+    for processos, shards in CONFIGURACOES_DISCORD:
+        segundos = asyncio.run(_medir_saida(processos, shards, mensagens, latencia, custo))
+        resultados.append({"teste": f"discord_p{processos}_s{shards}", "requisicoes": mensagens,
+                           "segundos": segundos, "mensagens_por_segundo": mensagens / segundos,
+                           "latencia": latencia, "custo": custo})
+    return resultados
+
+
+def _chave(resultado):
+    return resultado["teste"], resultado.get("tamanho"), resultado.get("requisicoes")
+
+
+def ultima_execucao(commit):
+    if not os.path.exists(ARQUIVO_RESULTADOS):
+        return {}
+    anterior = {}
+    with open(ARQUIVO_RESULTADOS, "r", encoding="utf-8") as f:
+        for linha in f:
+            execucao = json.loads(linha)
+            if execucao["commit"] != commit:
+                anterior = execucao
+    return {_chave(r): r for r in anterior.get("resultados", [])}
+
+
+def comparar(resultados, anterior):
+    regressoes = []
+    for r in resultados:
+        antes = anterior.get(_chave(r))
+        if antes is not None and r["segundos"] > antes["segundos"] * (1 + LIMITE_REGRESSAO):
+            regressoes.append((r, antes))
+    return regressoes
+
+
+def imprimir(resultados):
+    print(f"{'teste':<40} {'tamanho':>8} {'s':>9} {'MB/s':>8} {'pico MB':>8} {'incr. ms':>9}")
+    for r in resultados:
+        if r["teste"].startswith("sites_"):
+            print(f"{r['teste']:<40} {r['requisicoes']:>8} {r['segundos']:>9.3f} {'':>8} "
+                  f"{r['memoria_bytes'] / (1 << 20):>8.1f}  {r['bytes_por_site']:.0f} B/site")
+            continue
+        if r["teste"].startswith("discord_"):
+            print(f"{r['teste']:<40} {r['requisicoes']:>8} {r['segundos']:>9.3f} {r['mensagens_por_segundo']:>7.0f}/s")
+            continue
+        if r["teste"] == "logdata":
+            print(f"{'logdata':<40} {r['requisicoes']:>8} {r['segundos']:>9.3f} "
+                  f"{r['requisicoes_por_segundo']:>7.0f}/s {r['pico_bytes'] / (1 << 20):>8.1f}  discord={r['discord']}")
+            continue
+        print(f"{r['teste']:<40} {r['tamanho']:>8} {r['segundos']:>9.3f} {r['mb_por_segundo']:>8.1f} "
+              f"{r['pico_bytes'] / (1 << 20):>8.1f} {r['incremental_segundos'] * 1000:>9.2f}")
+
+    # Curva de escala: expoente de tempo ~ tamanho^k entre o menor e o maior journal (k=1 é linear)
+    por_teste = {}
+    for r in resultados:
+        if "megabytes" in r:
+            por_teste.setdefault(r["teste"], []).append(r)
+    for teste, pontos in por_teste.items():
+        if len(pontos) > 1:
+            a, b = min(pontos, key=lambda r: r["megabytes"]), max(pontos, key=lambda r: r["megabytes"])
+            expoente = math.log(b["segundos"] / a["segundos"]) / math.log(b["megabytes"] / a["megabytes"])
+            print(f"escala {teste}: tempo ~ tamanho^{expoente:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks dos parsers e do /logdata")
+    parser.add_argument("--tamanhos", default=TAMANHOS_PADRAO, help="lista separada por vírgula, até 1GB")
+    parser.add_argument("--depositos", type=int, default=5)
+    parser.add_argument("--contribuicoes", type=int, default=3)
+    parser.add_argument("--ruido", type=int, default=2)
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--requisicoes", type=int, default=500, help="POSTs no /logdata (0 desliga)")
+    parser.add_argument("--sites", type=int, default=10_000, help="depósitos na medida de memória (0 desliga)")
+    parser.add_argument("--mensagens-discord", type=int, default=1000,
+                        help="mensagens na medida dos shards e processos do Discord (0 desliga)")
+    parser.add_argument("--latencia-discord", type=float, default=0.01, help="segundos de rede por chamada falsa")
+    parser.add_argument("--custo-discord", type=float, default=0.0005, help="segundos de CPU por chamada falsa")
+    parser.add_argument("--nao-salvar", action="store_true", help=f"não grava em {ARQUIVO_RESULTADOS}")
+    args = parser.parse_args()
+    try:
+        return executar(args)
+    finally:
+        for sufixo in ("", "-wal", "-shm"):
+            if os.path.exists(BANCO_TEMPORARIO + sufixo):
+                os.remove(BANCO_TEMPORARIO + sufixo)
+
+
+def executar(args):
+    resultados = []
+    tamanhos = [t.strip() for t in args.tamanhos.split(",") if t.strip()]
+    for tamanho in tamanhos:
+        resultados.extend(medir_parsers(journal_sintetico(tamanho, args), tamanho, args.repeticoes))
+    if args.sites:
+        resultados.extend(medir_memoria_sites(journal_sintetico(tamanhos[0], args), args.sites))
+    if args.requisicoes:
+        resultados.extend(medir_logdata(journal_sintetico(tamanhos[0], args), args.requisicoes))
+    if args.mensagens_discord:
+        resultados.extend(medir_discord(args.mensagens_discord, args.latencia_discord, args.custo_discord))
+    imprimir(resultados)
+
+    commit = commit_atual()
+    regressoes = comparar(resultados, ultima_execucao(commit))
+    for r, antes in regressoes:
+        print(f"⚠️ Regressão em {r['teste']} ({r.get('tamanho') or r.get('requisicoes')}): "
+              f"{antes['segundos']:.3f}s -> {r['segundos']:.3f}s")
+    if not args.nao_salvar:
+        with open(ARQUIVO_RESULTADOS, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"commit": commit, "data": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                                "python": sys.version.split()[0], "resultados": resultados}) + "\n")
+    return 1 if regressoes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,21 @@
 import discord
 import asyncio
 import os
-import json
 from dotenv import load_dotenv
 
+from armazenamento import Armazenamento
+from indice_journal import IndiceJournal
+from fluxo_journal import FluxoJournal
+from deposito_compacto import DepositoCompacto
+from impressao import CacheRenderizacao, etiqueta_deposito
+from instalacoes import PREFIXO_CONSTRUCAO, RastreadorInstalacoes, rastrear
+from livro_contribuicoes import LivroContribuicoes, formatar_lideres
+from mercados import (
+    LIMITE_MENSAGEM, carregar_indice_mercados, espaco_na_mensagem, formatar_fontes, salvar_indice_mercados,
+)
+from monitor_loop import MonitorLoop
+from observador_journal import ObservadorJournal
+
 # Configuração: mínimo de materiais entregues para considerar finalização (ex: 80%)
 FINALIZACAO_MINIMA_ENTREGUE = 0.8  # 80%
 
@@ -17,61 +29,10 @@ intents = discord.Intents.default()
 client = discord.Client(intents=intents)
 
 def extrair_ultimas_instalacoes(log_path):
-    with open(log_path, 'r', encoding='utf-8') as f:
-        log_lines = f.readlines()
-
-    ultimas_por_instalacao = {}
-    eventos = []
-
-    for line_number, line in enumerate(log_lines):
-        try:
-            registro = json.loads(line)
-            eventos.append(registro)
-
-            listas_validas = []
-
-            if isinstance(registro, list) and all(
-                isinstance(item, dict) and
-                'Name_Localised' in item and
-                'RequiredAmount' in item and
-                'ProvidedAmount' in item
-                for item in registro
-            ):
-                listas_validas = [registro]
-
-            elif isinstance(registro, dict):
-                listas_validas = [
-                    valor for valor in registro.values()
-                    if isinstance(valor, list) and all(
-                        isinstance(item, dict) and
-                        'Name_Localised' in item and
-                        'RequiredAmount' in item and
-                        'ProvidedAmount' in item
-                        for item in valor
-                    )
-                ]
-
-            for lista in listas_validas:
-                nome_instalacao = "Desconhecida"
-                for i in range(line_number, -1, -1):
-                    try:
-                        reg = json.loads(log_lines[i])
-                        if reg.get("event") == "ApproachSettlement":
-                            nome = reg.get("Name", "")
-                            if nome.startswith("Planetary Construction Site:"):
-                                nome_instalacao = nome
-                                break
-                    except json.JSONDecodeError:
-                        continue
-
-                ultimas_por_instalacao[nome_instalacao] = lista
-
-        except json.JSONDecodeError:
-            continue
+    rastreador = rastrear(log_path)
+    return rastreador.instalacoes(), set(rastreador.sites_sinalizados)
 
-    return list(ultimas_por_instalacao.items()), eventos
-
-def formatar_mensagem(nome_instalacao, materiais):
+def formatar_mensagem(nome_instalacao, materiais, fontes=None, lideres=None):
     linhas = [f"📍 **Materiais para instalação:** `{nome_instalacao}`\n"]
     linhas.append("```")
     linhas.append(f"{'Material':<25} | {'Req.':>5} | {'Fornec.':>7} | {'Faltam':>6}")
@@ -85,7 +46,14 @@ def formatar_mensagem(nome_instalacao, materiais):
             faltando = req - prov
             linhas.append(f"{nome:<25} | {req:>5} | {prov:>7} | {faltando:>6}")
     linhas.append("```")
-    return "\n".join(linhas)
+    # Fontes e placar ocupam só o que sobra do limite; a tabela vem antes
+    if fontes:
+        linhas.append(formatar_fontes(fontes, espaco=espaco_na_mensagem(linhas)))
+    if lideres:
+        linhas.append(formatar_lideres(lideres, espaco=espaco_na_mensagem(linhas)))
+    return "\n".join(linhas)[:LIMITE_MENSAGEM]
+
+renderizar_mensagem = CacheRenderizacao(formatar_mensagem)
 
 @client.event
 async def on_ready():
@@ -95,66 +63,104 @@ async def on_ready():
 async def enviar_atualizacoes():
     await client.wait_until_ready()
     canal = client.get_channel(CANAL_ID)
-    mensagens_enviadas = {}  # {nome_instalacao: (mensagem_obj, materiais)}
+    # Retoma de onde parou: journal já lido, mensagens já enviadas e sites finalizados
+    armazenamento = Armazenamento()
+    fluxo = FluxoJournal(caminho=LOG_PATH)
+    rastreador = fluxo.assinar(RastreadorInstalacoes(), "rastreador")
+    # Entregas de cada comandante lidas do journal, para o placar da mensagem
+    livro = fluxo.assinar(LivroContribuicoes(), "contribuicoes")
+    await asyncio.to_thread(livro.usar_armazenamento, armazenamento)
+    ultimo_checkpoint = None
+    mensagens_enviadas, finalizadas = armazenamento.mensagens_enviadas(canal)  # {MarketID: (mensagem_obj, nome_instalacao, DepositoCompacto)}
+    etiquetas_enviadas = {}  # {MarketID: etiqueta do conteúdo publicado}
+    pasta_logs = os.path.dirname(os.path.abspath(LOG_PATH))
+    observador = ObservadorJournal(pasta_logs)
+    # Onde cada mercadoria já foi comprada, para sugerir fontes do que falta.
+    # Na primeira vez percorre todos os journals, então roda fora do loop.
+    mercados = fluxo.assinar(await asyncio.to_thread(carregar_indice_mercados, armazenamento, IndiceJournal(pasta_logs)))
+    await asyncio.to_thread(fluxo.restaurar, armazenamento.checkpoint(LOG_PATH))
+    monitor = MonitorLoop()
+    monitor.iniciar()
+
+    # Roda numa thread, longe do heartbeat do discord.py: lê o journal, grava
+    # o checkpoint e devolve um retrato imutável para o loop
+    def ler_journal():
+        nonlocal ultimo_checkpoint
+        fluxo.atualizar()
+        instalacoes, sites = rastreador.instantaneo()
+        fontes = {market_id: tuple(mercados.fontes(market_id, materiais)) for market_id, _, materiais in instalacoes}
+        lideres = {market_id: tuple(livro.lideres(market_id)) for market_id, _, _ in instalacoes}
+        # Etiqueta do conteúdo de cada mensagem: comparar duas é O(1)
+        etiquetas = {market_id: etiqueta_deposito(rastreador.impressoes[market_id], nome, fontes[market_id],
+                                                  lideres[market_id])
+                     for market_id, nome, _ in instalacoes}
+        checkpoint = fluxo.exportar()
+        if checkpoint and checkpoint["posicao"] != ultimo_checkpoint:
+            armazenamento.salvar_checkpoint(LOG_PATH, checkpoint)
+            ultimo_checkpoint = checkpoint["posicao"]
+        salvar_indice_mercados(armazenamento, mercados)
+        return instalacoes, sites, fontes, lideres, etiquetas
 
     while not client.is_closed():
         try:
-            instalacoes, eventos = extrair_ultimas_instalacoes(LOG_PATH)
-
-            # Verifica quais construction sites ainda estão ativos no log
-            construction_sites_atuais = {
-                entry["SignalName"]
-                for entry in eventos
-                if entry.get("event") == "FSSSignalDiscovered"
-                and entry.get("SignalName", "").startswith("Planetary Construction Site:")
-            }
-
-            for nome_instalacao, materiais in instalacoes:
-                if nome_instalacao == "Desconhecida":
+            # Também devolve quais construction sites ainda estão ativos no log
+            instalacoes, construction_sites_atuais, fontes_por_site, lideres_por_site, etiquetas = await asyncio.to_thread(ler_journal)
+
+            for market_id, nome_instalacao, materiais in instalacoes:
+                if nome_instalacao == "Desconhecida" or market_id in finalizadas:
                     continue
 
-                novo_conteudo = formatar_mensagem(nome_instalacao, materiais)
+                fontes = fontes_por_site[market_id]
+                lideres = lideres_por_site[market_id]
+                etiqueta = etiquetas[market_id]
 
-                if nome_instalacao in mensagens_enviadas:
-                    mensagem, antigos_materiais = mensagens_enviadas[nome_instalacao]
+                if market_id in mensagens_enviadas:
+                    mensagem, _, antigo = mensagens_enviadas[market_id]
 
                     # Se o conteúdo mudou, atualiza
-                    if novo_conteudo != formatar_mensagem(nome_instalacao, antigos_materiais):
+                    if market_id not in etiquetas_enviadas:
+                        # Mensagem restaurada do banco: etiqueta do que foi publicado
+                        etiquetas_enviadas[market_id] = etiqueta_deposito(antigo.impressao, nome_instalacao, fontes,
+                                                                          lideres)
+                    if etiqueta != etiquetas_enviadas[market_id]:
+                        novo_conteudo = renderizar_mensagem(etiqueta, nome_instalacao, materiais, fontes, lideres)
                         try:
                             await mensagem.edit(content=novo_conteudo)
-                            mensagens_enviadas[nome_instalacao] = (mensagem, materiais)
                         except discord.errors.NotFound:
-                            nova_msg = await canal.send(novo_conteudo)
-                            mensagens_enviadas[nome_instalacao] = (nova_msg, materiais)
-                    else:
-                        mensagens_enviadas[nome_instalacao] = (mensagem, materiais)
+                            mensagem = await canal.send(novo_conteudo)
+                        mensagens_enviadas[market_id] = (mensagem, nome_instalacao,
+                                                         DepositoCompacto.de_materiais(materiais))
+                        etiquetas_enviadas[market_id] = etiqueta
+                        armazenamento.salvar_mensagem_enviada(market_id, CANAL_ID, mensagem, nome_instalacao, materiais)
                 else:
-                    nova_msg = await canal.send(novo_conteudo)
-                    mensagens_enviadas[nome_instalacao] = (nova_msg, materiais)
+                    nova_msg = await canal.send(renderizar_mensagem(etiqueta, nome_instalacao, materiais, fontes, lideres))
+                    mensagens_enviadas[market_id] = (nova_msg, nome_instalacao, DepositoCompacto.de_materiais(materiais))
+                    etiquetas_enviadas[market_id] = etiqueta
+                    armazenamento.salvar_mensagem_enviada(market_id, CANAL_ID, nova_msg, nome_instalacao, materiais)
 
             # Verificar se alguma instalação rastreada desapareceu dos construction sites
-            for nome_instalacao in list(mensagens_enviadas.keys()):
-                if nome_instalacao.startswith("Planetary Construction Site:") and nome_instalacao not in construction_sites_atuais:
-                    mensagem, materiais = mensagens_enviadas[nome_instalacao]
-
-                    entregues = sum(1 for item in materiais if item["ProvidedAmount"] >= item["RequiredAmount"])
-                    total = len(materiais)
-                    if total == 0:
+            for market_id in list(mensagens_enviadas.keys()):
+                mensagem, nome_instalacao, deposito = mensagens_enviadas[market_id]
+                if nome_instalacao.startswith(PREFIXO_CONSTRUCAO) and nome_instalacao not in construction_sites_atuais:
+                    if len(deposito) == 0:
                         continue
 
-                    percentual_entregue = entregues / total
-
-                    if percentual_entregue >= FINALIZACAO_MINIMA_ENTREGUE:
+                    if deposito.fracao_entregue >= FINALIZACAO_MINIMA_ENTREGUE:
                         try:
                             await mensagem.add_reaction("✅")
                         except discord.errors.Forbidden:
                             print("⚠️ Sem permissão para adicionar reação final.")
-                        del mensagens_enviadas[nome_instalacao]
+                        del mensagens_enviadas[market_id]
+                        finalizadas.add(market_id)
+                        armazenamento.salvar_mensagem_enviada(market_id, CANAL_ID, mensagem, nome_instalacao, list(deposito), finalizado=True)
 
         except Exception as e:
             await canal.send(f"❌ Erro ao processar log: {str(e)}")
 
-        await asyncio.sleep(180)  # a cada 3 minutos
+        monitor.relatar("Loop do Discord")
+
+        # Acorda assim que o journal muda (ou a cada 3 minutos, no máximo)
+        await asyncio.to_thread(observador.esperar, 180)
 
 def main():
     client.run(TOKEN)
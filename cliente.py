@@ -1,83 +1,136 @@
 # cliente.py
 
 import os
-import json
-import glob
-import time
+import sys
 import requests
 from dotenv import load_dotenv
 
+from armazenamento import Armazenamento
+from decodificador_journal import DepositoConstrucao
+from envio_api import EnviadorAPI
+from fluxo_journal import FluxoJournal
+from impressao import etiqueta_deposito, formatar_if_none_match
+import metricas
+from indice_journal import IndiceJournal
+from instalacoes import RastreadorInstalacoes, rastrear
+from livro_contribuicoes import LivroContribuicoes
+from mercados import carregar_indice_mercados, salvar_indice_mercados
+from observador_journal import ObservadorJournal
+
 load_dotenv()
 API_ADRESS = os.getenv("API_ADRESS")
 
 API_URL = f"https://{API_ADRESS}.onrender.com/logdata" 
+API_URL_DELTA = f"https://{API_ADRESS}.onrender.com/logdata/delta"
+CHAVE_API = os.getenv("CHAVE_API")  # identifica o esquadrão; o servidor escolhe o canal por ela
 FINALIZACAO_MINIMA_ENTREGUE = 0.8
-INTERVALO_CHECAGEM = 60  
+INTERVALO_CHECAGEM = 60  # tempo máximo entre checagens se o journal não mudar
+PASTA_LOGS = os.path.expanduser(r"~\Saved Games\Frontier Developments\Elite Dangerous")
+PORTA_METRICAS = os.getenv("PORTA_METRICAS")  # se definida, expõe /metrics nessa porta
+
+# Índice persistente da pasta: evita listar e dar stat em todos os journals a cada volta
+_indice = IndiceJournal(PASTA_LOGS)
 
 def obter_log_mais_recente():
-    pasta_logs = os.path.expanduser(r"~\Saved Games\Frontier Developments\Elite Dangerous")
-    arquivos = glob.glob(os.path.join(pasta_logs, "Journal.*.log"))
-    if not arquivos:
-        return None
-    return max(arquivos, key=os.path.getmtime)
+    _indice.atualizar()
+    return _indice.mais_recente()
 
 def extrair_ultima_instalacao_e_materiais(log_path):
-    with open(log_path, 'r', encoding='utf-8') as f:
-        linhas = f.readlines()
-
-    approaches = []
-    listas = []
-
-    for i, line in enumerate(linhas):
-        try:
-            dado = json.loads(line)
-            if dado.get("event") == "ApproachSettlement" and "Planetary Construction Site:" in dado.get("Name", ""):
-                approaches.append((i, dado.get("Name")))
-
-            elif isinstance(dado, list):
-                if all(k in item for item in dado for k in ("Name_Localised", "RequiredAmount", "ProvidedAmount")):
-                    listas.append((i, dado))
-            elif isinstance(dado, dict):
-                for v in dado.values():
-                    if isinstance(v, list) and all(k in item for item in v for k in ("Name_Localised", "RequiredAmount", "ProvidedAmount")):
-                        listas.append((i, v))
-        except:
-            continue
-
-    if not listas:
-        return None, None
+    return ultima_instalacao(rastrear(log_path))
 
-    idx_lista, materiais = listas[-1]
-    nome_instalacao = "Desconhecida"
-    for idx, nome in reversed(approaches):
-        if idx < idx_lista:
-            nome_instalacao = nome
-            break
+def ultima_instalacao(rastreador):
+    market_id = rastreador.ultimo_deposito
+    if market_id is None:
+        return None, None
+    return rastreador.nome(market_id), rastreador.materiais(market_id)
 
-    return nome_instalacao, materiais
+# Conexão reaproveitada entre os envios (keep-alive)
+_sessao = requests.Session()
+if CHAVE_API:
+    _sessao.headers["X-Chave-Api"] = CHAVE_API
 
-def enviar_para_api(instalacao, materiais):
+def enviar_para_api(instalacao, materiais, market_id=None, timestamp=None, impressao=None):
+    # Com MarketID e timestamp o servidor junta leituras de vários comandantes;
+    # com a impressão dos materiais, responde 304 se já tiver esse estado
+    cabecalhos = {}
+    if market_id is not None and impressao is not None:
+        cabecalhos["If-None-Match"] = formatar_if_none_match([(market_id, etiqueta_deposito(impressao, instalacao))])
     payload = {
         "instalacao": instalacao,
-        "materiais": materiais
+        "materiais": materiais,
+        "market_id": market_id,
+        "timestamp": timestamp
     }
     try:
-        resp = requests.post(API_URL, json=payload)
+        resp = _sessao.post(API_URL, json=payload, headers=cabecalhos)
         print(f"[API] {resp.status_code} - {resp.text}")
     except Exception as e:
         print(f"[ERRO] Falha ao enviar dados: {e}")
 
+# Assinante do FluxoJournal: coloca na fila os depósitos que apareceram no
+# journal desde a última volta (e, com `livro`, as entregas novas) e
+# despacha a fila para o servidor
+class EnvioDepositos:
+
+    def __init__(self, enviador, rastreador, mercados, armazenamento, livro=None):
+        self.enviador = enviador
+        self.rastreador = rastreador
+        self.mercados = mercados
+        self.armazenamento = armazenamento
+        self.livro = livro
+        self.alterados = set()
+
+    def processar(self, registro):
+        if isinstance(registro, DepositoConstrucao) and registro.market_id is not None:
+            self.alterados.add(registro.market_id)
+
+    def concluir(self):
+        # Só entram na fila os depósitos cujo ProvidedAmount mudou
+        for market_id in self.alterados:
+            if market_id not in self.rastreador.depositos:
+                continue
+            materiais = self.rastreador.materiais(market_id)
+            self.enviador.atualizar(market_id, self.rastreador.nome(market_id), materiais,
+                                    self.rastreador.depositos[market_id].timestamp,
+                                    fontes=self.mercados.fontes(market_id, materiais),
+                                    impressao=self.rastreador.impressoes[market_id])
+        self.alterados.clear()
+        if self.livro is not None:
+            # O servidor descarta as que já tiver (mesmo id), então reler o journal não conta duas vezes
+            for entrega in self.livro.retirar_pendentes():
+                self.enviador.enfileirar({"contribuicao": entrega})
+        self.enviador.despachar()
+        salvar_indice_mercados(self.armazenamento, self.mercados)
+
+    def espera(self, padrao):
+        return self.enviador.espera_sugerida(padrao)
+
 if __name__ == "__main__":
     print("Iniciando monitoramento de log...")
-    ultimo_envio = ""
-
-    while True:
-        log_path = obter_log_mais_recente()
-        if log_path:
-            nome, materiais = extrair_ultima_instalacao_e_materiais(log_path)
-            if nome and materiais:
-                conteudo_atual = json.dumps({"instalacao": nome, "materiais": materiais}, sort_keys=True)
-                if conteudo_atual != ultimo_envio:
-                    enviar_para_api(nome, materiais)
-                    ultimo_envio = conteudo_atual
-        time.sleep(INTERVALO_CHECAGEM)
+    # Retoma a leitura do journal e a fila de envio de onde pararam
+    armazenamento = Armazenamento()
+    # Segue o journal mais recente, inclusive quando a sessão continua em outra parte
+    fluxo = FluxoJournal(_indice)
+    rastreador = fluxo.assinar(RastreadorInstalacoes(), "rastreador")
+    # Onde cada mercadoria já foi comprada, para sugerir fontes do que falta
+    mercados = fluxo.assinar(carregar_indice_mercados(armazenamento, _indice))
+    enviador = EnviadorAPI(API_URL_DELTA, armazenamento=armazenamento, chave_api=CHAVE_API)
+    # Entregas de cada comandante, para o placar das mensagens
+    livro = fluxo.assinar(LivroContribuicoes(enviar=True), "contribuicoes")
+    livro.usar_armazenamento(armazenamento)
+    fluxo.assinar(EnvioDepositos(enviador, rastreador, mercados, armazenamento, livro))
+    if "--tabela" in sys.argv:
+        # Tabela no console a partir da mesma leitura do journal
+        from parserMaterials import TabelaConsole
+        fluxo.assinar(TabelaConsole(rastreador))
+    fluxo.restaurar(armazenamento.checkpoint("sessao"))
+    if PORTA_METRICAS:
+        metricas.Medidor("botelite_sites_rastreados", "Depósitos vistos na sessão atual",
+                         funcao=lambda: len(rastreador.depositos))
+        metricas.Medidor("botelite_fila_envio_profundidade", "Atualizações na fila de envio em disco",
+                         funcao=lambda: enviador.tamanho_fila)
+        metricas.servir(int(PORTA_METRICAS))
+    if "--perfil" in sys.argv:
+        # Perfil da primeira volta, que é a que lê o journal inteiro
+        metricas.perfilar(fluxo.atualizar)
+    fluxo.executar(ObservadorJournal(PASTA_LOGS), INTERVALO_CHECAGEM, armazenamento)
@@ -0,0 +1,247 @@
+# decodificador_journal.py
+
+import json
+import re
+import sys
+import time
+from typing import NamedTuple
+
+try:
+    import orjson
+    carregar_json = orjson.loads
+    ErroJson = orjson.JSONDecodeError
+except ImportError:
+    orjson = None
+    carregar_json = json.loads
+    ErroJson = json.JSONDecodeError
+
+PREFIXO_CONSTRUCAO = "Planetary Construction Site:"
+
+_MARCA_EVENTO = '"event":"'
+_RE_EVENTO = re.compile(r'"event"\s*:\s*"([^"]+)"')
+
+
+class Material(NamedTuple):
+    nome: str
+    nome_localizado: str
+    requerido: int
+    fornecido: int
+    pagamento: int
+
+    # Mesmo formato do journal, usado pelo servidor e pelas mensagens
+    def como_dict(self):
+        return {
+            "Name": self.nome,
+            "Name_Localised": self.nome_localizado,
+            "RequiredAmount": self.requerido,
+            "ProvidedAmount": self.fornecido,
+            "Payment": self.pagamento,
+        }
+
+
+class DepositoConstrucao(NamedTuple):
+    timestamp: str
+    market_id: int
+    progresso: float
+    completo: bool
+    falhou: bool
+    materiais: tuple
+
+
+class Contribuicao(NamedTuple):
+    timestamp: str
+    market_id: int
+    itens: tuple  # ((nome, nome_localizado, quantidade), ...)
+
+
+class AproximacaoAssentamento(NamedTuple):
+    timestamp: str
+    nome: str
+    market_id: int
+    system_address: int
+    corpo: str
+
+
+class Atracado(NamedTuple):
+    timestamp: str
+    estacao: str
+    tipo_estacao: str
+    sistema: str
+    market_id: int
+    system_address: int = None
+
+
+class Mercado(NamedTuple):
+    timestamp: str
+    market_id: int
+    estacao: str
+    sistema: str
+
+
+class PosicaoSistema(NamedTuple):
+    timestamp: str
+    sistema: str
+    system_address: int
+    posicao: tuple  # StarPos (x, y, z) em anos-luz
+
+
+class CompraMercado(NamedTuple):
+    timestamp: str
+    market_id: int
+    tipo: str
+    tipo_localizado: str
+    quantidade: int
+    preco: int
+
+
+class Comandante(NamedTuple):
+    timestamp: str
+    fid: str
+    nome: str
+
+
+class SinalConstrucao(NamedTuple):
+    timestamp: str
+    nome: str
+    system_address: int
+
+
+def _deposito(d):
+    materiais = tuple(
+        Material(m.get("Name", ""), m.get("Name_Localised", m.get("Name", "?")),
+                 m.get("RequiredAmount", 0), m.get("ProvidedAmount", 0), m.get("Payment", 0))
+        for m in d.get("ResourcesRequired", ())
+    )
+    return DepositoConstrucao(d.get("timestamp"), d.get("MarketID"), d.get("ConstructionProgress", 0.0),
+                              d.get("ConstructionComplete", False), d.get("ConstructionFailed", False), materiais)
+
+
+def _contribuicao(d):
+    itens = tuple((c.get("Name", ""), c.get("Name_Localised", c.get("Name", "?")), c.get("Amount", 0))
+                  for c in d.get("Contributions", ()))
+    return Contribuicao(d.get("timestamp"), d.get("MarketID"), itens)
+
+
+def _aproximacao(d):
+    return AproximacaoAssentamento(d.get("timestamp"), d.get("Name", ""), d.get("MarketID"),
+                                   d.get("SystemAddress"), d.get("BodyName"))
+
+
+def _atracado(d):
+    return Atracado(d.get("timestamp"), d.get("StationName", ""), d.get("StationType"),
+                    d.get("StarSystem"), d.get("MarketID"), d.get("SystemAddress"))
+
+
+def _mercado(d):
+    return Mercado(d.get("timestamp"), d.get("MarketID"), d.get("StationName", ""), d.get("StarSystem"))
+
+
+def _posicao(d):
+    posicao = d.get("StarPos")
+    if not posicao:
+        return None
+    return PosicaoSistema(d.get("timestamp"), d.get("StarSystem"), d.get("SystemAddress"), tuple(posicao))
+
+
+def _compra(d):
+    return CompraMercado(d.get("timestamp"), d.get("MarketID"), d.get("Type"),
+                         d.get("Type_Localised", d.get("Type")), d.get("Count", 0), d.get("BuyPrice", 0))
+
+
+def _comandante(d):
+    # Commander traz o nome em Name; LoadGame, em Commander
+    return Comandante(d.get("timestamp"), d.get("FID"), d.get("Name") or d.get("Commander", ""))
+
+
+def _sinal(d):
+    nome = d.get("SignalName", "")
+    if not nome.startswith(PREFIXO_CONSTRUCAO):
+        return None
+    return SinalConstrucao(d.get("timestamp"), nome, d.get("SystemAddress"))
+
+
+# {evento: função que monta o registro tipado a partir do dict decodificado}
+CONVERSORES = {
+    "ColonisationConstructionDepot": _deposito,
+    "ColonisationContribution": _contribuicao,
+    "ApproachSettlement": _aproximacao,
+    "Docked": _atracado,
+    "MarketBuy": _compra,
+    "Market": _mercado,
+    "Location": _posicao,
+    "FSDJump": _posicao,
+    "CarrierJump": _posicao,
+    "FSSSignalDiscovered": _sinal,
+    "Commander": _comandante,
+    "LoadGame": _comandante,
+}
+
+
+def tipo_evento(linha):
+    # O jogo sempre grava `"event":"Nome"`; o regex só cobre journals reformatados
+    i = linha.find(_MARCA_EVENTO)
+    if i >= 0:
+        inicio = i + len(_MARCA_EVENTO)
+        return linha[inicio:linha.find('"', inicio)]
+    m = _RE_EVENTO.search(linha)
+    return m.group(1) if m else None
+
+
+# Devolve o registro tipado da linha, ou None se o evento não interessa.
+# Eventos fora de `conversores` são descartados sem passar pelo json.
+def decodificar(linha, conversores=CONVERSORES):
+    conversor = conversores.get(tipo_evento(linha))
+    if conversor is None:
+        return None
+    if conversor is _sinal and PREFIXO_CONSTRUCAO not in linha:
+        return None
+    try:
+        dado = carregar_json(linha)
+    except ErroJson:
+        return None
+    if not isinstance(dado, dict):
+        return None
+    return conversor(dado)
+
+
+def _decodificar_tudo(linhas):
+    # Caminho antigo: json.loads em todas as linhas e adivinhar a lista de materiais
+    resultado = []
+    for linha in linhas:
+        try:
+            registro = json.loads(linha)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(registro, dict):
+            for valor in registro.values():
+                if isinstance(valor, list) and all(
+                    isinstance(x, dict) and 'Name_Localised' in x and
+                    'RequiredAmount' in x and 'ProvidedAmount' in x
+                    for x in valor
+                ):
+                    resultado.append(valor)
+    return resultado
+
+
+if __name__ == "__main__":
+    # Compara o json.loads de todas as linhas com o pré-filtro + decodificação tipada
+    import glob
+    arquivos = sys.argv[1:] or sorted(glob.glob("Journal.*.log"))
+    linhas = []
+    for caminho in arquivos:
+        with open(caminho, "r", encoding="utf-8") as f:
+            linhas.extend(f.readlines())
+
+    def medir(func, repeticoes=5):
+        melhor = float("inf")
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            func(linhas)
+            melhor = min(melhor, time.perf_counter() - inicio)
+        return melhor
+
+    t_json = medir(_decodificar_tudo)
+    t_tipado = medir(lambda ls: [r for r in map(decodificar, ls) if r is not None])
+    print(f"{len(arquivos)} arquivo(s), {len(linhas)} linhas, backend: {'orjson' if orjson else 'json'}")
+    print(f"json.loads + busca de listas:   {t_json * 1000:8.1f} ms")
+    print(f"pré-filtro + registros tipados: {t_tipado * 1000:8.1f} ms  ({t_json / t_tipado:.1f}x)")
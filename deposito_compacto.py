@@ -0,0 +1,152 @@
+# deposito_compacto.py
+
+import sys
+from array import array
+
+from impressao import impressao_material, trocar_material
+
+
+# Tabela global de mercadorias: cada (Name, Name_Localised, Payment) vira
+# um índice pequeno, guardado uma vez só para todos os depósitos. Uma
+# entrada nunca muda depois de criada: um depósito que recebe outra
+# localização (cliente com o jogo em outro idioma) ou outro pagamento
+# passa a apontar para outra entrada, sem mexer nos demais depósitos nem
+# nas impressões que já foram somadas.
+class TabelaMercadorias:
+
+    def __init__(self):
+        self.indices = {}  # {(Name, Name_Localised, Payment): índice}
+        self.nomes = []
+        self.localizados = []
+        self.pagamentos = []
+
+    def indice(self, nome, localizado=None, pagamento=None):
+        chave = (nome, localizado or nome, pagamento or 0)
+        i = self.indices.get(chave)
+        if i is None:
+            i = self.indices[chave] = len(self.nomes)
+            self.nomes.append(sys.intern(nome))
+            self.localizados.append(sys.intern(chave[1]))
+            self.pagamentos.append(chave[2])
+        return i
+
+    def como_dict(self, i, requerido, fornecido):
+        return {
+            "Name": self.nomes[i],
+            "Name_Localised": self.localizados[i],
+            "RequiredAmount": requerido,
+            "ProvidedAmount": fornecido,
+            "Payment": self.pagamentos[i],
+        }
+
+
+MERCADORIAS = TabelaMercadorias()
+
+
+# Estado dos materiais de um depósito em poucos objetos: índices da
+# MERCADORIAS e vetores de requerido/fornecido/marca. Os totais, a
+# contagem de materiais entregues e a impressão (impressao.py) são
+# atualizados a cada material que muda, então progresso e percentual
+# entregue saem em O(1). Iterar devolve os dicts no formato do journal.
+#
+# Cada material guarda o instante do journal da leitura que o definiu
+# (`marcas`), então uma leitura mais antiga que chega depois (outro
+# comandante, fila atrasada) nunca sobrescreve uma mais nova. Uma leitura
+# sem instante (cliente antigo, sem timestamp) é aplicada sem mexer nas
+# marcas, para não passar na frente das leituras do journal.
+class DepositoCompacto:
+    __slots__ = ("indices", "requerido", "fornecido", "marcas", "total_requerido", "total_fornecido",
+                 "entregues", "impressao")
+
+    def __init__(self):
+        self.indices = array("H")
+        self.requerido = array("l")
+        self.fornecido = array("l")
+        self.marcas = array("d")
+        self.total_requerido = 0
+        self.total_fornecido = 0
+        self.entregues = 0
+        self.impressao = 0
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __iter__(self):
+        for i, requerido, fornecido in zip(self.indices, self.requerido, self.fornecido):
+            yield MERCADORIAS.como_dict(i, requerido, fornecido)
+
+    def _posicao(self, nome):
+        for p, i in enumerate(self.indices):
+            if MERCADORIAS.nomes[i] == nome:
+                return p
+        return None
+
+    def _impressao(self, p):
+        i = self.indices[p]
+        return impressao_material(MERCADORIAS.nomes[i], MERCADORIAS.localizados[i], self.requerido[p],
+                                  self.fornecido[p])
+
+    # Aplica um material (dict do journal) lido no `instante`; True se mudou
+    def definir(self, m, instante=0.0):
+        nome = m.get("Name") or m.get("Name_Localised")
+        localizado, pagamento = m.get("Name_Localised"), m.get("Payment")
+        requerido, fornecido = m.get("RequiredAmount", 0), m.get("ProvidedAmount", 0)
+        p = self._posicao(nome)
+        if p is not None:
+            # Sem localização ou pagamento na leitura, ficam os que o depósito já tinha
+            atual = self.indices[p]
+            localizado = localizado or MERCADORIAS.localizados[atual]
+            pagamento = MERCADORIAS.pagamentos[atual] if pagamento is None else pagamento
+        i = MERCADORIAS.indice(nome, localizado, pagamento)
+        if p is None:
+            p = len(self.indices)
+            self.indices.append(i)
+            self.requerido.append(0)
+            self.fornecido.append(0)
+            self.marcas.append(instante or 0.0)
+            antiga = 0
+        else:
+            if instante is not None:
+                if self.marcas[p] > instante:
+                    return False
+                self.marcas[p] = instante
+            if self.indices[p] == i and self.requerido[p] == requerido and self.fornecido[p] == fornecido:
+                return False
+            antiga = self._impressao(p)
+            self.indices[p] = i
+            self.total_requerido -= self.requerido[p]
+            self.total_fornecido -= self.fornecido[p]
+            self.entregues -= self.fornecido[p] >= self.requerido[p]
+        self.requerido[p] = requerido
+        self.fornecido[p] = fornecido
+        self.total_requerido += requerido
+        self.total_fornecido += fornecido
+        self.entregues += fornecido >= requerido
+        self.impressao = trocar_material(self.impressao, antiga, self._impressao(p))
+        return True
+
+    # Leitura completa ou delta; True se algum material mudou
+    def aplicar(self, materiais, instante=0.0):
+        mudou = False
+        for m in materiais:
+            mudou = self.definir(m, instante) or mudou
+        return mudou
+
+    @property
+    def progresso(self):
+        return self.total_fornecido / self.total_requerido if self.total_requerido else 0.0
+
+    @property
+    def fracao_entregue(self):
+        return self.entregues / len(self.indices) if self.indices else 0.0
+
+    @property
+    def completo(self):
+        return bool(self.indices) and self.entregues == len(self.indices)
+
+    @classmethod
+    def de_materiais(cls, materiais, marcas=None):
+        deposito = cls()
+        for p, m in enumerate(materiais):
+            deposito.definir(m, marcas[p] if marcas else 0.0)
+        return deposito
@@ -0,0 +1,118 @@
+# discord_falso.py
+
+import asyncio
+import collections
+import itertools
+import random
+import time
+
+import discord
+
+_ids = itertools.count(1_000_000)
+Reacao = collections.namedtuple("Reacao", "emoji")
+RespostaFalsa = collections.namedtuple("RespostaFalsa", "status reason")
+
+
+# Substitutos em memória para o discord.AutoShardedClient e companhia, com
+# só o que o servidor, os bots e a FilaDiscord usam. Servem para benchmarks
+# e testes de carga sem rede: cada operação fica contada em `operacoes` do
+# cliente. Cada chamada à API:
+# - demora `latencia` segundos, mais até `variacao` sorteados (a rede);
+# - gasta `custo` segundos de CPU (montar e ler a requisição HTTP);
+# - com probabilidade `taxa_429`, falha com 429 e retry_after de
+#   `retry_after` segundos, como o Discord quando passa do limite.
+# Editar ou reagir numa mensagem apagada (ou que não existe, ex.: ID salvo
+# de outra execução) dá discord.NotFound.
+class MensagemFalsa:
+
+    def __init__(self, canal, content, mensagem_id=None, apagada=False):
+        self.id = mensagem_id or next(_ids)
+        self.canal = canal
+        self.content = content
+        self.reactions = []
+        self.apagada = apagada
+
+    async def _chamar(self, operacao):
+        await self.canal.cliente.chamar(operacao)
+        if self.apagada:
+            raise discord.NotFound(RespostaFalsa(404, "Not Found"), {"message": "Unknown Message", "code": 10008})
+
+    async def edit(self, content=None):
+        await self._chamar("editar")
+        self.content = content
+
+    async def add_reaction(self, emoji):
+        await self._chamar("reagir")
+        self.reactions.append(Reacao(emoji))
+
+    async def delete(self):
+        await self._chamar("apagar")
+        self.apagada = True
+        self.canal.mensagens.pop(self.id, None)
+
+
+class CanalFalso:
+
+    def __init__(self, cliente, canal_id):
+        self.cliente = cliente
+        self.id = canal_id
+        self.mensagens = {}  # {id: MensagemFalsa}
+
+    async def send(self, content):
+        await self.cliente.chamar("enviar")
+        mensagem = MensagemFalsa(self, content)
+        self.mensagens[mensagem.id] = mensagem
+        return mensagem
+
+    def get_partial_message(self, mensagem_id):
+        mensagem = self.mensagens.get(mensagem_id)
+        return mensagem if mensagem is not None else MensagemFalsa(self, None, mensagem_id, apagada=True)
+
+
+class ClienteFalso:
+
+    def __init__(self, shard_count=1, shard_ids=None, latencia=0.0, custo=0.0, variacao=0.0, taxa_429=0.0,
+                 retry_after=1.0, semente=0):
+        self.shard_count = shard_count
+        self.shard_ids = shard_ids if shard_ids is not None else list(range(shard_count))
+        self.latencia = latencia
+        self.custo = custo
+        self.variacao = variacao
+        self.taxa_429 = taxa_429
+        self.retry_after = retry_after
+        self.sorteio = random.Random(semente)
+        self.canais = {}  # {id: CanalFalso}
+        self.operacoes = collections.Counter()  # enviar, editar, reagir, apagar, 429
+
+    async def chamar(self, operacao):
+        self.operacoes[operacao] += 1
+        if self.custo:
+            fim = time.perf_counter() + self.custo
+            while time.perf_counter() < fim:
+                pass
+        espera = self.latencia + (self.sorteio.uniform(0, self.variacao) if self.variacao else 0.0)
+        if espera:
+            await asyncio.sleep(espera)
+        if self.taxa_429 and self.sorteio.random() < self.taxa_429:
+            self.operacoes["429"] += 1
+            erro = discord.HTTPException(RespostaFalsa(429, "Too Many Requests"),
+                                         {"message": "You are being rate limited.", "code": 0})
+            erro.retry_after = self.retry_after
+            raise erro
+
+    async def start(self, token=None):
+        pass
+
+    async def close(self):
+        pass
+
+    def is_ready(self):
+        return True
+
+    async def wait_until_ready(self):
+        pass
+
+    def get_channel(self, canal_id):
+        if canal_id not in self.canais:
+            self.canais[canal_id] = CanalFalso(self, canal_id)
+        return self.canais[canal_id]
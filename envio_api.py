@@ -0,0 +1,199 @@
+# envio_api.py
+
+import gzip
+import json
+import os
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from impressao import etiqueta_deposito, formatar_if_none_match
+from metricas import Contador, Histograma
+
+PASTA_FILA = "fila_envio"
+PASTA_REJEITADOS = "rejeitados"  # dentro da pasta da fila: lotes que o servidor recusou de vez
+LOTE_MAXIMO = 50  # itens da fila por POST
+ESPERA_INICIAL = 1.0  # segundos até a primeira nova tentativa
+ESPERA_MAXIMA = 300.0
+
+LATENCIA_ENVIO = Histograma("botelite_envio_latencia_segundos", "Duração de cada POST de lote para o servidor")
+ENVIOS = Contador("botelite_envios_total", "POSTs de lote para o servidor, por resultado", ("resultado",))
+
+
+# 4xx que não é limite de requisições: reenviar o mesmo lote dá o mesmo erro
+def _permanente(status):
+    return 400 <= status < 500 and status != 429
+
+
+# Envia o progresso dos depósitos para o servidor:
+# - uma única Session com keep-alive, então o TLS é negociado uma vez só;
+# - corpo JSON comprimido com gzip;
+# - por MarketID, só os materiais cujo ProvidedAmount mudou desde o último envio;
+#   com a impressão dos materiais (RastreadorInstalacoes.impressoes), um
+#   depósito igual ao último envio é descartado sem comparar material por material;
+# - fila em disco (um arquivo por item, em ordem), reenviada com espera
+#   exponencial quando o servidor não responde (rede, 5xx, 429), sem
+#   perder atualizações. Um lote recusado com 4xx (400 dados inválidos,
+#   403 chave de API sem canal) não melhora tentando de novo: vai para
+#   PASTA_REJEITADOS e a fila segue.
+class EnviadorAPI:
+
+    def __init__(self, url, pasta_fila=PASTA_FILA, armazenamento=None, timeout=15, chave_api=None):
+        self.url = url
+        self.pasta_fila = pasta_fila
+        self.armazenamento = armazenamento
+        self.timeout = timeout
+        self.sessao = requests.Session()
+        self.sessao.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.sessao.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.sessao.headers.update({"Content-Type": "application/json", "Content-Encoding": "gzip"})
+        if chave_api:
+            self.sessao.headers["X-Chave-Api"] = chave_api
+        os.makedirs(pasta_fila, exist_ok=True)
+        self._sequencia = max((int(n.split(".")[0]) for n in self._pendentes()), default=0)
+        self._espera = 0.0
+        self._proxima_tentativa = 0.0
+        # {MarketID: {Name: material}}: o último estado já colocado na fila
+        self._base = {}
+        # {MarketID: [instalação, timestamp, fontes]} da leitura que virou a base,
+        # para um reenvio completo levar o instante do journal e não o do servidor
+        self._leituras = {}
+        if armazenamento is not None:
+            self._base = {int(k): v for k, v in armazenamento.valor("base_envio", {}).items()}
+            self._leituras = {int(k): v for k, v in armazenamento.valor("leitura_envio", {}).items()}
+        self._etiquetas = {}  # {MarketID: etiqueta do último estado colocado na fila}
+
+    def _pendentes(self):
+        return sorted(n for n in os.listdir(self.pasta_fila) if n.endswith(".json"))
+
+    @property
+    def tamanho_fila(self):
+        return len(self._pendentes())
+
+    def _salvar_base(self):
+        if self.armazenamento is not None:
+            self.armazenamento.salvar_valor("base_envio", self._base)
+            self.armazenamento.salvar_valor("leitura_envio", self._leituras)
+
+    # Monta o delta do depósito em relação ao último envio; None se nada mudou.
+    # `fontes` (IndiceMercados.fontes) vai junto para o servidor mostrar na mensagem.
+    def montar_delta(self, market_id, instalacao, materiais, timestamp=None, fontes=None):
+        base = self._base.get(market_id)
+        completo = base is None
+        if completo:
+            alterados = list(materiais)
+        else:
+            alterados = [m for m in materiais
+                         if m["Name"] not in base or base[m["Name"]]["ProvidedAmount"] != m["ProvidedAmount"]]
+            if not alterados:
+                return None
+        self._base[market_id] = {m["Name"]: m for m in materiais}
+        self._leituras[market_id] = [instalacao, timestamp, fontes]
+        delta = {
+            "market_id": market_id,
+            "instalacao": instalacao,
+            "timestamp": timestamp,
+            "completo": completo,
+            "materiais": alterados,
+        }
+        if fontes is not None:
+            delta["fontes"] = fontes
+        return delta
+
+    def enfileirar(self, item):
+        self._sequencia += 1
+        caminho = os.path.join(self.pasta_fila, f"{self._sequencia:012d}.json")
+        temporario = caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(item, f, ensure_ascii=False)
+        os.replace(temporario, caminho)
+
+    def atualizar(self, market_id, instalacao, materiais, timestamp=None, fontes=None, impressao=None):
+        etiqueta = None
+        if impressao is not None:
+            etiqueta = etiqueta_deposito(impressao, instalacao, fontes)
+            if self._etiquetas.get(market_id) == etiqueta:
+                return False
+        delta = self.montar_delta(market_id, instalacao, materiais, timestamp, fontes)
+        if delta is None:
+            return False
+        if etiqueta is not None:
+            # Vai no If-None-Match: num reenvio de algo que o servidor já aplicou, a resposta é 304
+            delta["etiqueta"] = self._etiquetas[market_id] = etiqueta
+        self.enfileirar(delta)
+        self._salvar_base()
+        return True
+
+    def _agendar_nova_tentativa(self, quantidade, erro):
+        ENVIOS.inc(resultado="erro")
+        self._espera = min(ESPERA_MAXIMA, self._espera * 2 or ESPERA_INICIAL)
+        self._proxima_tentativa = time.monotonic() + self._espera
+        print(f"[ERRO] Falha ao enviar dados ({quantidade} na fila): {erro}. Nova tentativa em {self._espera:.0f}s")
+
+    def _rejeitar(self, nomes, erro):
+        ENVIOS.inc(resultado="rejeitado")
+        pasta = os.path.join(self.pasta_fila, PASTA_REJEITADOS)
+        os.makedirs(pasta, exist_ok=True)
+        for nome in nomes:
+            os.replace(os.path.join(self.pasta_fila, nome), os.path.join(pasta, nome))
+        print(f"[ERRO] Servidor recusou {len(nomes)} atualização(ões): {erro}. Guardadas em {pasta}")
+
+    # Quanto tempo o laço principal pode dormir antes da próxima tentativa
+    def espera_sugerida(self, padrao):
+        if not self._pendentes():
+            return padrao
+        return max(0.0, min(padrao, self._proxima_tentativa - time.monotonic()))
+
+    # Envia a fila em ordem, em lotes; para no primeiro erro e agenda a
+    # próxima tentativa com espera exponencial
+    def despachar(self):
+        enviados = 0
+        while time.monotonic() >= self._proxima_tentativa:
+            nomes = self._pendentes()[:LOTE_MAXIMO]
+            if not nomes:
+                break
+            lote = []
+            for nome in nomes:
+                with open(os.path.join(self.pasta_fila, nome), "r", encoding="utf-8") as f:
+                    lote.append(json.load(f))
+            corpo = gzip.compress(json.dumps({"lote": lote}, ensure_ascii=False).encode("utf-8"))
+            cabecalhos = {}
+            if all(item.get("etiqueta") for item in lote):
+                cabecalhos["If-None-Match"] = formatar_if_none_match((i["market_id"], i["etiqueta"]) for i in lote)
+            try:
+                with LATENCIA_ENVIO.cronometrar():
+                    resp = self.sessao.post(self.url, data=corpo, headers=cabecalhos, timeout=self.timeout)
+                resp.raise_for_status()
+                resposta = {} if resp.status_code == 304 else resp.json()
+            except requests.HTTPError as e:
+                if e.response is None or not _permanente(e.response.status_code):
+                    self._agendar_nova_tentativa(len(nomes), e)
+                    break
+                self._rejeitar(nomes, e)
+                continue
+            except (requests.RequestException, ValueError) as e:
+                self._agendar_nova_tentativa(len(nomes), e)
+                break
+
+            for nome in nomes:
+                os.remove(os.path.join(self.pasta_fila, nome))
+            enviados += len(nomes)
+            ENVIOS.inc(resultado="ok")
+            self._espera = 0.0
+            print(f"[API] {resp.status_code} - {len(nomes)} atualização(ões) enviada(s)")
+
+            # O servidor não conhecia esses depósitos (reiniciou sem estado):
+            # o próximo envio deles vai completo
+            reenviar = resposta.get("reenviar", [])
+            for market_id in reenviar:
+                base = self._base.pop(market_id, None)
+                instalacao, timestamp, fontes = self._leituras.pop(market_id, None) or (None, None, None)
+                self._etiquetas.pop(market_id, None)
+                if base is not None:
+                    instalacao = instalacao or next(
+                        (i["instalacao"] for i in lote if i.get("market_id") == market_id), None)
+                    self.atualizar(market_id, instalacao, list(base.values()), timestamp, fontes)
+            if reenviar:
+                self._salvar_base()
+        return enviados
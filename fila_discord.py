@@ -0,0 +1,173 @@
+# fila_discord.py
+
+import asyncio
+import collections
+import time
+
+import discord
+
+from metricas import Histograma
+
+# Limite do Discord para criar/editar mensagens num mesmo canal (~5 a cada 5 s)
+LIMITE_POR_ROTA = 5
+PERIODO_LIMITE = 5.0
+CAPACIDADE_FILA = 1000
+
+LATENCIA_DISCORD = Histograma("botelite_discord_latencia_segundos", "Duração das chamadas à API do Discord",
+                              ("rota", "operacao"))
+
+
+# Balde de fichas de uma rota da API: no máximo `capacidade` chamadas por
+# `periodo` segundos. `aguardar` dorme até haver ficha, em vez de deixar o
+# Discord devolver 429.
+class BaldeLimite:
+
+    def __init__(self, capacidade=LIMITE_POR_ROTA, periodo=PERIODO_LIMITE):
+        self.capacidade = capacidade
+        self.periodo = periodo
+        self.fichas = float(capacidade)
+        self.atualizado = time.monotonic()
+        self.bloqueado_ate = 0.0
+
+    def _repor(self):
+        agora = time.monotonic()
+        self.fichas = min(self.capacidade, self.fichas + (agora - self.atualizado) * self.capacidade / self.periodo)
+        self.atualizado = agora
+
+    # Usado quando o Discord responde 429 mesmo assim
+    def bloquear(self, segundos):
+        self.bloqueado_ate = max(self.bloqueado_ate, time.monotonic() + segundos)
+        self.fichas = 0.0
+
+    async def aguardar(self):
+        while True:
+            agora = time.monotonic()
+            if agora < self.bloqueado_ate:
+                await asyncio.sleep(self.bloqueado_ate - agora)
+                continue
+            self._repor()
+            if self.fichas >= 1:
+                self.fichas -= 1
+                return
+            await asyncio.sleep((1 - self.fichas) * self.periodo / self.capacidade)
+
+
+# Fila de saída para o Discord. Cada instalação tem no máximo uma
+# atualização pendente: se chegar outra antes do envio, só o conteúdo mais
+# novo fica (uma única edição). Sempre que existe mensagem, ela é editada;
+# só cria mensagem nova quando não há nenhuma (ou ela foi apagada).
+#
+# Cada rota (canal) tem a sua fila de chaves e o seu trabalhador, que só
+# espera pelo balde da própria rota: um canal no limite não segura os
+# outros, e canais diferentes publicam ao mesmo tempo. O trabalhador de
+# uma rota termina quando ela esvazia e volta com o próximo agendamento.
+#
+# obter_canal(chave): canal de destino da instalação
+# obter_mensagem(chave): mensagem atual da instalação ou None
+# ao_publicar(chave, mensagem): corrotina chamada depois de cada envio/edição
+# aguardar_pronto(): corrotina que só retorna com o bot conectado; o que for
+#   agendado antes disso espera na fila em vez de se perder
+class FilaDiscord:
+
+    def __init__(self, obter_canal, obter_mensagem, ao_publicar=None, capacidade=CAPACIDADE_FILA,
+                 aguardar_pronto=None):
+        self.obter_canal = obter_canal
+        self.obter_mensagem = obter_mensagem
+        self.ao_publicar = ao_publicar
+        self.aguardar_pronto = aguardar_pronto
+        self.capacidade = capacidade
+        self.pendentes = {}  # {chave: conteúdo}
+        self.rotas = collections.defaultdict(collections.OrderedDict)  # {rota: {chave: None}}, em ordem de chegada
+        self.baldes = collections.defaultdict(BaldeLimite)  # {rota: BaldeLimite}
+        self.contadores = collections.Counter()  # agendadas, coalescidas, descartadas, enviadas, editadas, erros
+        self._trabalhadores = {}  # {rota: Task}
+        self._iniciada = False
+
+    @property
+    def profundidade(self):
+        return len(self.pendentes)
+
+    def estatisticas(self):
+        return {"profundidade": self.profundidade, **self.contadores}
+
+    def agendar(self, chave, conteudo):
+        if chave in self.pendentes:
+            self.pendentes[chave] = conteudo
+            self.contadores["coalescidas"] += 1
+            return True
+        if len(self.pendentes) >= self.capacidade:
+            self.contadores["descartadas"] += 1
+            return False
+        self.pendentes[chave] = conteudo
+        rota = self._rota(chave)
+        self.rotas[rota][chave] = None
+        self.contadores["agendadas"] += 1
+        self._acordar(rota)
+        return True
+
+    def _acordar(self, rota):
+        if self._iniciada and rota not in self._trabalhadores:
+            self._trabalhadores[rota] = asyncio.create_task(self._processar(rota))
+
+    def iniciar(self):
+        self._iniciada = True
+        for rota in list(self.rotas):
+            self._acordar(rota)
+
+    async def esvaziar(self):
+        while self.pendentes or self._trabalhadores:
+            await asyncio.sleep(0.01)
+
+    async def _processar(self, rota):
+        fila = self.rotas[rota]
+        try:
+            while fila:
+                if self.aguardar_pronto is not None:
+                    await self.aguardar_pronto()
+                # A ficha sai antes de a chave sair da fila: o que chegar
+                # enquanto espera ainda entra nesta mesma edição
+                await self.baldes[rota].aguardar()
+                if not fila:
+                    break
+                chave, _ = fila.popitem(last=False)
+                conteudo = self.pendentes.pop(chave)
+                try:
+                    await self._publicar(chave, conteudo, rota)
+                except discord.HTTPException as e:
+                    if e.status == 429:
+                        # Volta para a frente da fila, a menos que já tenha chegado algo mais novo
+                        self.pendentes.setdefault(chave, conteudo)
+                        fila[chave] = None
+                        fila.move_to_end(chave, last=False)
+                        self.baldes[rota].bloquear(getattr(e, "retry_after", None) or PERIODO_LIMITE)
+                    else:
+                        self.contadores["erros"] += 1
+                        print(f"Erro ao publicar {chave}: {e}")
+                except Exception as e:
+                    self.contadores["erros"] += 1
+                    print(f"Erro ao publicar {chave}: {e}")
+        finally:
+            del self._trabalhadores[rota]
+            if not fila:
+                del self.rotas[rota]
+
+    def _rota(self, chave):
+        canal = self.obter_canal(chave)
+        return f"mensagens:{getattr(canal, 'id', None)}"
+
+    async def _publicar(self, chave, conteudo, rota):
+        canal = self.obter_canal(chave)
+        mensagem = self.obter_mensagem(chave)
+        if mensagem is not None:
+            try:
+                with LATENCIA_DISCORD.cronometrar(rota=rota, operacao="editar"):
+                    await mensagem.edit(content=conteudo)
+                self.contadores["editadas"] += 1
+            except discord.NotFound:
+                mensagem = None
+        if mensagem is None:
+            with LATENCIA_DISCORD.cronometrar(rota=rota, operacao="enviar"):
+                mensagem = await canal.send(conteudo)
+            self.contadores["enviadas"] += 1
+        if self.ao_publicar is not None:
+            await self.ao_publicar(chave, mensagem)
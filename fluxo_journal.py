@@ -0,0 +1,151 @@
+# fluxo_journal.py
+
+import asyncio
+
+from decodificador_journal import decodificar
+from leitor_journal import LeitorJournal
+from metricas import Histograma
+
+TEMPO_LEITURA = Histograma("botelite_journal_leitura_segundos",
+                           "Tempo de cada atualização do fluxo (leitura, decodificação e assinantes)")
+
+
+def _decodificar(linhas):
+    for linha in linhas:
+        registro = decodificar(linha)
+        if registro is not None:
+            yield registro
+
+
+# O journal como um fluxo de registros tipados, lido uma vez só e repartido
+# entre vários assinantes (tabela no console, envio para a API, bot do
+# Discord, ...). Com `indice`, segue sempre o journal mais recente da pasta
+# e atravessa as partes de uma mesma sessão (Continued / part > 1); sem ele,
+# segue só o arquivo `caminho`.
+#
+# Assinante é qualquer objeto com processar(registro). Opcionais:
+#   reiniciar(): sessão nova ou journal truncado; o estado da sessão recomeça
+#   concluir(): chamado ao fim de cada atualização
+#   espera(padrao): quanto o laço de executar() pode dormir, no máximo
+#   exportar() / carregar(dados): para assinantes registrados com nome, cujo
+#     estado vai no checkpoint junto com a posição de leitura
+class FluxoJournal:
+
+    def __init__(self, indice=None, caminho=None):
+        self.indice = indice
+        self.caminho = caminho
+        self.leitor = None
+        self.assinantes = []
+        self.nomeados = {}  # {nome: assinante}
+
+    def assinar(self, assinante, nome=None):
+        self.assinantes.append(assinante)
+        if nome is not None:
+            self.nomeados[nome] = assinante
+        return assinante
+
+    def _avisar(self, metodo, *args):
+        for assinante in self.assinantes:
+            funcao = getattr(assinante, metodo, None)
+            if funcao is not None:
+                funcao(*args)
+
+    # Registros novos desde a chamada anterior. `alterados`: caminhos
+    # avisados pelo ObservadorJournal. Ao começar no meio de uma sessão,
+    # relê as partes anteriores para recuperar o contexto.
+    def registros(self, alterados=None):
+        if self.indice is None:
+            if self.leitor is None:
+                self.leitor = LeitorJournal(self.caminho)
+        else:
+            self.indice.atualizar(alterados)
+            recente = self.indice.mais_recente()
+            if recente is None:
+                return
+            if recente != self.caminho:
+                partes = self.indice.sessao(recente)
+                if self.caminho in partes:
+                    # Continuação: termina o arquivo atual e segue para as próximas partes
+                    yield from _decodificar(self.leitor.ler_linhas())
+                    partes = partes[partes.index(self.caminho) + 1:]
+                else:
+                    self._avisar("reiniciar")
+                for caminho in partes:
+                    self.caminho = caminho
+                    self.leitor = LeitorJournal(caminho)
+                    if caminho != recente:
+                        yield from _decodificar(self.leitor.ler_linhas())
+
+        linhas = self.leitor.ler_linhas()
+        if self.leitor.reiniciou:
+            self._avisar("reiniciar")
+        yield from _decodificar(linhas)
+
+    # Mesma coisa, como iterador assíncrono: lê e decodifica cada trecho
+    # novo numa thread (fora do loop, como os bots) e também espera o
+    # observador numa thread, entregando os registros conforme o journal cresce
+    async def eventos(self, observador, timeout=None):
+        alterados = None
+        while True:
+            for registro in await asyncio.to_thread(self._ler, alterados):
+                yield registro
+            alterados = await asyncio.to_thread(observador.esperar, timeout)
+
+    def _ler(self, alterados):
+        return list(self.registros(alterados))
+
+    # Entrega os registros novos a todos os assinantes; devolve quantos foram
+    def atualizar(self, alterados=None):
+        total = 0
+        with TEMPO_LEITURA.cronometrar():
+            for registro in self.registros(alterados):
+                for assinante in self.assinantes:
+                    assinante.processar(registro)
+                total += 1
+        self._avisar("concluir")
+        return total
+
+    def espera(self, padrao):
+        return min([padrao] + [a.espera(padrao) for a in self.assinantes if hasattr(a, "espera")])
+
+    # Laço das ferramentas de linha de comando: atualiza, salva o checkpoint
+    # se a posição mudou e dorme até o journal mudar
+    def executar(self, observador, intervalo, armazenamento=None, chave="sessao"):
+        ultimo = None
+        alterados = None
+        while True:
+            self.atualizar(alterados)
+            if armazenamento is not None:
+                checkpoint = self.exportar()
+                if checkpoint and checkpoint["posicao"] != ultimo:
+                    armazenamento.salvar_checkpoint(chave, checkpoint)
+                    ultimo = checkpoint["posicao"]
+            alterados = observador.esperar(timeout=self.espera(intervalo))
+
+    def exportar(self):
+        if self.leitor is None:
+            return None
+        return {
+            "caminho": self.caminho,
+            "posicao": self.leitor.posicao(),
+            "estados": {nome: assinante.exportar() for nome, assinante in self.nomeados.items()},
+        }
+
+    # Só retoma se o checkpoint trouxer o estado de todos os assinantes com
+    # nome; senão relê do início (um checkpoint antigo cai nesse caso)
+    def restaurar(self, dados):
+        if not dados:
+            return False
+        estados = dados.get("estados", {})
+        if any(nome not in estados for nome in self.nomeados):
+            return False
+        if self.indice is None and dados["caminho"] != self.caminho:
+            return False
+        leitor = LeitorJournal(dados["caminho"])
+        if not leitor.restaurar(dados["posicao"]):
+            return False
+        for nome, assinante in self.nomeados.items():
+            assinante.carregar(estados[nome])
+        self.caminho = dados["caminho"]
+        self.leitor = leitor
+        return True
@@ -0,0 +1,262 @@
+# gerador_carga.py
+
+import argparse
+import asyncio
+import collections
+import glob
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+
+import gerador_journal
+from decodificador_journal import DepositoConstrucao
+from fluxo_journal import FluxoJournal
+from impressao import etiqueta_deposito, formatar_if_none_match
+from instalacoes import RastreadorInstalacoes
+
+PASTA_JOURNALS = "bench_journals"  # mesma pasta do benchmark.py
+ESPERA_MAXIMA_ESVAZIAR = 120  # segundos esperando as filas do servidor depois da carga
+DESLOCAMENTO_CLIENTE = 10_000  # MarketIDs de cada cliente, para não caírem nos mesmos depósitos
+# Configurações medidas quando nenhuma é passada: "nome:CHAVE=valor,..."
+CONFIGURACOES_PADRAO = (
+    "padrao:latencia=0.05",
+    "discord_429:latencia=0.05,variacao=0.05,taxa_429=0.05",
+    "ingestao_1:TRABALHADORES_INGESTAO=1,latencia=0.05",
+    "shards_4:DISCORD_SHARDS=4,latencia=0.05,esquadroes=16",
+)
+# Chaves em minúsculas que não são do ClienteFalso
+_OPCOES_CARGA = {"finalizacao_segundos", "esquadroes"}
+
+
+# Envios que o cliente faria ao ler o journal: um POST /logdata a cada
+# leitura do depósito que mudou os materiais, igual ao cliente.enviar_para_api
+class GravadorEnvios:
+
+    def __init__(self, rastreador):
+        self.rastreador = rastreador
+        self.envios = []  # [(MarketID, nome, materiais, timestamp, etiqueta)]
+        self._enviadas = {}  # {MarketID: impressão do último envio}
+
+    def processar(self, registro):
+        if not isinstance(registro, DepositoConstrucao) or registro.market_id is None:
+            return
+        market_id = registro.market_id
+        impressao = self.rastreador.impressoes[market_id]
+        if self._enviadas.get(market_id) == impressao:
+            return
+        self._enviadas[market_id] = impressao
+        nome = self.rastreador.nome(market_id)
+        self.envios.append((market_id, nome, self.rastreador.materiais(market_id), registro.timestamp,
+                            etiqueta_deposito(impressao, nome)))
+
+
+def envios_journal(caminho):
+    fluxo = FluxoJournal(caminho=caminho)
+    rastreador = fluxo.assinar(RastreadorInstalacoes())
+    gravador = fluxo.assinar(GravadorEnvios(rastreador))
+    fluxo.atualizar()
+    return gravador.envios
+
+
+# Corpos já serializados e If-None-Match de um cliente, com os MarketIDs
+# somados a `deslocamento`
+def serializar(envios, deslocamento=0):
+    serializados = []
+    for market_id, nome, materiais, timestamp, etiqueta in envios:
+        market_id += deslocamento
+        corpo = json.dumps({"instalacao": nome, "materiais": materiais, "market_id": market_id,
+                            "timestamp": timestamp}, ensure_ascii=False)
+        serializados.append((corpo.encode("utf-8"), formatar_if_none_match([(market_id, etiqueta)])))
+    return serializados
+
+
+# ROTAS_DISCORD com `quantidade` esquadrões, cada um na sua guild e canal
+def rotas_esquadroes(quantidade):
+    return json.dumps({"chaves": {f"esquadrao-{i}": {"guild": i << 22, "canal": 1000 + i}
+                                  for i in range(quantidade)}})
+
+
+def chaves_clientes(clientes, esquadroes):
+    return [f"esquadrao-{i % esquadroes}" if esquadroes else None for i in range(clientes)]
+
+
+def journals_sinteticos(quantidade, tamanho):
+    os.makedirs(PASTA_JOURNALS, exist_ok=True)
+    caminhos = []
+    for semente in range(quantidade):
+        caminho = os.path.join(PASTA_JOURNALS, f"Journal.carga-{tamanho}-s{semente}.log")
+        if not os.path.exists(caminho):
+            gerador_journal.gerar(caminho, gerador_journal.tamanho_em_bytes(tamanho), semente=semente)
+        caminhos.append(caminho)
+    return caminhos
+
+
+# "nome:CHAVE=valor,chave=valor": maiúsculas viram variáveis de ambiente do
+# servidor; minúsculas vão para o ClienteFalso (latencia, variacao, custo,
+# taxa_429, retry_after) ou para a carga (finalizacao_segundos, e
+# esquadroes: clientes divididos entre tantas chaves de API e canais)
+def ler_configuracao(texto):
+    nome, _, opcoes = texto.partition(":")
+    ambiente, falso = {}, {}
+    for opcao in filter(None, opcoes.split(",")):
+        chave, _, valor = opcao.partition("=")
+        if chave.isupper():
+            ambiente[chave] = valor
+        else:
+            falso[chave] = float(valor)
+    return nome, ambiente, falso
+
+
+def percentil(ordenados, fracao):
+    if not ordenados:
+        return None
+    return ordenados[min(len(ordenados) - 1, int(fracao * len(ordenados)))]
+
+
+# Um uploader: os envios do seu journal, um depois do outro, como o cliente
+async def _enviar(http, envios, chave, intervalo, latencias, respostas):
+    cabecalhos = {"Content-Type": "application/json"}
+    if chave:
+        cabecalhos["X-Chave-Api"] = chave
+    for corpo, etiqueta in envios:
+        inicio = time.perf_counter()
+        try:
+            resposta = await http.post("/logdata", content=corpo, headers={**cabecalhos, "If-None-Match": etiqueta})
+            respostas[resposta.status_code] += 1
+        except httpx.HTTPError:
+            respostas["falha"] += 1
+        latencias.append(time.perf_counter() - inicio)
+        if intervalo:
+            await asyncio.sleep(intervalo)
+
+
+async def _carga(http, envios_por_cliente, chaves, intervalo, servidor=None):
+    latencias, respostas = [], collections.Counter()
+    inicio = time.perf_counter()
+    await asyncio.gather(*(_enviar(http, envios, chave, intervalo, latencias, respostas)
+                           for envios, chave in zip(envios_por_cliente, chaves)))
+    segundos = time.perf_counter() - inicio
+    resultado = {"clientes": len(envios_por_cliente), "requisicoes": len(latencias), "segundos": segundos,
+                 "requisicoes_por_segundo": len(latencias) / segundos}
+    latencias.sort()
+    erros = sum(n for status, n in respostas.items() if status == "falha" or status >= 400)
+    resultado.update({
+        "p50_ms": percentil(latencias, 0.50) * 1000, "p99_ms": percentil(latencias, 0.99) * 1000,
+        "taxa_erros": erros / len(latencias), "respostas": {str(status): n for status, n in respostas.items()},
+    })
+    if servidor is not None:
+        # Até o estado e o Discord alcançarem o que foi aceito
+        try:
+            await asyncio.wait_for(servidor.fila_ingestao.join(), ESPERA_MAXIMA_ESVAZIAR)
+            while servidor.saida_discord.profundidade and time.perf_counter() - inicio < ESPERA_MAXIMA_ESVAZIAR:
+                await asyncio.sleep(0.01)
+        except asyncio.TimeoutError:
+            pass
+        resultado["segundos_ate_esvaziar"] = time.perf_counter() - inicio
+        resultado["pendentes_discord"] = servidor.saida_discord.profundidade  # > 0 se a espera estourou
+        resultado["discord"] = dict(servidor.client.operacoes)
+        resultado["fila_discord"] = servidor.saida_discord.estatisticas()
+        resultado["finalizados"] = sum(1 for dados in servidor.rastreio_instalacoes.values() if dados["finalizado"])
+    return resultado
+
+
+async def _carga_local(servidor, envios_por_cliente, chaves, intervalo):
+    for iniciar in servidor.app.router.on_startup:
+        await iniciar()
+    transporte = httpx.ASGITransport(app=servidor.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://carga", timeout=None) as http:
+        return await _carga(http, envios_por_cliente, chaves, intervalo, servidor)
+
+
+# Roda num processo novo: o servidor lê a configuração na importação, e
+# cada configuração começa com banco, filas e Discord falso vazios
+def medir_configuracao(configuracao, envios_por_cliente, intervalo, esquadroes=0):
+    nome, ambiente, opcoes = ler_configuracao(configuracao)
+    esquadroes = int(opcoes.get("esquadroes", esquadroes))
+    banco = os.path.join(tempfile.gettempdir(), f"carga-{os.getpid()}.db")
+    os.environ.update({"DISCORD_CHANNEL_ID": "1", "DISCORD_BOT_TOKEN": "falso", "ARQUIVO_BANCO": banco})
+    if esquadroes:
+        os.environ["ROTAS_DISCORD"] = rotas_esquadroes(esquadroes)
+    os.environ.update(ambiente)
+    try:
+        from discord_falso import ClienteFalso
+        import servidor
+
+        falso = {chave: valor for chave, valor in opcoes.items() if chave not in _OPCOES_CARGA}
+        servidor.client = ClienteFalso(servidor.DISCORD_SHARDS, **falso)
+        if "finalizacao_segundos" in opcoes:
+            servidor.TEMPO_FINALIZACAO_HORAS = opcoes["finalizacao_segundos"] / 3600
+        chaves = chaves_clientes(len(envios_por_cliente), esquadroes)
+        resultado = asyncio.run(_carga_local(servidor, envios_por_cliente, chaves, intervalo))
+        return {"configuracao": nome, "esquadroes": esquadroes, **resultado}
+    finally:
+        for sufixo in ("", "-wal", "-shm"):
+            if os.path.exists(banco + sufixo):
+                os.remove(banco + sufixo)
+
+
+async def _carga_remota(url, envios_por_cliente, chaves, intervalo):
+    limites = httpx.Limits(max_connections=len(envios_por_cliente))
+    async with httpx.AsyncClient(base_url=url, timeout=30, limits=limites) as http:
+        return {"configuracao": url, **await _carga(http, envios_por_cliente, chaves, intervalo)}
+
+
+def imprimir(resultados):
+    print(f"{'configuração':<24} {'clientes':>8} {'req.':>7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'erros':>7} {'esvaziar s':>10}  discord")
+    for r in resultados:
+        esvaziar = r.get("segundos_ate_esvaziar")
+        print(f"{r['configuracao']:<24} {r['clientes']:>8} {r['requisicoes']:>7} {r['requisicoes_por_segundo']:>8.1f} "
+              f"{r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['taxa_erros']:>7.1%} "
+              f"{esvaziar if esvaziar is not None else float('nan'):>10.2f}  {r.get('discord', '')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do /logdata com vários clientes simultâneos")
+    parser.add_argument("--clientes", type=int, default=20, help="uploaders simultâneos")
+    parser.add_argument("--envios", type=int, default=100, help="máximo de POSTs por cliente")
+    parser.add_argument("--intervalo", type=float, default=0.0, help="segundos entre os POSTs de um cliente")
+    parser.add_argument("--journals", help="glob de journals gravados (senão, gera journals sintéticos)")
+    parser.add_argument("--sinteticos", type=int, default=4, help="journals sintéticos diferentes")
+    parser.add_argument("--tamanho", default="1MB", help="tamanho de cada journal sintético")
+    parser.add_argument("--mesmos-depositos", action="store_true",
+                        help="clientes com o mesmo journal enviam os mesmos depósitos (vários comandantes num site)")
+    parser.add_argument("--esquadroes", type=int, default=0,
+                        help="divide os clientes entre tantas chaves de API (X-Chave-Api), cada uma no seu canal")
+    parser.add_argument("--configuracao", action="append",
+                        help='"nome:CHAVE=valor,chave=valor"; pode repetir (padrão: %s)' % ", ".join(CONFIGURACOES_PADRAO))
+    parser.add_argument("--url", help="mede um servidor já rodando (ex.: http://localhost:10000) em vez das configurações")
+    parser.add_argument("--saida", help="acrescenta os resultados (JSON por linha) neste arquivo")
+    args = parser.parse_args()
+
+    caminhos = sorted(glob.glob(args.journals)) if args.journals else journals_sinteticos(args.sinteticos, args.tamanho)
+    if not caminhos:
+        parser.error(f"Nenhum journal encontrado em {args.journals}")
+    envios = [envios_journal(caminho)[:args.envios] for caminho in caminhos]
+    envios_por_cliente = [serializar(envios[i % len(envios)], 0 if args.mesmos_depositos else i * DESLOCAMENTO_CLIENTE)
+                          for i in range(args.clientes)]
+
+    if args.url:
+        chaves = chaves_clientes(args.clientes, args.esquadroes)
+        resultados = [asyncio.run(_carga_remota(args.url, envios_por_cliente, chaves, args.intervalo))]
+    else:
+        resultados = []
+        contexto = multiprocessing.get_context("spawn")
+        for configuracao in args.configuracao or CONFIGURACOES_PADRAO:
+            with ProcessPoolExecutor(1, mp_context=contexto) as processo:
+                resultados.append(processo.submit(medir_configuracao, configuracao, envios_por_cliente,
+                                                  args.intervalo, args.esquadroes).result())
+    imprimir(resultados)
+    if args.saida:
+        with open(args.saida, "a", encoding="utf-8") as f:
+            for r in resultados:
+                f.write(json.dumps({"data": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), **r}) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# gerador_journal.py
+
+import argparse
+import datetime
+import glob
+import json
+import random
+
+from decodificador_journal import CONVERSORES, tipo_evento
+
+MODELOS_PADRAO = "Journal.2025-05-20T141829.01*.log"
+INICIO = datetime.datetime(2025, 5, 20, 14, 18, 29)
+
+# Eventos que o gerador monta; o resto dos modelos vira ruído
+_GERADOS = set(CONVERSORES) | {"Fileheader", "Continued"}
+
+
+def _formatar(valor):
+    # Mesmo estilo do jogo: `{ "chave":valor, ... }` e `[ ... ]`
+    if isinstance(valor, dict):
+        return "{ " + ", ".join(f'"{k}":{_formatar(v)}' for k, v in valor.items()) + " }"
+    if isinstance(valor, list):
+        return "[ " + ", ".join(_formatar(v) for v in valor) + " ]"
+    return json.dumps(valor, ensure_ascii=False)
+
+
+def tamanho_em_bytes(texto):
+    texto = str(texto).strip().upper()
+    for sufixo, fator in (("GB", 1 << 30), ("MB", 1 << 20), ("KB", 1 << 10), ("B", 1)):
+        if texto.endswith(sufixo):
+            return int(float(texto[:-len(sufixo)]) * fator)
+    return int(texto)
+
+
+# Linhas e eventos reais usados como molde: o cabeçalho, o comandante, a
+# lista de materiais de um depósito e os eventos de ruído (com o timestamp
+# separado para troca rápida)
+class Modelos:
+
+    def __init__(self, padrao=MODELOS_PADRAO):
+        self.cabecalho = None
+        self.comandante = None
+        self.materiais = None
+        self.ruido = []  # [(antes do timestamp, depois do timestamp)]
+        for caminho in sorted(glob.glob(padrao)):
+            with open(caminho, "r", encoding="utf-8") as f:
+                for linha in f:
+                    linha = linha.rstrip("\n")
+                    evento = tipo_evento(linha)
+                    if evento == "Fileheader" and self.cabecalho is None:
+                        self.cabecalho = json.loads(linha)
+                    elif evento == "Commander" and self.comandante is None:
+                        self.comandante = json.loads(linha)
+                    elif evento == "ColonisationConstructionDepot" and self.materiais is None:
+                        self.materiais = json.loads(linha)["ResourcesRequired"]
+                    elif evento not in _GERADOS:
+                        i = linha.find('"timestamp":"')
+                        if i >= 0:
+                            self.ruido.append((linha[:i + 13], linha[i + 33:]))
+        if self.cabecalho is None or self.materiais is None or not self.ruido:
+            raise ValueError(f"Nenhum journal de modelo encontrado em {padrao}")
+
+
+class _Deposito:
+
+    def __init__(self, sorteio, modelos, numero):
+        self.market_id = 3_900_000_000 + numero
+        self.nome = f"Planetary Construction Site: Sintético {numero}"
+        self.sistema = f"Sintético {numero % 7}"
+        self.materiais = [dict(m, ProvidedAmount=0, RequiredAmount=max(1, int(m["RequiredAmount"] * sorteio.uniform(0.5, 1.5))))
+                          for m in sorteio.sample(modelos.materiais, k=max(1, len(modelos.materiais) * 3 // 4))]
+
+    @property
+    def completo(self):
+        return all(m["ProvidedAmount"] >= m["RequiredAmount"] for m in self.materiais)
+
+    def progresso(self):
+        requerido = sum(m["RequiredAmount"] for m in self.materiais)
+        return sum(m["ProvidedAmount"] for m in self.materiais) / requerido
+
+
+# Escreve um journal sintético de ~`tamanho` bytes. Cada visita a um
+# depósito tem o salto até o sistema, a compra num mercado, a aproximação, a
+# atracação, algumas leituras do depósito e `contribuicoes` entregas; entre
+# cada evento relevante entram `ruido` eventos de ruído dos modelos.
+def gerar(caminho, tamanho, depositos=5, contribuicoes=3, ruido=2, semente=0, modelos=None):
+    modelos = modelos or Modelos()
+    sorteio = random.Random(semente)
+    instante = INICIO
+    posicoes = {}
+    ativos = [_Deposito(sorteio, modelos, n) for n in range(depositos)]
+    proximo = depositos
+    escritos = 0
+
+    with open(caminho, "w", encoding="utf-8", newline="\n") as f:
+        def escrever(dados):
+            nonlocal instante, escritos
+            instante += datetime.timedelta(seconds=sorteio.randint(1, 20))
+            carimbo = instante.strftime("%Y-%m-%dT%H:%M:%SZ")
+            if dados is None:
+                antes, depois = sorteio.choice(modelos.ruido)
+                linha = antes + carimbo + depois
+            else:
+                linha = _formatar({"timestamp": carimbo, **dados})
+            f.write(linha + "\n")
+            escritos += len(linha.encode("utf-8")) + 1
+
+        def relevante(dados):
+            escrever(dados)
+            for _ in range(ruido):
+                escrever(None)
+
+        def posicao(sistema):
+            if sistema not in posicoes:
+                posicoes[sistema] = [round(sorteio.uniform(-500, 500), 5) for _ in range(3)]
+            return posicoes[sistema]
+
+        escrever({k: v for k, v in modelos.cabecalho.items() if k != "timestamp"})
+        if modelos.comandante is not None:
+            escrever({k: v for k, v in modelos.comandante.items() if k != "timestamp"})
+        while escritos < tamanho:
+            i = sorteio.randrange(len(ativos))
+            deposito = ativos[i]
+            mercado_sistema = f"Mercado {deposito.market_id % 5}"
+            mercado_id = 3_800_000_000 + deposito.market_id % 5
+            relevante({"event": "FSDJump", "StarSystem": mercado_sistema, "SystemAddress": mercado_id,
+                       "StarPos": posicao(mercado_sistema)})
+            relevante({"event": "Docked", "StationName": f"Estação {mercado_id}", "StationType": "Coriolis",
+                       "StarSystem": mercado_sistema, "SystemAddress": mercado_id, "MarketID": mercado_id})
+            faltando = [m for m in deposito.materiais if m["ProvidedAmount"] < m["RequiredAmount"]]
+            carga = sorteio.sample(faltando, k=min(contribuicoes, len(faltando)))
+            for m in carga:
+                relevante({"event": "MarketBuy", "MarketID": mercado_id, "Type": m["Name"][1:-6].lower(),
+                           "Type_Localised": m["Name_Localised"], "Count": 100, "BuyPrice": m["Payment"] // 2,
+                           "TotalCost": 50 * m["Payment"]})
+            relevante({"event": "FSDJump", "StarSystem": deposito.sistema, "SystemAddress": deposito.market_id,
+                       "StarPos": posicao(deposito.sistema)})
+            relevante({"event": "ApproachSettlement", "Name": deposito.nome, "MarketID": deposito.market_id,
+                       "SystemAddress": deposito.market_id, "BodyName": f"{deposito.sistema} A 1"})
+            relevante({"event": "Docked", "StationName": deposito.nome, "StationType": "PlanetaryConstructionDepot",
+                       "StarSystem": deposito.sistema, "SystemAddress": deposito.market_id,
+                       "MarketID": deposito.market_id})
+            for m in carga:
+                quantidade = min(100, m["RequiredAmount"] - m["ProvidedAmount"])
+                m["ProvidedAmount"] += quantidade
+                relevante({"event": "ColonisationContribution", "MarketID": deposito.market_id,
+                           "Contributions": [{"Name": m["Name"], "Name_Localised": m["Name_Localised"],
+                                              "Amount": quantidade}]})
+                # O jogo regrava o depósito a cada poucos segundos enquanto atracado
+                relevante({"event": "ColonisationConstructionDepot", "MarketID": deposito.market_id,
+                           "ConstructionProgress": deposito.progresso(), "ConstructionComplete": deposito.completo,
+                           "ConstructionFailed": False, "ResourcesRequired": deposito.materiais})
+            if deposito.completo:
+                ativos[i] = _Deposito(sorteio, modelos, proximo)
+                proximo += 1
+    return escritos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera journals sintéticos a partir dos journals reais")
+    parser.add_argument("saida")
+    parser.add_argument("--tamanho", default="1MB", help="ex.: 1MB, 250MB, 1GB")
+    parser.add_argument("--depositos", type=int, default=5, help="depósitos ativos ao mesmo tempo")
+    parser.add_argument("--contribuicoes", type=int, default=3, help="entregas por visita a um depósito")
+    parser.add_argument("--ruido", type=int, default=2, help="eventos de ruído depois de cada evento relevante")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--modelos", default=MODELOS_PADRAO, help="glob dos journals usados como molde")
+    args = parser.parse_args()
+    escritos = gerar(args.saida, tamanho_em_bytes(args.tamanho), args.depositos, args.contribuicoes, args.ruido,
+                     args.semente, Modelos(args.modelos))
+    print(f"{args.saida}: {escritos / (1 << 20):.1f} MB")
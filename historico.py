@@ -0,0 +1,76 @@
+# historico.py
+
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from armazenamento import Armazenamento
+from decodificador_journal import CONVERSORES, decodificar, tipo_evento
+from indice_journal import IndiceJournal
+
+PASTA_LOGS = os.path.expanduser(r"~\Saved Games\Frontier Developments\Elite Dangerous")
+
+# Só esses eventos entram na linha do tempo dos depósitos
+_CONVERSORES = {evento: CONVERSORES[evento]
+                for evento in ("ColonisationConstructionDepot", "ColonisationContribution", "MarketBuy")}
+
+
+# Roda num processo separado. Devolve (caminho, hash, eventos); eventos é
+# None quando o conteúdo não mudou desde a última reconstrução. Cada evento
+# leva a linha original do journal, que já é JSON: nada é reserializado e o
+# que volta do processo são só strings, baratas de transferir.
+def extrair_arquivo(caminho, hash_conhecido=None):
+    with open(caminho, "rb") as f:
+        conteudo = f.read()
+    hash_conteudo = hashlib.sha1(conteudo).hexdigest()
+    if hash_conteudo == hash_conhecido:
+        return caminho, hash_conteudo, None
+    eventos = []
+    for linha, texto in enumerate(conteudo.decode("utf-8", errors="replace").splitlines()):
+        registro = decodificar(texto, _CONVERSORES)
+        if registro is None or registro.market_id is None:
+            continue
+        eventos.append((registro.timestamp, linha, registro.market_id, tipo_evento(texto), texto))
+    return caminho, hash_conteudo, eventos
+
+
+# Reconstrói a linha do tempo de todos os journals da pasta. Os arquivos são
+# distribuídos num pool de processos; os resultados voltam em ordem
+# cronológica e são gravados um arquivo por vez. Devolve (processados,
+# ignorados, eventos).
+def reconstruir(pasta, armazenamento, processos=None):
+    indice = IndiceJournal(pasta)
+    indice.atualizar()
+    nomes = indice.ordenados()
+    hashes = armazenamento.hashes_historico()
+    caminhos = [os.path.join(pasta, nome) for nome in nomes]
+    conhecidos = [hashes.get(nome) for nome in nomes]
+    processados = ignorados = total = 0
+    processos = processos or os.cpu_count() or 1
+    # Com um núcleo só o pool só acrescenta custo de transferência
+    executor = ProcessPoolExecutor(max_workers=processos) if processos > 1 else None
+    try:
+        resultados = (executor.map(extrair_arquivo, caminhos, conhecidos, chunksize=4) if executor
+                      else map(extrair_arquivo, caminhos, conhecidos))
+        for caminho, hash_conteudo, eventos in resultados:
+            if eventos is None:
+                ignorados += 1
+                continue
+            armazenamento.substituir_historico(os.path.basename(caminho), hash_conteudo, eventos)
+            processados += 1
+            total += len(eventos)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return processados, ignorados, total
+
+
+if __name__ == "__main__":
+    pasta = sys.argv[1] if len(sys.argv) > 1 else PASTA_LOGS
+    processos = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    inicio = time.perf_counter()
+    processados, ignorados, total = reconstruir(pasta, Armazenamento(), processos)
+    print(f"{processados} journal(s) processado(s), {ignorados} sem mudança, "
+          f"{total} evento(s) em {time.perf_counter() - inicio:.2f}s")
@@ -0,0 +1,79 @@
+# impressao.py
+
+import collections
+import hashlib
+import json
+
+_MASCARA = (1 << 64) - 1
+
+
+def _hash64(texto):
+    return int.from_bytes(hashlib.blake2b(texto.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def impressao_material(nome, nome_localizado, requerido, fornecido):
+    return _hash64(f"{nome}\x1f{nome_localizado}\x1f{requerido}\x1f{fornecido}")
+
+
+def impressao_material_dict(m):
+    return impressao_material(m.get("Name") or m.get("Name_Localised"), m.get("Name_Localised"),
+                              m.get("RequiredAmount", 0), m.get("ProvidedAmount", 0))
+
+
+# Impressão digital dos materiais de um depósito: a soma (módulo 2^64) da
+# impressão de cada material. Não depende da ordem e pode ser atualizada
+# quando um material muda, sem passar pelos outros (trocar_material).
+def impressao_materiais(materiais):
+    return sum(map(impressao_material_dict, materiais)) & _MASCARA
+
+
+# `antiga` e `nova` são impressões de material (0 para material que não existia)
+def trocar_material(impressao, antiga, nova):
+    return (impressao - antiga + nova) & _MASCARA
+
+
+# Etiqueta do conteúdo visível de um depósito (materiais, nome e fontes),
+# igual no cliente, nos bots e no servidor. Também é o valor do
+# If-None-Match: `"<MarketID>:<etiqueta>"`. `lideres` só entra nas
+# etiquetas locais dos bots, que mostram o placar do próprio journal.
+def etiqueta_deposito(impressao, nome, fontes=None, lideres=None):
+    extras = [nome, fontes or []]
+    if lideres:
+        extras.append(lideres)
+    extras = json.dumps(extras, ensure_ascii=False, sort_keys=True)
+    return f"{_hash64(f'{impressao:016x}{extras}'):016x}"
+
+
+def formatar_if_none_match(pares):
+    return ", ".join(f'"{market_id}:{etiqueta}"' for market_id, etiqueta in pares)
+
+
+# {MarketID (texto): etiqueta} de um cabeçalho If-None-Match
+def ler_if_none_match(cabecalho):
+    etiquetas = {}
+    for parte in (cabecalho or "").split(","):
+        parte = parte.strip().removeprefix("W/").strip('"')
+        chave, _, etiqueta = parte.rpartition(":")
+        if chave and etiqueta:
+            etiquetas[chave] = etiqueta
+    return etiquetas
+
+
+# Memoriza o texto renderizado por etiqueta: a mesma etiqueta nunca é
+# formatada duas vezes enquanto estiver entre as `limite` mais recentes
+class CacheRenderizacao:
+
+    def __init__(self, funcao, limite=256):
+        self.funcao = funcao
+        self.limite = limite
+        self._textos = collections.OrderedDict()  # {etiqueta: texto}
+
+    def __call__(self, etiqueta, *args, **kwargs):
+        texto = self._textos.get(etiqueta)
+        if texto is not None:
+            self._textos.move_to_end(etiqueta)
+            return texto
+        texto = self._textos[etiqueta] = self.funcao(*args, **kwargs)
+        if len(self._textos) > self.limite:
+            self._textos.popitem(last=False)
+        return texto
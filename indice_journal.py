@@ -0,0 +1,145 @@
+# indice_journal.py
+
+import fnmatch
+import json
+import os
+
+from observador_journal import PADRAO_JOURNAL
+
+ARQUIVO_INDICE = "indice_journal.json"
+
+
+def _ler_cabecalho(caminho):
+    # O Fileheader é sempre a primeira linha do journal
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            primeira = f.readline()
+        dado = json.loads(primeira)
+    except (OSError, ValueError):
+        return None, None
+    if not isinstance(dado, dict) or dado.get("event") != "Fileheader":
+        return None, None
+    return dado.get("part", 1), dado.get("timestamp")
+
+
+# Índice dos journals da pasta, salvo em disco entre execuções. Só relê o
+# cabeçalho de arquivos novos ou alterados e só lista a pasta quando o mtime
+# dela muda (ou quando o observador avisa de um arquivo específico). Cada
+# entrada guarda a `part` do Fileheader para encadear as partes de uma mesma
+# sessão (part 1, Continued -> part 2, ...).
+class IndiceJournal:
+
+    def __init__(self, pasta, caminho_indice=ARQUIVO_INDICE, padrao=PADRAO_JOURNAL):
+        self.pasta = pasta
+        self.caminho_indice = caminho_indice
+        self.padrao = padrao
+        self.arquivos = {}  # {nome: {"mtime_ns", "tamanho", "parte", "inicio"}}
+        self._mtime_pasta = None
+        self._ordenados = None
+        self._recente = None
+        self._carregar()
+
+    def _carregar(self):
+        if not self.caminho_indice or not os.path.exists(self.caminho_indice):
+            return
+        try:
+            with open(self.caminho_indice, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+        except (OSError, ValueError):
+            return
+        if dados.get("pasta") == self.pasta:
+            self.arquivos = dados.get("arquivos", {})
+
+    def salvar(self):
+        if not self.caminho_indice:
+            return
+        temporario = self.caminho_indice + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({"pasta": self.pasta, "arquivos": self.arquivos}, f)
+        os.replace(temporario, self.caminho_indice)
+
+    # Devolve True se o arquivo é novo ou o cabeçalho mudou (o que precisa
+    # ir para o disco); só crescer não conta, senão o índice seria regravado
+    # a cada linha nova do journal
+    def _atualizar_arquivo(self, nome, st):
+        entrada = self.arquivos.get(nome)
+        if entrada and entrada["mtime_ns"] == st.st_mtime_ns and entrada["tamanho"] == st.st_size:
+            return False
+        self._recente = None
+        if entrada and entrada["parte"]:
+            entrada["mtime_ns"], entrada["tamanho"] = st.st_mtime_ns, st.st_size
+            return False
+        parte, inicio = _ler_cabecalho(os.path.join(self.pasta, nome))
+        self.arquivos[nome] = {"mtime_ns": st.st_mtime_ns, "tamanho": st.st_size, "parte": parte, "inicio": inicio}
+        return True
+
+    # `alterados`: caminhos avisados pelo ObservadorJournal. Sem eles, só
+    # relista a pasta se o mtime dela mudou.
+    def atualizar(self, alterados=None):
+        mudou = False
+        if alterados:
+            for caminho in alterados:
+                nome = os.path.basename(caminho)
+                try:
+                    st = os.stat(caminho)
+                except FileNotFoundError:
+                    if self.arquivos.pop(nome, None) is not None:
+                        self._recente = None
+                        mudou = True
+                    continue
+                mudou |= self._atualizar_arquivo(nome, st)
+        else:
+            try:
+                mtime_pasta = os.stat(self.pasta).st_mtime_ns
+            except FileNotFoundError:
+                return
+            if mtime_pasta != self._mtime_pasta or not self.arquivos:
+                self._mtime_pasta = mtime_pasta
+                vistos = set()
+                for entrada in os.scandir(self.pasta):
+                    if fnmatch.fnmatch(entrada.name, self.padrao):
+                        vistos.add(entrada.name)
+                        mudou |= self._atualizar_arquivo(entrada.name, entrada.stat())
+                for nome in set(self.arquivos) - vistos:
+                    del self.arquivos[nome]
+                    self._recente = None
+                    mudou = True
+            else:
+                # Pasta sem arquivos novos: basta conferir o mais recente
+                recente = self.mais_recente()
+                if recente:
+                    return self.atualizar({recente})
+        if mudou:
+            self._ordenados = None
+            self.salvar()
+
+    # Nomes em ordem cronológica (horário do Fileheader, depois o nome)
+    def ordenados(self):
+        if self._ordenados is None:
+            self._ordenados = sorted(self.arquivos, key=lambda n: (self.arquivos[n]["inicio"] or "", n))
+        return self._ordenados
+
+    def mais_recente(self):
+        if not self.arquivos:
+            return None
+        if self._recente is None:
+            nome = max(self.arquivos, key=lambda n: self.arquivos[n]["mtime_ns"])
+            self._recente = os.path.join(self.pasta, nome)
+        return self._recente
+
+    # Partes da sessão a que o arquivo pertence, da part 1 até ele
+    def sessao(self, caminho):
+        ordem = self.ordenados()
+        nome = os.path.basename(caminho)
+        if nome not in self.arquivos:
+            return [caminho]
+        i = ordem.index(nome)
+        partes = [nome]
+        while i > 0:
+            parte = self.arquivos[ordem[i]]["parte"] or 1
+            anterior = self.arquivos[ordem[i - 1]]["parte"] or 1
+            if parte <= 1 or anterior != parte - 1:
+                break
+            i -= 1
+            partes.append(ordem[i])
+        return [os.path.join(self.pasta, n) for n in reversed(partes)]
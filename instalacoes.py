@@ -0,0 +1,122 @@
+# instalacoes.py
+
+from decodificador_journal import (
+    PREFIXO_CONSTRUCAO, AproximacaoAssentamento, Atracado, DepositoConstrucao,
+    Material, SinalConstrucao,
+)
+from fluxo_journal import FluxoJournal
+from impressao import impressao_material, trocar_material
+
+
+# Acompanha, numa única passada para frente, o "construction site atual" e o
+# último estado de cada depósito. Os depósitos são identificados pelo
+# MarketID, que aparece em todo ColonisationConstructionDepot e
+# ColonisationContribution; o nome vem do ApproachSettlement/Docked do mesmo
+# MarketID, então dois sites visitados na mesma sessão não se misturam.
+class RastreadorInstalacoes:
+
+    def __init__(self):
+        self.reiniciar()
+
+    # Sessão nova: nada do que foi visto antes vale mais
+    def reiniciar(self):
+        self.nomes = {}  # {MarketID: nome da instalação}
+        self.depositos = {}  # {MarketID: DepositoConstrucao}
+        self.market_atual = None
+        self.ultimo_deposito = None
+        self.sites_sinalizados = set()
+        self._dicts = {}  # {MarketID: (DepositoConstrucao, materiais como dicts)}
+        self.impressoes = {}  # {MarketID: impressão dos materiais (impressao.py)}
+
+    def nome(self, market_id):
+        return self.nomes.get(market_id, "Desconhecida")
+
+    def processar(self, registro):
+        if isinstance(registro, DepositoConstrucao):
+            if registro.market_id is not None:
+                self._atualizar_impressao(registro, self.depositos.get(registro.market_id))
+                self.depositos[registro.market_id] = registro
+                self.ultimo_deposito = registro.market_id
+        elif isinstance(registro, (AproximacaoAssentamento, Atracado)):
+            nome = registro.nome if isinstance(registro, AproximacaoAssentamento) else registro.estacao
+            if nome.startswith(PREFIXO_CONSTRUCAO) and registro.market_id is not None:
+                self.nomes[registro.market_id] = nome
+                self.market_atual = registro.market_id
+        elif isinstance(registro, SinalConstrucao):
+            self.sites_sinalizados.add(registro.nome)
+
+    # O jogo regrava o depósito a cada poucos segundos quase sempre igual: só
+    # os materiais que mudaram entram na conta
+    def _atualizar_impressao(self, registro, anterior):
+        if anterior is not None and anterior.materiais == registro.materiais:
+            return
+        if anterior is None or len(anterior.materiais) != len(registro.materiais):
+            impressao = 0
+            pares = ((None, m) for m in registro.materiais)
+        else:
+            impressao = self.impressoes[registro.market_id]
+            pares = ((a, m) for a, m in zip(anterior.materiais, registro.materiais) if a != m)
+        for antigo, novo in pares:
+            impressao = trocar_material(impressao, impressao_material(*antigo[:4]) if antigo else 0,
+                                        impressao_material(*novo[:4]))
+        self.impressoes[registro.market_id] = impressao
+
+    def materiais(self, market_id):
+        deposito = self.depositos[market_id]
+        em_cache = self._dicts.get(market_id)
+        if em_cache is None or em_cache[0] is not deposito:
+            em_cache = (deposito, [m.como_dict() for m in deposito.materiais])
+            self._dicts[market_id] = em_cache
+        return em_cache[1]
+
+    # [(MarketID, nome, materiais)] na ordem em que os depósitos apareceram
+    def instalacoes(self):
+        return [(market_id, self.nome(market_id), self.materiais(market_id)) for market_id in self.depositos]
+
+    # Retrato imutável de instalacoes() e dos sites sinalizados, para entregar
+    # de uma thread ao loop do Discord. Os dicts de materiais não são mais
+    # alterados depois de criados.
+    def instantaneo(self):
+        instalacoes = tuple((market_id, nome, tuple(materiais)) for market_id, nome, materiais in self.instalacoes())
+        return instalacoes, frozenset(self.sites_sinalizados)
+
+    # Estado em formato JSON, para os checkpoints do Armazenamento
+    def exportar(self):
+        return {
+            "nomes": list(self.nomes.items()),
+            "depositos": [list(d._replace(materiais=[list(m) for m in d.materiais])) for d in self.depositos.values()],
+            "market_atual": self.market_atual,
+            "ultimo_deposito": self.ultimo_deposito,
+            "sites_sinalizados": sorted(self.sites_sinalizados),
+        }
+
+    def carregar(self, dados):
+        self.reiniciar()
+        self.nomes = dict((market_id, nome) for market_id, nome in dados["nomes"])
+        for campos in dados["depositos"]:
+            deposito = DepositoConstrucao(*campos[:-1], tuple(Material(*m) for m in campos[-1]))
+            self._atualizar_impressao(deposito, None)
+            self.depositos[deposito.market_id] = deposito
+        self.market_atual = dados["market_atual"]
+        self.ultimo_deposito = dados["ultimo_deposito"]
+        self.sites_sinalizados = set(dados["sites_sinalizados"])
+
+    @classmethod
+    def importar(cls, dados):
+        rastreador = cls()
+        rastreador.carregar(dados)
+        return rastreador
+
+
+# Fluxo de um arquivo só, com o rastreador assinado: {caminho: (fluxo, rastreador)}
+_fluxos = {}
+
+
+# Lê só as linhas novas do journal e devolve o rastreador atualizado
+def rastrear(caminho):
+    if caminho not in _fluxos:
+        fluxo = FluxoJournal(caminho=caminho)
+        _fluxos[caminho] = (fluxo, fluxo.assinar(RastreadorInstalacoes(), "rastreador"))
+    fluxo, rastreador = _fluxos[caminho]
+    fluxo.atualizar()
+    return rastreador
@@ -0,0 +1,81 @@
+# leitor_journal.py
+
+import os
+
+from metricas import BALDES_TAMANHO, Histograma
+
+BYTES_LIDOS = Histograma("botelite_journal_bytes_lidos", "Bytes novos lidos do journal por leitura", baldes=BALDES_TAMANHO)
+LINHAS_LIDAS = Histograma("botelite_journal_linhas_por_leitura", "Linhas completas devolvidas por leitura",
+                          baldes=BALDES_TAMANHO)
+
+
+# Lê o journal a partir do último byte já processado. Só devolve linhas
+# completas: um pedaço final sem quebra de linha fica guardado para a próxima
+# leitura. Se o arquivo for truncado ou substituído (inode diferente), a
+# leitura recomeça do início e `reiniciou` fica verdadeiro.
+class LeitorJournal:
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.offset = 0
+        self.identidade = None
+        self.reiniciou = False
+        self._pendente = b""
+
+    # Posição segura para checkpoint: o pedaço de linha pendente fica de fora
+    # e é relido depois de restaurar
+    def posicao(self):
+        return {"offset": self.offset - len(self._pendente), "identidade": self.identidade}
+
+    # Retoma de um checkpoint se ainda for o mesmo arquivo e ele não encolheu
+    def restaurar(self, posicao):
+        try:
+            st = os.stat(self.caminho)
+        except FileNotFoundError:
+            return False
+        identidade = tuple(posicao["identidade"] or ())
+        if identidade != (st.st_dev, st.st_ino) or st.st_size < posicao["offset"]:
+            return False
+        self.identidade = identidade
+        self.offset = posicao["offset"]
+        self._pendente = b""
+        return True
+
+    def _reiniciar(self, identidade):
+        self.offset = 0
+        self.identidade = identidade
+        self._pendente = b""
+        self.reiniciou = True
+
+    def ler_linhas(self):
+        self.reiniciou = False
+        try:
+            st = os.stat(self.caminho)
+        except FileNotFoundError:
+            return []
+
+        identidade = (st.st_dev, st.st_ino)
+        if self.identidade is None:
+            self.identidade = identidade
+        elif identidade != self.identidade or st.st_size < self.offset:
+            # Arquivo substituído ou truncado: o estado anterior não vale mais
+            self._reiniciar(identidade)
+
+        if st.st_size == self.offset:
+            return []
+
+        with open(self.caminho, "rb") as f:
+            f.seek(self.offset)
+            dados = f.read()
+        self.offset += len(dados)
+
+        dados = self._pendente + dados
+        fim = dados.rfind(b"\n")
+        if fim < 0:
+            self._pendente = dados
+            return []
+        self._pendente = dados[fim + 1:]
+        linhas = [linha.decode("utf-8", errors="replace") for linha in dados[:fim].split(b"\n") if linha.strip()]
+        BYTES_LIDOS.observar(len(dados) - len(self._pendente))
+        LINHAS_LIDAS.observar(len(linhas))
+        return linhas
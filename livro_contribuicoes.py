@@ -0,0 +1,136 @@
+# livro_contribuicoes.py
+
+import collections
+import hashlib
+import heapq
+import json
+
+from decodificador_journal import Comandante, Contribuicao
+
+LIDERES_NA_MENSAGEM = 5
+DESCONHECIDO = "Desconhecido"
+
+
+# Identidade de uma entrega: o mesmo evento do journal, vindo de dois
+# clientes ou reenviado, dá sempre o mesmo id. O comandante fica de fora:
+# relido sem o evento Commander (checkpoint no meio da sessão), o mesmo
+# evento não pode virar outra entrega.
+def id_evento(market_id, timestamp, itens):
+    texto = json.dumps([market_id, timestamp, [list(i) for i in itens]], ensure_ascii=False)
+    return hashlib.blake2b(texto.encode("utf-8"), digest_size=8).hexdigest()
+
+
+# Livro de entregas (ColonisationContribution) por comandante, depósito e
+# mercadoria. Cada entrega nova soma nos contadores em O(1) por item; as
+# já vistas (mesmo id) são ignoradas, então dá para juntar o livro de
+# vários clientes (mesclar, ou registrar o que chega pela API) sem contar
+# duas vezes. Como assinante do FluxoJournal, o comandante vem do evento
+# Commander (ou LoadGame) da sessão; o livro não recomeça entre sessões. Com
+# `enviar`, as entregas novas lidas do journal também ficam em `pendentes`
+# até irem para o servidor (retirar_pendentes).
+#
+# As entregas ficam na tabela de contribuições do Armazenamento
+# (usar_armazenamento): cada salvar() grava só as novas, então o custo não
+# cresce com o histórico. O checkpoint do FluxoJournal leva só o comandante.
+class LivroContribuicoes:
+
+    def __init__(self, enviar=False):
+        self.enviar = enviar
+        self.armazenamento = None
+        self._zerar()
+
+    def _zerar(self):
+        self.eventos = {}  # {id: (comandante, MarketID, timestamp, itens)}
+        self.por_comandante = collections.Counter()  # {comandante: toneladas}
+        self.por_deposito = {}  # {MarketID: Counter({comandante: toneladas})}
+        self.por_mercadoria = collections.Counter()  # {(comandante, MarketID, Name): toneladas}
+        self.comandante = None
+        self.pendentes = []  # entregas novas ainda não enviadas ao servidor
+        self.novos = []  # [(id, comandante, MarketID, timestamp, itens)] ainda não gravados
+
+    def processar(self, registro):
+        if isinstance(registro, Comandante):
+            self.comandante = registro.nome or None
+        elif isinstance(registro, Contribuicao) and registro.market_id is not None:
+            entrega = (self.comandante or DESCONHECIDO, registro.market_id, registro.timestamp, registro.itens)
+            if self.registrar(*entrega) and self.enviar:
+                self.pendentes.append(entrega)
+
+    # itens: [(Name, Name_Localised, Amount)]; False se a entrega já estava no livro
+    def registrar(self, comandante, market_id, timestamp, itens):
+        itens = tuple(tuple(i) for i in itens)
+        chave = id_evento(market_id, timestamp, itens)
+        if chave in self.eventos:
+            return False
+        self.eventos[chave] = (comandante, market_id, timestamp, itens)
+        if self.armazenamento is not None:
+            self.novos.append((chave, comandante, market_id, timestamp, itens))
+        deposito = self.por_deposito.setdefault(market_id, collections.Counter())
+        for nome, _, quantidade in itens:
+            self.por_comandante[comandante] += quantidade
+            deposito[comandante] += quantidade
+            self.por_mercadoria[(comandante, market_id, nome)] += quantidade
+        return True
+
+    def mesclar(self, outro):
+        novos = 0
+        for comandante, market_id, timestamp, itens in outro.eventos.values():
+            novos += self.registrar(comandante, market_id, timestamp, itens)
+        return novos
+
+    # [(comandante, toneladas)] de quem mais entregou no depósito
+    def lideres(self, market_id, limite=LIDERES_NA_MENSAGEM):
+        deposito = self.por_deposito.get(market_id)
+        if not deposito:
+            return []
+        return heapq.nlargest(limite, deposito.items(), key=lambda par: par[1])
+
+    # Entregas novas no formato da API, e esvazia a lista
+    def retirar_pendentes(self):
+        pendentes, self.pendentes = self.pendentes, []
+        return [{"comandante": c, "market_id": m, "timestamp": t, "itens": [list(i) for i in itens]}
+                for c, m, t, itens in pendentes]
+
+    # Carrega as entregas já gravadas; daqui em diante salvar() grava as novas
+    def usar_armazenamento(self, armazenamento):
+        self.armazenamento = None
+        for comandante, market_id, timestamp, itens in armazenamento.contribuicoes():
+            self.registrar(comandante, market_id, timestamp, itens)
+        self.armazenamento = armazenamento
+
+    def salvar(self):
+        if self.armazenamento is not None and self.novos:
+            self.armazenamento.salvar_contribuicoes(self.novos)
+            self.novos = []
+
+    # Assinante do FluxoJournal: grava as entregas lidas nesta atualização
+    def concluir(self):
+        self.salvar()
+
+    # Estado da sessão em formato JSON, para os checkpoints do Armazenamento
+    def exportar(self):
+        return {"comandante": self.comandante}
+
+    # Checkpoints antigos também trazem as entregas: entram no livro (e na tabela)
+    def carregar(self, dados):
+        self.comandante = dados.get("comandante")
+        for comandante, market_id, timestamp, itens in dados.get("eventos", []):
+            self.registrar(comandante, market_id, timestamp, itens)
+
+    @classmethod
+    def importar(cls, dados):
+        livro = cls()
+        if dados:
+            livro.carregar(dados)
+        return livro
+
+
+# Com `espaco`, deixa de fora os últimos colocados até o placar caber
+def formatar_lideres(lideres, espaco=None):
+    lideres = list(lideres or [])
+    while lideres:
+        texto = "🏆 " + " · ".join(f"{comandante} {toneladas} t" for comandante, toneladas in lideres)
+        if espaco is None or len(texto) <= espaco:
+            return texto
+        lideres.pop()
+    return ""
@@ -0,0 +1,157 @@
+# mercados.py
+
+import math
+import os
+
+from decodificador_journal import CONVERSORES, Atracado, CompraMercado, Mercado, PosicaoSistema, decodificar
+
+MERCADOS_POR_MERCADORIA = 20  # só os mais recentes de cada mercadoria
+FONTES_NA_MENSAGEM = 5
+LIMITE_MENSAGEM = 2000  # caracteres por mensagem do Discord; acima disso a API responde 400
+
+_CONVERSORES = {evento: CONVERSORES[evento]
+                for evento in ("MarketBuy", "Docked", "Market", "Location", "FSDJump", "CarrierJump")}
+
+
+# "$aluminium_name;" (depósito) e "aluminium" (MarketBuy) viram a mesma chave
+def chave_mercadoria(nome):
+    nome = (nome or "").lower()
+    if nome.startswith("$") and nome.endswith("_name;"):
+        nome = nome[1:-6]
+    return nome
+
+
+# Índice mercadoria -> mercados onde ela já foi comprada, montado aos poucos
+# a partir dos eventos do journal: MarketBuy dá mercadoria, preço e
+# MarketID; Docked/Market dão estação e sistema do MarketID;
+# Location/FSDJump dão a posição (StarPos) do sistema. Diferente do
+# RastreadorInstalacoes, não recomeça a cada sessão: o que foi visto em
+# journals antigos continua valendo.
+class IndiceMercados:
+
+    def __init__(self, limite=MERCADOS_POR_MERCADORIA):
+        self.limite = limite
+        self.posicoes = {}  # {sistema: (x, y, z)}
+        self.estacoes = {}  # {MarketID: (estação, sistema)}
+        self.ofertas = {}  # {mercadoria: {MarketID: (preço, timestamp)}}
+        self.alterado = False
+
+    def processar(self, registro):
+        if isinstance(registro, CompraMercado):
+            if registro.market_id is None:
+                return
+            ofertas = self.ofertas.setdefault(chave_mercadoria(registro.tipo), {})
+            ofertas[registro.market_id] = (registro.preco, registro.timestamp)
+            if len(ofertas) > self.limite:
+                del ofertas[min(ofertas, key=lambda m: ofertas[m][1] or "")]
+        elif isinstance(registro, (Atracado, Mercado)):
+            if registro.market_id is None or not registro.sistema:
+                return
+            self.estacoes[registro.market_id] = (registro.estacao, registro.sistema)
+        elif isinstance(registro, PosicaoSistema):
+            if not registro.sistema:
+                return
+            self.posicoes[registro.sistema] = registro.posicao
+        else:
+            return
+        self.alterado = True
+
+    def distancia(self, sistema_a, sistema_b):
+        a, b = self.posicoes.get(sistema_a), self.posicoes.get(sistema_b)
+        if a is None or b is None:
+            return None
+        return math.dist(a, b)
+
+    # Fontes conhecidas mais próximas do depósito para cada material que
+    # ainda falta: [{"material", "estacao", "sistema", "distancia", "preco",
+    # "timestamp"}]. Mercados sem posição conhecida ficam por último.
+    def fontes(self, market_id, materiais, limite=1):
+        _, sistema_deposito = self.estacoes.get(market_id, (None, None))
+        resultado = []
+        for m in materiais:
+            if m["ProvidedAmount"] >= m["RequiredAmount"]:
+                continue
+            ofertas = self.ofertas.get(chave_mercadoria(m.get("Name") or m.get("Name_Localised")))
+            if not ofertas:
+                continue
+            candidatos = []
+            for mercado, (preco, timestamp) in ofertas.items():
+                if mercado == market_id or mercado not in self.estacoes:
+                    continue
+                estacao, sistema = self.estacoes[mercado]
+                distancia = self.distancia(sistema_deposito, sistema)
+                candidatos.append((distancia is None, distancia or 0.0, preco, estacao, sistema, timestamp))
+            candidatos.sort()
+            for sem_posicao, distancia, preco, estacao, sistema, timestamp in candidatos[:limite]:
+                resultado.append({
+                    "material": m.get("Name_Localised", "?"),
+                    "estacao": estacao,
+                    "sistema": sistema,
+                    "distancia": None if sem_posicao else round(distancia, 1),
+                    "preco": preco,
+                    "timestamp": timestamp,
+                })
+        return resultado
+
+    # Estado em formato JSON, para o Armazenamento
+    def exportar(self):
+        return {
+            "posicoes": self.posicoes,
+            "estacoes": list(self.estacoes.items()),
+            "ofertas": {chave: list(ofertas.items()) for chave, ofertas in self.ofertas.items()},
+        }
+
+    @classmethod
+    def importar(cls, dados, limite=MERCADOS_POR_MERCADORIA):
+        indice = cls(limite)
+        if dados:
+            indice.posicoes = {sistema: tuple(p) for sistema, p in dados["posicoes"].items()}
+            indice.estacoes = {market_id: tuple(e) for market_id, e in dados["estacoes"]}
+            indice.ofertas = {chave: {market_id: tuple(o) for market_id, o in ofertas}
+                              for chave, ofertas in dados["ofertas"].items()}
+        return indice
+
+
+# Índice salvo no Armazenamento; na primeira vez é montado com todos os
+# journals da pasta, do mais antigo ao mais novo
+def carregar_indice_mercados(armazenamento, indice_journal):
+    dados = armazenamento.valor("indice_mercados")
+    if dados is not None:
+        return IndiceMercados.importar(dados)
+    mercados = IndiceMercados()
+    indice_journal.atualizar()
+    for nome in indice_journal.ordenados():
+        with open(os.path.join(indice_journal.pasta, nome), "r", encoding="utf-8", errors="replace") as f:
+            for linha in f:
+                registro = decodificar(linha, _CONVERSORES)
+                if registro is not None:
+                    mercados.processar(registro)
+    salvar_indice_mercados(armazenamento, mercados)
+    return mercados
+
+
+def salvar_indice_mercados(armazenamento, mercados):
+    if mercados.alterado:
+        armazenamento.salvar_valor("indice_mercados", mercados.exportar())
+        mercados.alterado = False
+
+
+# Caracteres que ainda cabem numa linha nova depois de `linhas`
+def espaco_na_mensagem(linhas):
+    return LIMITE_MENSAGEM - len("\n".join(linhas)) - 1
+
+
+# Com `espaco`, tira fontes do fim (contando no "e mais") até o texto caber
+def formatar_fontes(fontes, limite=FONTES_NA_MENSAGEM, espaco=None):
+    linhas = []
+    for f in fontes[:limite]:
+        distancia = f"{f['distancia']:.1f} ly" if f["distancia"] is not None else "distância ?"
+        linhas.append(f"🛒 {f['material']}: {f['estacao']} ({f['sistema']}, {distancia}) {f['preco']} cr")
+    while True:
+        restantes = len(fontes) - len(linhas)
+        texto = "\n".join(linhas + ([f"🛒 ... e mais {restantes}"] if restantes else []))
+        if espaco is None or len(texto) <= espaco:
+            return texto
+        if not linhas:
+            return ""
+        linhas.pop()
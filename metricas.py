@@ -0,0 +1,174 @@
+# metricas.py
+
+import bisect
+import contextlib
+import cProfile
+import io
+import pstats
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Limites (em segundos) dos histogramas de tempo
+BALDES_TEMPO = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BALDES_TAMANHO = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+# Todas as métricas criadas no processo, na ordem de criação
+REGISTRO = []
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Métricas no formato texto do Prometheus, sem dependência externa. Cada
+# métrica guarda um valor por combinação de rótulos ({rotulo: valor}).
+class _Metrica:
+    tipo = "untyped"
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._valores = {}
+        self._trava = threading.Lock()
+        REGISTRO.append(self)
+
+    def _chave(self, rotulos):
+        return tuple(str(rotulos[r]) for r in self.rotulos)
+
+    def _rotulos(self, chave, extra=()):
+        pares = list(zip(self.rotulos, chave)) + list(extra)
+        if not pares:
+            return ""
+        return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}"
+
+    def _amostras(self):
+        with self._trava:
+            return [(f"{self.nome}{self._rotulos(chave)}", valor) for chave, valor in self._valores.items()]
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+        linhas.extend(f"{nome} {valor}" for nome, valor in self._amostras())
+        return "\n".join(linhas)
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def inc(self, valor=1, **rotulos):
+        chave = self._chave(rotulos)
+        with self._trava:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+
+# `funcao`, se dada, é chamada na hora da coleta: devolve o valor (ou
+# {tupla de rótulos: valor}), para medidas que já existem em outro lugar
+class Medidor(_Metrica):
+    tipo = "gauge"
+
+    def __init__(self, nome, ajuda, rotulos=(), funcao=None):
+        super().__init__(nome, ajuda, rotulos)
+        self.funcao = funcao
+
+    def definir(self, valor, **rotulos):
+        with self._trava:
+            self._valores[self._chave(rotulos)] = valor
+
+    def _amostras(self):
+        if self.funcao is None:
+            return super()._amostras()
+        try:
+            valor = self.funcao()
+        except Exception:
+            return []
+        valores = valor if isinstance(valor, dict) else {(): valor}
+        return [(f"{self.nome}{self._rotulos(chave)}", v) for chave, v in valores.items()]
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, rotulos=(), baldes=BALDES_TEMPO):
+        super().__init__(nome, ajuda, rotulos)
+        self.baldes = tuple(baldes)
+
+    def observar(self, valor, **rotulos):
+        chave = self._chave(rotulos)
+        with self._trava:
+            contagens = self._valores.get(chave)
+            if contagens is None:
+                # [contagem por balde..., +Inf], soma
+                contagens = self._valores[chave] = [[0] * (len(self.baldes) + 1), 0.0]
+            contagens[0][bisect.bisect_left(self.baldes, valor)] += 1
+            contagens[1] += valor
+
+    @contextlib.contextmanager
+    def cronometrar(self, **rotulos):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **rotulos)
+
+    def _amostras(self):
+        amostras = []
+        with self._trava:
+            itens = [(chave, list(c[0]), c[1]) for chave, c in self._valores.items()]
+        for chave, contagens, soma in itens:
+            acumulado = 0
+            for limite, n in zip(self.baldes + ("+Inf",), contagens):
+                acumulado += n
+                amostras.append((f"{self.nome}_bucket{self._rotulos(chave, [('le', limite)])}", acumulado))
+            amostras.append((f"{self.nome}_sum{self._rotulos(chave)}", soma))
+            amostras.append((f"{self.nome}_count{self._rotulos(chave)}", acumulado))
+        return amostras
+
+
+def exportar():
+    return "\n".join(m.exportar() for m in REGISTRO) + "\n"
+
+
+class _Manipulador(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        corpo = exportar().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+# /metrics num servidor HTTP próprio, numa thread; para os processos que não
+# têm o FastAPI (cliente, bots)
+def servir(porta, endereco="127.0.0.1"):
+    servidor = ThreadingHTTPServer((endereco, porta), _Manipulador)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+# Liga o cProfile no bloco e, ao sair, imprime as funções mais caras. Serve
+# também em volta de um `await` (o perfil é da thread do loop inteira).
+@contextlib.contextmanager
+def perfil(limite=25):
+    perfilador = cProfile.Profile()
+    perfilador.enable()
+    try:
+        yield perfilador
+    finally:
+        perfilador.disable()
+        saida = io.StringIO()
+        pstats.Stats(perfilador, stream=saida).sort_stats("cumulative").print_stats(limite)
+        print(saida.getvalue())
+
+
+def perfilar(funcao, *args, limite=25, **kwargs):
+    with perfil(limite):
+        return funcao(*args, **kwargs)
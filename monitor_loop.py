@@ -0,0 +1,42 @@
+# monitor_loop.py
+
+import asyncio
+
+INTERVALO_AMOSTRA = 0.05  # segundos entre as medições
+LIMITE_AVISO = 0.1  # travamentos a partir disso aparecem no console
+
+
+# Mede o quanto o loop asyncio fica travado por código síncrono: uma tarefa
+# dorme `intervalo` e anota com quanto atraso acordou. Um atraso grande é
+# tempo em que o discord.py não conseguiu responder ao heartbeat.
+class MonitorLoop:
+
+    def __init__(self, intervalo=INTERVALO_AMOSTRA):
+        self.intervalo = intervalo
+        self.pior = 0.0  # maior atraso desde o último ciclo()
+        self._tarefa = None
+
+    def iniciar(self):
+        if self._tarefa is None or self._tarefa.done():
+            self._tarefa = asyncio.create_task(self._medir())
+        return self._tarefa
+
+    async def _medir(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            inicio = loop.time()
+            await asyncio.sleep(self.intervalo)
+            atraso = loop.time() - inicio - self.intervalo
+            if atraso > self.pior:
+                self.pior = atraso
+
+    # Devolve o pior atraso do ciclo que terminou e começa a contar outro
+    def ciclo(self):
+        pior, self.pior = self.pior, 0.0
+        return pior
+
+    def relatar(self, nome="loop"):
+        pior = self.ciclo()
+        if pior >= LIMITE_AVISO:
+            print(f"⚠️ {nome} travou por {pior * 1000:.0f} ms neste ciclo")
+        return pior
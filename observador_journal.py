@@ -0,0 +1,184 @@
+# observador_journal.py
+
+import ctypes
+import ctypes.util
+import fnmatch
+import os
+import select
+import struct
+import sys
+import time
+
+PADRAO_JOURNAL = "Journal.*.log"
+DEBOUNCE = 0.3  # segundos sem novas escritas antes de avisar
+ESPERA_MAXIMA_RAJADA = 2.0  # não segura uma rajada contínua por mais que isso
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_CABECALHO_EVENTO = struct.Struct("iIII")
+
+
+def _abrir_inotify(pasta):
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    mascara = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    if libc.inotify_add_watch(fd, os.fsencode(pasta), mascara) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+# Avisa quando algum journal da pasta é modificado ou criado. No Linux usa
+# inotify e o processo fica parado no select() enquanto nada acontece; nos
+# outros sistemas (ou se o inotify falhar) faz polling adaptativo, que fica
+# mais espaçado enquanto a pasta está parada. Escritas em sequência (vários
+# ColonisationContribution seguidos) viram um único aviso.
+class ObservadorJournal:
+
+    def __init__(self, pasta, padrao=PADRAO_JOURNAL, debounce=DEBOUNCE,
+                 intervalo_minimo=0.25, intervalo_maximo=5.0):
+        self.pasta = pasta
+        self.padrao = padrao
+        self.debounce = debounce
+        self.intervalo_minimo = intervalo_minimo
+        self.intervalo_maximo = intervalo_maximo
+        self._fd = _abrir_inotify(pasta)
+        self._intervalo = intervalo_minimo
+        self._mtime_pasta = None
+        self._arquivos = {}  # {caminho: (mtime_ns, tamanho)} usado só no polling
+        if self._fd is None:
+            self._varrer_pasta()
+
+    @property
+    def usa_inotify(self):
+        return self._fd is not None
+
+    def fechar(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    # Bloqueia até haver mudança ou até `timeout` segundos; devolve o
+    # conjunto de journals alterados (vazio se o tempo acabou)
+    def esperar(self, timeout=None):
+        if self._fd is not None:
+            return self._esperar_inotify(timeout)
+        return self._esperar_polling(timeout)
+
+    def _ler_inotify(self, timeout):
+        prontos, _, _ = select.select([self._fd], [], [], timeout)
+        if not prontos:
+            return None
+        alterados = set()
+        try:
+            dados = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return alterados
+        pos = 0
+        while pos < len(dados):
+            _, _, _, tamanho = _CABECALHO_EVENTO.unpack_from(dados, pos)
+            pos += _CABECALHO_EVENTO.size
+            nome = dados[pos:pos + tamanho].rstrip(b"\0").decode("utf-8", errors="replace")
+            pos += tamanho
+            if fnmatch.fnmatch(nome, self.padrao):
+                alterados.add(os.path.join(self.pasta, nome))
+        return alterados
+
+    def _esperar_inotify(self, timeout):
+        limite = None if timeout is None else time.monotonic() + timeout
+        alterados = set()
+        while not alterados:
+            restante = None if limite is None else max(0.0, limite - time.monotonic())
+            novos = self._ler_inotify(restante)
+            if novos is None:
+                return alterados
+            alterados |= novos
+
+        # Só escritas em journals reiniciam o debounce: Status.json, Cargo.json
+        # e NavRoute.json mudam o tempo todo e não podem segurar o aviso
+        fim_rajada = time.monotonic() + ESPERA_MAXIMA_RAJADA
+        fim_silencio = time.monotonic() + self.debounce
+        while True:
+            agora = time.monotonic()
+            restante = min(fim_silencio, fim_rajada) - agora
+            if restante <= 0:
+                break
+            novos = self._ler_inotify(restante)
+            if novos is None:
+                break
+            if novos:
+                alterados |= novos
+                fim_silencio = time.monotonic() + self.debounce
+        return alterados
+
+    def _varrer_pasta(self):
+        alterados = set()
+        try:
+            self._mtime_pasta = os.stat(self.pasta).st_mtime_ns
+            entradas = list(os.scandir(self.pasta))
+        except FileNotFoundError:
+            return alterados
+        for entrada in entradas:
+            if fnmatch.fnmatch(entrada.name, self.padrao):
+                st = entrada.stat()
+                assinatura = (st.st_mtime_ns, st.st_size)
+                if self._arquivos.get(entrada.path) != assinatura:
+                    alterados.add(entrada.path)
+                self._arquivos[entrada.path] = assinatura
+        return alterados
+
+    def _verificar(self, completo=False):
+        # Arquivo novo muda o mtime da pasta; fora isso basta olhar o journal
+        # mais recente, sem listar a pasta inteira a cada volta
+        try:
+            mtime_pasta = os.stat(self.pasta).st_mtime_ns
+        except FileNotFoundError:
+            return set()
+        if completo or mtime_pasta != self._mtime_pasta or not self._arquivos:
+            return self._varrer_pasta()
+        recente = max(self._arquivos, key=lambda c: self._arquivos[c][0])
+        try:
+            st = os.stat(recente)
+        except FileNotFoundError:
+            return self._varrer_pasta()
+        assinatura = (st.st_mtime_ns, st.st_size)
+        if assinatura == self._arquivos[recente]:
+            return set()
+        self._arquivos[recente] = assinatura
+        return {recente}
+
+    def _esperar_polling(self, timeout):
+        limite = None if timeout is None else time.monotonic() + timeout
+        alterados = set()
+        while not alterados:
+            espera = self._intervalo
+            if limite is not None:
+                espera = min(espera, limite - time.monotonic())
+                if espera <= 0:
+                    return alterados
+            time.sleep(espera)
+            # Com a pasta parada há algum tempo, confere todos os arquivos
+            alterados = self._verificar(completo=self._intervalo >= self.intervalo_maximo)
+            if not alterados:
+                self._intervalo = min(self._intervalo * 1.5, self.intervalo_maximo)
+
+        self._intervalo = self.intervalo_minimo
+        fim_rajada = time.monotonic() + ESPERA_MAXIMA_RAJADA
+        while time.monotonic() < fim_rajada:
+            time.sleep(self.debounce)
+            novos = self._verificar()
+            if not novos:
+                break
+            alterados |= novos
+        return alterados
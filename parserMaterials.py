@@ -1,48 +1,16 @@
-import json
 import os
-import time
 
-def extrair_materiais_construcao(caminho_arquivo_log):
-    ultima_lista_valida = []
-    nome_instalacao = "Desconhecida"
-    linha_lista = -1
-
-    with open(caminho_arquivo_log, 'r', encoding='utf-8') as f:
-        log_content = f.readlines()
-
-    for line_number, line in enumerate(log_content):
-        try:
-            registro = json.loads(line)
-            if isinstance(registro, list) and all(
-                'Name_Localised' in x and 'RequiredAmount' in x and 'ProvidedAmount' in x for x in registro
-            ):
-                ultima_lista_valida = registro
-                linha_lista = line_number
-            elif isinstance(registro, dict):
-                for valor in registro.values():
-                    if isinstance(valor, list) and all(
-                        isinstance(x, dict) and 'Name_Localised' in x and
-                        'RequiredAmount' in x and 'ProvidedAmount' in x
-                        for x in valor
-                    ):
-                        ultima_lista_valida = valor
-                        linha_lista = line_number
-        except json.JSONDecodeError:
-            continue
-
-    # Tentar encontrar instalação relacionada mais próxima acima da linha da lista
-    for i in range(linha_lista, -1, -1):
-        try:
-            registro = json.loads(log_content[i])
-            if registro.get("event") == "ApproachSettlement":
-                nome = registro.get("Name", "")
-                if nome.startswith("Planetary Construction Site:"):
-                    nome_instalacao = nome
-                    break
-        except json.JSONDecodeError:
-            continue
+from decodificador_journal import DepositoConstrucao
+from fluxo_journal import FluxoJournal
+from instalacoes import RastreadorInstalacoes, rastrear
+from observador_journal import ObservadorJournal
 
-    return ultima_lista_valida, nome_instalacao
+def extrair_materiais_construcao(caminho_arquivo_log):
+    rastreador = rastrear(caminho_arquivo_log)
+    market_id = rastreador.ultimo_deposito
+    if market_id is None:
+        return [], "Desconhecida"
+    return rastreador.materiais(market_id), rastreador.nome(market_id)
 
 
 def imprimir_tabela_materiais(materiais, nome_instalacao="Desconhecida"):
@@ -63,18 +31,37 @@ def imprimir_tabela_materiais(materiais, nome_instalacao="Desconhecida"):
             print(f"{nome:<{col_widths[0]}} | {req:>{col_widths[1]}} | {prov:>{col_widths[2]}} | {faltando:>{col_widths[3]}}")
 
 
-if __name__ == "__main__":
-    caminho_log = "Journal.2025-05-20T141829.01.log"  # ajuste para o nome correto
+# Assinante do FluxoJournal: imprime a tabela do último depósito quando ela muda
+class TabelaConsole:
 
-    print("⏳ Monitorando o log a cada 3 minutos...\n(Pressione Ctrl+C para interromper)")
-    while True:
-        if os.path.exists(caminho_log):
-            materiais, nome_instalacao = extrair_materiais_construcao(caminho_log)
-            if materiais:
-                imprimir_tabela_materiais(materiais, nome_instalacao)
-            else:
-                print("⚠️ Nenhuma entrada de materiais de construção encontrada.")
+    def __init__(self, rastreador):
+        self.rastreador = rastreador
+        self.mudou = True
+
+    def processar(self, registro):
+        if isinstance(registro, DepositoConstrucao):
+            self.mudou = True
+
+    def concluir(self):
+        if not self.mudou:
+            return
+        self.mudou = False
+        market_id = self.rastreador.ultimo_deposito
+        if market_id is None:
+            print("⚠️ Nenhuma entrada de materiais de construção encontrada.")
         else:
-            print(f"❌ Arquivo não encontrado: {caminho_log}")
+            imprimir_tabela_materiais(self.rastreador.materiais(market_id), self.rastreador.nome(market_id))
+
+
+if __name__ == "__main__":
+    caminho_log = "Journal.2025-05-20T141829.01.log"  # ajuste para o nome correto
+    if not os.path.exists(caminho_log):
+        print(f"❌ Arquivo não encontrado: {caminho_log}")
 
-        time.sleep(180)  # aguardar 3 minutos
\ No newline at end of file
+    fluxo = FluxoJournal(caminho=caminho_log)
+    rastreador = fluxo.assinar(RastreadorInstalacoes())
+    fluxo.assinar(TabelaConsole(rastreador))
+    # Atualiza assim que o journal muda; no máximo a cada 3 minutos
+    observador = ObservadorJournal(os.path.dirname(os.path.abspath(caminho_log)))
+    print("⏳ Monitorando o log...\n(Pressione Ctrl+C para interromper)")
+    fluxo.executar(observador, 180)
\ No newline at end of file
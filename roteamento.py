@@ -0,0 +1,57 @@
+# roteamento.py
+
+import collections
+import json
+import os
+
+# Canal do Discord onde as mensagens de um depósito são publicadas, com o
+# servidor (guild) dono dele, que define em qual shard do gateway ele fica
+Destino = collections.namedtuple("Destino", "guild canal")
+
+
+def _destino(valor):
+    return Destino(int(valor.get("guild", 0)), int(valor["canal"]))
+
+
+# Shard do gateway que atende uma guild (regra do Discord)
+def shard_de(guild, total):
+    return (guild >> 22) % total if total > 1 else 0
+
+
+# Para onde vai cada depósito, para servir vários esquadrões do mesmo
+# servidor. A configuração (ROTAS_DISCORD: JSON ou caminho de um arquivo
+# JSON) tem o formato:
+#   {"padrao": {"guild": ..., "canal": ...},
+#    "chaves": {"<chave de API do cliente>": {"guild": ..., "canal": ...}},
+#    "depositos": {"<MarketID>": {"guild": ..., "canal": ...}}}
+# Um depósito listado em "depositos" sempre vai para o seu canal; senão
+# vale o canal da chave de API de quem enviou e, por último, o padrão.
+class Roteamento:
+
+    def __init__(self, padrao=None, chaves=None, depositos=None):
+        self.padrao = padrao
+        self.chaves = chaves or {}  # {chave de API: Destino}
+        self.depositos = depositos or {}  # {MarketID (texto): Destino}
+
+    @classmethod
+    def carregar(cls, configuracao, padrao=None):
+        if not configuracao:
+            return cls(padrao)
+        if os.path.exists(configuracao):
+            with open(configuracao, "r", encoding="utf-8") as f:
+                configuracao = f.read()
+        dados = json.loads(configuracao)
+        if dados.get("padrao"):
+            padrao = _destino(dados["padrao"])
+        return cls(padrao,
+                   {chave: _destino(v) for chave, v in dados.get("chaves", {}).items()},
+                   {str(market_id): _destino(v) for market_id, v in dados.get("depositos", {}).items()})
+
+    # None: chave desconhecida e nenhum canal padrão configurado
+    def destino(self, market_id=None, chave_api=None):
+        if market_id is not None and str(market_id) in self.depositos:
+            return self.depositos[str(market_id)]
+        return self.chaves.get(chave_api, self.padrao)
+
+    def destinos(self):
+        return {self.padrao, *self.chaves.values(), *self.depositos.values()} - {None}
@@ -0,0 +1,265 @@
+# saida_discord.py
+
+import asyncio
+import collections
+import multiprocessing
+import queue
+import time
+
+import discord
+
+from fila_discord import CAPACIDADE_FILA, FilaDiscord
+from roteamento import shard_de
+
+INTERVALO_ESTATISTICAS = 1.0  # segundos entre os relatórios de cada processo de trabalho
+CHECK = "\u2705"
+
+
+def criar_cliente(total_shards=1, shard_ids=None):
+    return discord.AutoShardedClient(intents=discord.Intents.default(), shard_count=total_shards,
+                                     shard_ids=shard_ids)
+
+
+async def reagir_se_completo(mensagem, completo):
+    if completo:
+        # Mensagens restauradas do banco são parciais e não trazem as reações
+        reacoes = [str(r.emoji) for r in getattr(mensagem, "reactions", [])]
+        if CHECK not in reacoes:
+            await mensagem.add_reaction(CHECK)
+
+
+def _tamanho(fila):
+    try:
+        return fila.qsize()
+    except NotImplementedError:  # macOS
+        return 0
+
+
+# Saída para o Discord dentro do processo: uma FilaDiscord por shard do
+# gateway (discord.AutoShardedClient), então um canal no limite de
+# requisições ou um shard reconectando só seguram as mensagens daquele
+# shard. Cada depósito vai para o canal do seu Destino (roteamento.py).
+# `shard_ids` limita aos shards conectados neste processo.
+#
+# ao_publicar(chave, canal_id, mensagem_id): corrotina chamada depois de cada envio/edição
+class SaidaDiscord:
+
+    def __init__(self, cliente, total_shards=1, ao_publicar=None, shard_ids=None):
+        self.cliente = cliente
+        self.total_shards = total_shards
+        self.ao_publicar = ao_publicar
+        self.destinos = {}  # {chave: Destino}
+        self.mensagens = {}  # {chave: mensagem, ou o ID salvo até ser usada}
+        self.completos = set()  # chaves cuja mensagem deve ter o ✅
+        self.reagidas = {}  # {chave: ID da mensagem que já recebeu o ✅}
+        self.filas = {
+            shard: FilaDiscord(self._canal, self._mensagem, self._publicada, aguardar_pronto=self.aguardar_pronto)
+            for shard in (shard_ids if shard_ids is not None else range(total_shards))
+        }
+
+    async def aguardar_pronto(self):
+        # wait_until_ready() falha se chamado antes do login terminar
+        while not self.cliente.is_ready():
+            await asyncio.sleep(0.5)
+
+    def _canal(self, chave):
+        return self.cliente.get_channel(self.destinos[chave].canal)
+
+    def _mensagem(self, chave):
+        mensagem = self.mensagens.get(chave)
+        if isinstance(mensagem, int):
+            canal = self._canal(chave)
+            if canal is None:
+                return None
+            mensagem = self.mensagens[chave] = canal.get_partial_message(mensagem)
+        return mensagem
+
+    async def _publicada(self, chave, mensagem):
+        self.mensagens[chave] = mensagem
+        if self.ao_publicar is not None:
+            await self.ao_publicar(chave, self.destinos[chave].canal, mensagem.id)
+        await self._reagir(chave, mensagem)
+
+    # Uma reação por mensagem: as edições seguintes de um depósito completo
+    # não gastam outra chamada (fora do balde de limite da FilaDiscord)
+    async def _reagir(self, chave, mensagem):
+        if chave in self.completos and self.reagidas.get(chave) != mensagem.id:
+            await reagir_se_completo(mensagem, True)
+            self.reagidas[chave] = mensagem.id
+
+    def _fila(self, destino):
+        return self.filas[shard_de(destino.guild, self.total_shards)]
+
+    def _lembrar(self, chave, destino, mensagem_id, completo):
+        self.destinos[chave] = destino
+        if mensagem_id and chave not in self.mensagens:
+            self.mensagens[chave] = mensagem_id
+        if completo:
+            self.completos.add(chave)
+        else:
+            self.completos.discard(chave)
+
+    # mensagem_id: mensagem já publicada antes (salva no banco); False se a fila do shard está cheia
+    def agendar(self, chave, destino, conteudo, mensagem_id=None, completo=False):
+        self._lembrar(chave, destino, mensagem_id, completo)
+        return self._fila(destino).agendar(chave, conteudo)
+
+    # Depósito finalizado: ✅ na mensagem se estiver completo. Com um envio
+    # ainda na fila, a reação sai junto com ele.
+    async def finalizar(self, chave, destino, mensagem_id=None, completo=False):
+        self._lembrar(chave, destino, mensagem_id, completo)
+        if not completo or chave in self._fila(destino).pendentes:
+            return
+        await self.aguardar_pronto()
+        mensagem = self._mensagem(chave)
+        if mensagem is not None:
+            await self._reagir(chave, mensagem)
+
+    def iniciar(self):
+        for fila in self.filas.values():
+            fila.iniciar()
+
+    async def esvaziar(self):
+        for fila in self.filas.values():
+            await fila.esvaziar()
+
+    @property
+    def profundidade(self):
+        return sum(fila.profundidade for fila in self.filas.values())
+
+    def profundidades(self):
+        return {shard: fila.profundidade for shard, fila in self.filas.items()}
+
+    def estatisticas(self):
+        contadores = collections.Counter()
+        for fila in self.filas.values():
+            contadores.update(fila.contadores)
+        return {"profundidade": self.profundidade, **contadores, "shards": self.profundidades()}
+
+
+# Processo de trabalho da ProcessosDiscord: conecta só os `shard_ids` e
+# publica os pedidos que chegam em `entrada`. Devolve em `saida` cada
+# mensagem publicada e, a cada INTERVALO_ESTATISTICAS, as estatísticas das
+# suas filas. `fabrica_cliente(total_shards, shard_ids)` troca o
+# AutoShardedClient (ex.: discord_falso.ClienteFalso nos benchmarks).
+def trabalhar(indice, shard_ids, total_shards, token, entrada, saida, fabrica_cliente=None):
+    asyncio.run(_trabalhar(indice, shard_ids, total_shards, token, entrada, saida, fabrica_cliente or criar_cliente))
+
+
+async def _trabalhar(indice, shard_ids, total_shards, token, entrada, saida, fabrica_cliente):
+    cliente = fabrica_cliente(total_shards, shard_ids)
+
+    async def publicada(chave, canal_id, mensagem_id):
+        saida.put(("publicada", chave, canal_id, mensagem_id))
+
+    local = SaidaDiscord(cliente, total_shards, publicada, shard_ids)
+    local.iniciar()
+    conexao = asyncio.create_task(cliente.start(token))
+    loop = asyncio.get_running_loop()
+    relatado = 0.0
+    while True:
+        pedidos = []
+        try:
+            pedidos.append(await loop.run_in_executor(None, entrada.get, True, INTERVALO_ESTATISTICAS))
+            while True:
+                pedidos.append(entrada.get_nowait())
+        except queue.Empty:
+            pass
+        if None in pedidos:
+            break
+        for operacao, *argumentos in pedidos:
+            if operacao == "publicar":
+                local.agendar(*argumentos)
+            else:
+                asyncio.create_task(local.finalizar(*argumentos))
+        if time.monotonic() - relatado >= INTERVALO_ESTATISTICAS:
+            relatado = time.monotonic()
+            saida.put(("estatisticas", indice, local.estatisticas()))
+    await local.esvaziar()
+    await cliente.close()
+    conexao.cancel()
+
+
+# Mesma interface da SaidaDiscord, com os shards divididos entre
+# `processos` processos de trabalho: este processo fica só com a ingestão
+# e conversa com eles por filas locais (multiprocessing). Cada depósito
+# vai sempre para o processo dono do shard da sua guild, então as
+# mensagens de um depósito continuam em ordem.
+class ProcessosDiscord:
+
+    def __init__(self, processos, total_shards, token, ao_publicar=None, fabrica_cliente=None,
+                 capacidade=CAPACIDADE_FILA):
+        contexto = multiprocessing.get_context("spawn")
+        processos = max(1, min(processos, total_shards))
+        self.total_shards = total_shards
+        self.ao_publicar = ao_publicar
+        self.saida = contexto.Queue()
+        self.entradas = []
+        self.processos = []
+        self.dono = {}  # {shard: índice do processo}
+        self.relatorios = {}  # {índice do processo: últimas estatísticas}
+        self._tarefa = None
+        for indice in range(processos):
+            shard_ids = list(range(indice, total_shards, processos))
+            self.dono.update(dict.fromkeys(shard_ids, indice))
+            entrada = contexto.Queue(capacidade)
+            self.entradas.append(entrada)
+            self.processos.append(contexto.Process(
+                target=trabalhar, args=(indice, shard_ids, total_shards, token, entrada, self.saida, fabrica_cliente),
+                daemon=True,
+            ))
+
+    def iniciar(self):
+        if self._tarefa is None:
+            for processo in self.processos:
+                processo.start()
+            self._tarefa = asyncio.create_task(self._receber())
+        return self._tarefa
+
+    async def encerrar(self):
+        for entrada in self.entradas:
+            entrada.put(None)
+        loop = asyncio.get_running_loop()
+        for processo in self.processos:
+            await loop.run_in_executor(None, processo.join)
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+
+    def _entrada(self, destino):
+        return self.entradas[self.dono[shard_de(destino.guild, self.total_shards)]]
+
+    def agendar(self, chave, destino, conteudo, mensagem_id=None, completo=False):
+        try:
+            self._entrada(destino).put_nowait(("publicar", chave, destino, conteudo, mensagem_id, completo))
+        except queue.Full:
+            return False
+        return True
+
+    async def finalizar(self, chave, destino, mensagem_id=None, completo=False):
+        self._entrada(destino).put(("finalizar", chave, destino, mensagem_id, completo))
+
+    async def _receber(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                resposta = await loop.run_in_executor(None, self.saida.get, True, INTERVALO_ESTATISTICAS)
+            except queue.Empty:
+                continue
+            if resposta[0] == "estatisticas":
+                self.relatorios[resposta[1]] = resposta[2]
+            elif self.ao_publicar is not None:
+                try:
+                    await self.ao_publicar(*resposta[1:])
+                except Exception as e:
+                    print(f"Erro ao registrar mensagem publicada {resposta[1]}: {e}")
+
+    @property
+    def profundidade(self):
+        return (sum(r.get("profundidade", 0) for r in self.relatorios.values())
+                + sum(map(_tamanho, self.entradas)))
+
+    def profundidades(self):
+        return {shard: p for r in self.relatorios.values() for shard, p in r.get("shards", {}).items()}
+
+    def estatisticas(self):
+        return {"profundidade": self.profundidade, "processos": self.relatorios, "shards": self.profundidades()}
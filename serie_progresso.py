@@ -0,0 +1,124 @@
+# serie_progresso.py
+
+import datetime
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAXIMO_PONTOS = 256  # por depósito; acima disso os pontos antigos são reduzidos
+JANELA_RITMO = 6 * 3600  # segundos usados no cálculo do ritmo de entrega
+
+
+def instante_journal(timestamp):
+    # "2025-05-20T17:28:56Z" -> segundos desde a época
+    try:
+        return datetime.datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%SZ").replace(
+            tzinfo=datetime.timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return datetime.datetime.now(datetime.timezone.utc).timestamp()
+
+
+def formatar_duracao(segundos):
+    minutos = int(segundos // 60)
+    horas, minutos = divmod(minutos, 60)
+    dias, horas = divmod(horas, 24)
+    if dias:
+        return f"{dias}d {horas}h"
+    if horas:
+        return f"{horas}h{minutos:02d}"
+    return f"{minutos}min"
+
+
+# Histórico de um depósito em colunas compactas (array do módulo padrão, não
+# listas de dicts): instante, progresso e ProvidedAmount de cada material.
+# Todas as colunas têm o mesmo comprimento. Quando passa de `maximo` pontos,
+# a metade mais antiga fica só com um ponto a cada dois: o começo da série
+# perde resolução, os pontos recentes (que definem o ritmo) ficam intactos.
+class SerieProgresso:
+
+    def __init__(self, maximo=MAXIMO_PONTOS):
+        self.maximo = maximo
+        self.instantes = array("d")
+        self.progresso = array("d")
+        self.fornecido = {}  # {Name: array("l")}
+        self.requerido = {}  # {Name: RequiredAmount}
+
+    def __len__(self):
+        return len(self.instantes)
+
+    def registrar(self, instante, materiais):
+        if self.instantes and instante < self.instantes[-1]:
+            instante = self.instantes[-1]
+        n = len(self.instantes)
+        for m in materiais:
+            nome = m.get("Name") or m.get("Name_Localised")
+            coluna = self.fornecido.get(nome)
+            if coluna is None:
+                # Material novo: o passado dele é desconhecido, repete o valor atual
+                coluna = self.fornecido[nome] = array("l", [m["ProvidedAmount"]]) * n
+            coluna.append(m["ProvidedAmount"])
+            self.requerido[nome] = m["RequiredAmount"]
+        for nome, coluna in self.fornecido.items():
+            if len(coluna) == n:
+                coluna.append(coluna[-1] if n else 0)
+        self.instantes.append(instante)
+        total = sum(self.requerido.values())
+        self.progresso.append(sum(c[-1] for c in self.fornecido.values()) / total if total else 0.0)
+        if len(self.instantes) > self.maximo:
+            self._reduzir()
+
+    def _reduzir(self):
+        meio = len(self.instantes) // 2
+        for coluna in (self.instantes, self.progresso, *self.fornecido.values()):
+            coluna[:] = coluna[:meio:2] + coluna[meio:]
+
+    @property
+    def ultimo_progresso(self):
+        return self.progresso[-1] if self.progresso else 0.0
+
+    # Toneladas entregues em cada ponto (soma das colunas de materiais)
+    def _entregues(self, inicio):
+        if np is not None:
+            colunas = [np.frombuffer(c, dtype=c.typecode)[inicio:] for c in self.fornecido.values()]
+            return np.sum(colunas, axis=0) if colunas else np.zeros(len(self.instantes) - inicio)
+        return [sum(v) for v in zip(*(c[inicio:] for c in self.fornecido.values()))] or [0] * (len(self.instantes) - inicio)
+
+    # (toneladas por hora, segundos até concluir) com base nos pontos dentro
+    # de `janela`; None quando não há dado suficiente ou nada foi entregue
+    def ritmo(self, janela=JANELA_RITMO):
+        if len(self.instantes) < 2:
+            return None
+        fim = self.instantes[-1]
+        inicio = next(i for i, t in enumerate(self.instantes) if t >= fim - janela)
+        if inicio == len(self.instantes) - 1:
+            inicio -= 1
+        entregues = self._entregues(inicio)
+        duracao = fim - self.instantes[inicio]
+        if duracao <= 0:
+            return None
+        por_hora = float(entregues[-1] - entregues[0]) * 3600 / duracao
+        if por_hora <= 0:
+            return None
+        faltam = sum(max(0, self.requerido[nome] - c[-1]) for nome, c in self.fornecido.items())
+        return por_hora, faltam * 3600 / por_hora
+
+    def exportar(self):
+        return {
+            "instantes": self.instantes.tolist(),
+            "progresso": self.progresso.tolist(),
+            "fornecido": {nome: c.tolist() for nome, c in self.fornecido.items()},
+            "requerido": self.requerido,
+        }
+
+    @classmethod
+    def importar(cls, dados, maximo=MAXIMO_PONTOS):
+        serie = cls(maximo)
+        if dados:
+            serie.instantes = array("d", dados["instantes"])
+            serie.progresso = array("d", dados["progresso"])
+            serie.fornecido = {nome: array("l", c) for nome, c in dados["fornecido"].items()}
+            serie.requerido = dict(dados["requerido"])
+        return serie
@@ -1,35 +1,150 @@
 # servidor.py
 
 import os
+import gzip
 import json
 import asyncio
+import collections
 import datetime
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
-import discord
+import time
+from fastapi import FastAPI, Request, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 
+from agendador_prazos import AgendadorPrazos
+from agregacao import chave_deposito
+from armazenamento import Armazenamento
+from deposito_compacto import DepositoCompacto
+from impressao import CacheRenderizacao, etiqueta_deposito, ler_if_none_match
+from livro_contribuicoes import DESCONHECIDO, LivroContribuicoes, formatar_lideres
+import metricas
+from mercados import LIMITE_MENSAGEM, espaco_na_mensagem, formatar_fontes
+from roteamento import Destino, Roteamento
+from saida_discord import ProcessosDiscord, SaidaDiscord, criar_cliente
+from serie_progresso import SerieProgresso, formatar_duracao, instante_journal
+from transmissao import Transmissao
+
 load_dotenv()
 DISCORD_BOT_TOKEN = os.getenv("DISCORD_BOT_TOKEN")
-DISCORD_CHANNEL_ID = int(os.getenv("DISCORD_CHANNEL_ID"))
+DISCORD_CHANNEL_ID = os.getenv("DISCORD_CHANNEL_ID")  # canal padrão, opcional com ROTAS_DISCORD
+DISCORD_GUILD_ID = int(os.getenv("DISCORD_GUILD_ID", "0"))
+DISCORD_SHARDS = int(os.getenv("DISCORD_SHARDS", "1"))
+# Com 1 ou mais, o Discord roda em processos separados e este só faz a ingestão
+PROCESSOS_DISCORD = int(os.getenv("PROCESSOS_DISCORD", "0"))
 FINALIZACAO_MINIMA_ENTREGUE = 0.8
 TEMPO_FINALIZACAO_HORAS = 2
+CAPACIDADE_INGESTAO = int(os.getenv("CAPACIDADE_INGESTAO", "1000"))
+TRABALHADORES_INGESTAO = int(os.getenv("TRABALHADORES_INGESTAO", "4"))
+# POST /perfil só existe com PERFIL_LOTES=1: o deploy público não deixa qualquer um perfilar o servidor
+PERFIL_LOTES = os.getenv("PERFIL_LOTES") == "1"
 
 app = FastAPI()
 
-intents = discord.Intents.default()
-client = discord.Client(intents=intents)
+TEMPO_REQUISICAO = metricas.Histograma("botelite_http_requisicao_segundos",
+                                       "Tempo de resposta dos endpoints de ingestão", ("rota", "status"))
+TEMPO_LOTE = metricas.Histograma("botelite_ingestao_lote_segundos", "Tempo para aplicar um lote recebido")
+
+client = criar_cliente(DISCORD_SHARDS)
 loop = asyncio.get_event_loop()
+# Canal de cada esquadrão (chave de API do cliente) e de depósitos específicos
+roteamento = Roteamento.carregar(
+    os.getenv("ROTAS_DISCORD"),
+    Destino(DISCORD_GUILD_ID, int(DISCORD_CHANNEL_ID)) if DISCORD_CHANNEL_ID else None,
+)
+saida_discord = None  # SaidaDiscord ou ProcessosDiscord, criada no startup
 
 rastreio_instalacoes = {} 
+armazenamento = Armazenamento()
+fila_ingestao = asyncio.Queue(maxsize=CAPACIDADE_INGESTAO)
+# Leituras completas já aceitas e ainda na fila de ingestão, por depósito:
+# um delta que chega logo depois delas tem referência
+referencias_na_fila = collections.Counter()
+# Entregas de todos os comandantes, juntadas sem contar duas vezes o mesmo evento
+livro_contribuicoes = LivroContribuicoes()
+perfilar_proximo_lote = False  # ligado por POST /perfil
+# Uma trava por depósito: atualizações de vários comandantes para o mesmo
+# MarketID são aplicadas uma de cada vez
+travas_depositos = collections.defaultdict(asyncio.Lock)
+
+def carregar_rastreio():
+    # Retoma o estado salvo; as mensagens só viram objetos quando forem usadas
+    livro_contribuicoes.usar_armazenamento(armazenamento)
+    antigo = armazenamento.valor("livro_contribuicoes")
+    if antigo:
+        # Formato antigo: o livro inteiro num valor só, regravado a cada lote
+        livro_contribuicoes.carregar(antigo)
+        livro_contribuicoes.salvar()
+        armazenamento.remover_valor("livro_contribuicoes")
+    mensagens = armazenamento.mensagens()
+    for chave, dados in armazenamento.depositos().items():
+        if "ultima_atualizacao" not in dados:
+            # Linha gravada por uma versão antiga dos bots no mesmo banco
+            print(f"Depósito salvo fora do formato do servidor ignorado: {chave}")
+            continue
+        _, mensagem_id = mensagens.get(chave, (None, None))
+        rastreio_instalacoes[chave] = {
+            "nome": dados.get("nome", chave),
+            "destino": Destino(*dados["destino"]) if dados.get("destino") else roteamento.padrao,
+            "mensagem_id": mensagem_id,
+            "deposito": DepositoCompacto.de_materiais(dados["materiais"], _marcas_salvas(dados)),
+            "timestamp": dados.get("timestamp"),
+            "serie": SerieProgresso.importar(dados.get("serie")),
+            "fontes": dados.get("fontes", []),
+            "ultima_atualizacao": datetime.datetime.fromisoformat(dados["ultima_atualizacao"]),
+            "finalizado": dados["finalizado"]
+        }
+        atualizar_etiqueta(rastreio_instalacoes[chave])
+
+# Marcas salvas: lista alinhada com os materiais ou, no formato antigo, {Name: timestamp}
+def _marcas_salvas(dados):
+    marcas = dados.get("marcas") or []
+    if isinstance(marcas, dict):
+        return [instante_journal(marcas[m["Name"]]) if m.get("Name") in marcas else 0.0 for m in dados["materiais"]]
+    return marcas
+
+# Etiqueta do conteúdo atual, comparada com o If-None-Match dos clientes
+def atualizar_etiqueta(dados):
+    dados["etiqueta"] = etiqueta_deposito(dados["deposito"].impressao, dados["nome"], dados["fontes"])
+
+def salvar_instalacao(chave, dados):
+    armazenamento.salvar_deposito(chave, {
+        "nome": dados["nome"],
+        "destino": list(dados["destino"]) if dados["destino"] else None,
+        "materiais": list(dados["deposito"]),
+        "marcas": dados["deposito"].marcas.tolist(),
+        "timestamp": dados["timestamp"],
+        "serie": dados["serie"].exportar(),
+        "fontes": dados["fontes"],
+        "ultima_atualizacao": dados["ultima_atualizacao"].isoformat(),
+        "finalizado": dados["finalizado"]
+    })
+    if dados["mensagem_id"]:
+        armazenamento.salvar_mensagem(chave, dados["destino"].canal, dados["mensagem_id"])
 
 @app.on_event("startup")
 async def startup_event():
-    asyncio.create_task(client.start(DISCORD_BOT_TOKEN))
-    asyncio.create_task(verificar_finalizacoes())
+    global saida_discord
+    carregar_rastreio()
+    if PROCESSOS_DISCORD:
+        saida_discord = ProcessosDiscord(PROCESSOS_DISCORD, DISCORD_SHARDS, DISCORD_BOT_TOKEN, mensagem_publicada)
+    else:
+        saida_discord = SaidaDiscord(client, DISCORD_SHARDS, mensagem_publicada)
+        asyncio.create_task(client.start(DISCORD_BOT_TOKEN))
+    saida_discord.iniciar()
+    for _ in range(TRABALHADORES_INGESTAO):
+        asyncio.create_task(processar_ingestao())
+    # Prazo de finalização de cada instalação ainda aberta
+    for chave, dados in rastreio_instalacoes.items():
+        if not dados["finalizado"]:
+            agendador_finalizacoes.agendar(chave, segundos_ate_finalizar(dados))
+    agendador_finalizacoes.iniciar()
 
-def formatar_mensagem(nome_instalacao, materiais, porcentagem_conclusao):
-    linhas = [f"\ud83d\udccd **Materiais para instalação:** `{nome_instalacao}` `{porcentagem_conclusao}`\n"]
+def formatar_mensagem(nome_instalacao, materiais, porcentagem_conclusao, ritmo=None, fontes=None, lideres=None):
+    cabecalho = f"\ud83d\udccd **Materiais para instalação:** `{nome_instalacao}` `{porcentagem_conclusao}`"
+    if ritmo is not None:
+        por_hora, restante = ritmo
+        cabecalho += f" `{por_hora:.0f} t/h` `ETA {formatar_duracao(restante)}`"
+    linhas = [cabecalho + "\n"]
     linhas.append("```")
     linhas.append(f"{'Material':<25} | {'Req.':>5} | {'Fornec.':>7} | {'Faltam':>6}")
     linhas.append("-" * 52)
@@ -40,73 +155,392 @@ def formatar_mensagem(nome_instalacao, materiais, porcentagem_conclusao):
         faltando = req - prov
         linhas.append(f"{nome:<25} | {req:>5} | {prov:>7} | {faltando:>6}")
     linhas.append("```")
-    return "\n".join(linhas)
+    # Fontes e placar ocupam só o que sobra do limite; a tabela vem antes
+    if fontes:
+        linhas.append(formatar_fontes(fontes, espaco=espaco_na_mensagem(linhas)))
+    if lideres:
+        linhas.append(formatar_lideres(lideres, espaco=espaco_na_mensagem(linhas)))
+    return "\n".join(linhas)[:LIMITE_MENSAGEM]
+
+# Mesma etiqueta, mesmo ponto da série (de onde sai o ritmo) e mesmo placar = mesmo texto
+renderizar_mensagem = CacheRenderizacao(formatar_mensagem)
+
+def segundos_ate_finalizar(dados):
+    prazo = dados["ultima_atualizacao"] + datetime.timedelta(hours=TEMPO_FINALIZACAO_HORAS)
+    return (prazo - datetime.datetime.utcnow()).total_seconds()
+
+# Chamada pelo agendador quando uma instalação passa TEMPO_FINALIZACAO_HORAS
+# sem atualização (cada atualização empurra o prazo para frente)
+async def verificar_finalizacoes(chave):
+    dados = rastreio_instalacoes.get(chave)
+    if dados is None or dados["finalizado"]:
+        return
+    if segundos_ate_finalizar(dados) > 0:
+        agendador_finalizacoes.agendar(chave, segundos_ate_finalizar(dados))
+        return
+    try:
+        if dados["destino"] is not None:
+            await saida_discord.finalizar(chave, dados["destino"], dados["mensagem_id"], dados["deposito"].completo)
+        dados["finalizado"] = True
+        salvar_instalacao(chave, dados)
+        transmissao.publicar(chave, estado_publico(chave, dados))
+        print(f"\u2705 Finalizado automaticamente: {dados['nome']}")
+    except Exception as e:
+        print(f"Erro ao finalizar {dados['nome']}: {e}")
+
+agendador_finalizacoes = AgendadorPrazos(verificar_finalizacoes)
+
+# Aplica a leitura de um comandante ao depósito (MarketID) e devolve a
+# chave se algo mudou. Leituras com timestamp mais antigo que o já aplicado
+# para um material são ignoradas. Um depósito novo fica no `destino` de
+# quem o enviou primeiro.
+async def aplicar_atualizacao(market_id, nome_instalacao, materiais, timestamp, completo, fontes=None,
+                              destino=None):
+    chave = chave_deposito(market_id, nome_instalacao)
+    async with travas_depositos[chave]:
+        dados = rastreio_instalacoes.get(chave)
+        if dados is None:
+            if not completo:
+                # receber_delta já pediu o reenvio dos deltas sem referência
+                print(f"Delta sem leitura completa descartado: {nome_instalacao}")
+                return None
+            # Completo desde o início: só entra em rastreio_instalacoes se a leitura mudar algo
+            dados = {"nome": nome_instalacao, "destino": destino or roteamento.padrao, "mensagem_id": None,
+                     "deposito": DepositoCompacto(), "timestamp": None, "serie": SerieProgresso(), "fontes": [],
+                     "ultima_atualizacao": datetime.datetime.utcnow(), "finalizado": False}
+        dados["nome"] = nome_instalacao
+        # Fontes novas também mudam a mensagem, mesmo com os materiais iguais
+        fontes_mudaram = fontes is not None and fontes != dados["fontes"]
+        if fontes is not None:
+            dados["fontes"] = fontes
+        # Sem timestamp não há instante do journal: o relógio do servidor não
+        # se compara com o do jogo, então as marcas dos materiais ficam como estão
+        instante = instante_journal(timestamp) if timestamp else None
+        materiais_mudaram = dados["deposito"].aplicar(materiais, instante)
+        if timestamp and timestamp > (dados["timestamp"] or ""):
+            dados["timestamp"] = timestamp
+        atualizar_etiqueta(dados)
+        if not (materiais_mudaram or fontes_mudaram):
+            return None
+        if materiais_mudaram and instante is not None:
+            # Um ponto no relógio do servidor travaria os seguintes (a série não volta no tempo)
+            dados["serie"].registrar(instante, dados["deposito"])
+        dados["ultima_atualizacao"] = datetime.datetime.utcnow()
+        dados["finalizado"] = False
+        rastreio_instalacoes[chave] = dados
+        salvar_instalacao(chave, dados)
+        agendador_finalizacoes.agendar(chave, TEMPO_FINALIZACAO_HORAS * 3600)
+    return chave
+
+# O que os painéis ao vivo recebem de cada depósito
+def estado_publico(chave, dados):
+    serie = dados["serie"]
+    return {
+        "deposito": chave,
+        "nome": dados["nome"],
+        "materiais": list(dados["deposito"]),
+        "progresso": dados["deposito"].progresso,
+        "ritmo": serie.ritmo(),
+        "fontes": dados["fontes"],
+        "timestamp": dados["timestamp"],
+        "finalizado": dados["finalizado"],
+        "etiqueta": dados["etiqueta"],
+        "lideres": lideres_deposito(chave),
+    }
+
+def lideres_deposito(chave):
+    return livro_contribuicoes.lideres(int(chave)) if chave.isdigit() else []
+
+transmissao = Transmissao(lambda: [estado_publico(chave, dados) for chave, dados in rastreio_instalacoes.items()])
+
+def publicar_instalacao(chave):
+    dados = rastreio_instalacoes[chave]
+    transmissao.publicar(chave, estado_publico(chave, dados))
+    if dados["destino"] is None:
+        # Sem DISCORD_CHANNEL_ID nem rota para ele: o depósito só aparece no painel ao vivo
+        print(f"Sem canal do Discord para {dados['nome']}, mensagem não enviada")
+        return
+    serie = dados["serie"]
+    porcentagem_formatada = f"{dados['deposito'].progresso * 100:.1f}%"
+    lideres = tuple(lideres_deposito(chave))
+    chave_cache = (dados["etiqueta"], serie.instantes[-1] if len(serie) else None, lideres)
+    msg_formatada = renderizar_mensagem(chave_cache, dados["nome"], dados["deposito"], porcentagem_formatada,
+                                        serie.ritmo(), dados["fontes"], lideres)
+    # A fila do shard edita a mensagem existente e junta atualizações seguidas da mesma instalação
+    if not saida_discord.agendar(chave, dados["destino"], msg_formatada, dados["mensagem_id"],
+                                 dados["deposito"].completo):
+        print(f"Fila do Discord cheia, atualização descartada: {dados['nome']}")
+
+async def mensagem_publicada(chave, canal_id, mensagem_id):
+    dados = rastreio_instalacoes[chave]
+    if dados["mensagem_id"] != mensagem_id:
+        dados["mensagem_id"] = mensagem_id
+        salvar_instalacao(chave, dados)
+
+def contar_sites():
+    abertos = sum(1 for dados in rastreio_instalacoes.values() if not dados["finalizado"])
+    return {("aberto",): abertos, ("finalizado",): len(rastreio_instalacoes) - abertos}
+
+metricas.Medidor("botelite_fila_discord_profundidade", "Atualizações esperando envio ao Discord",
+                 funcao=lambda: saida_discord.profundidade if saida_discord else 0)
+metricas.Medidor("botelite_fila_discord_shard_profundidade", "Atualizações esperando envio, por shard",
+                 ("shard",), funcao=lambda: {(shard,): p for shard, p in saida_discord.profundidades().items()}
+                 if saida_discord else {})
+metricas.Medidor("botelite_fila_ingestao_profundidade", "Lotes recebidos esperando processamento",
+                 funcao=lambda: fila_ingestao.qsize())
+metricas.Medidor("botelite_ao_vivo_espectadores", "Conexões abertas em /ao-vivo e /ao-vivo/ws",
+                 funcao=lambda: transmissao.espectadores)
+metricas.Medidor("botelite_sites_rastreados", "Instalações conhecidas pelo servidor", ("estado",),
+                 funcao=contar_sites)
+
+
+@app.middleware("http")
+async def medir_requisicao(request: Request, call_next):
+    inicio = time.perf_counter()
+    resposta = await call_next(request)
+    if request.url.path.startswith("/logdata"):
+        TEMPO_REQUISICAO.observar(time.perf_counter() - inicio, rota=request.url.path, status=resposta.status_code)
+    return resposta
+
+
+@app.get("/metrics")
+async def exportar_metricas():
+    return PlainTextResponse(metricas.exportar(), media_type="text/plain; version=0.0.4")
+
+
+# Liga o cProfile durante o processamento do próximo lote; o relatório sai no console
+@app.post("/perfil", status_code=202)
+async def perfilar_lote():
+    global perfilar_proximo_lote
+    if not PERFIL_LOTES:
+        raise HTTPException(status_code=404, detail="Not Found")
+    perfilar_proximo_lote = True
+    return JSONResponse(status_code=202, content={"status": "o próximo lote será perfilado"})
+
+
+@app.get("/fila")
+async def estatisticas_fila():
+    return JSONResponse(content={**saida_discord.estatisticas(), "ingestao": fila_ingestao.qsize()})
+
+
+def enfileirar_ingestao(lote):
+    try:
+        fila_ingestao.put_nowait(lote)
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=429, detail="Fila de ingestão cheia, tente novamente.",
+                            headers={"Retry-After": "5"})
+    for item in lote:
+        if "contribuicao" not in item and item.get("completo", True):
+            referencias_na_fila[chave_deposito(item.get("market_id"), item["instalacao"])] += 1
 
-async def adicionar_reacao_check(mensagem, materiais):
-    if all(item["ProvidedAmount"] >= item["RequiredAmount"] for item in materiais):
-        reacoes = [str(r.emoji) async for r in mensagem.reactions]
-        if "\u2705" not in reacoes:
-            await mensagem.add_reaction("\u2705")
+def _referencia_aplicada(chave):
+    referencias_na_fila[chave] -= 1
+    if referencias_na_fila[chave] <= 0:
+        del referencias_na_fila[chave]
 
-async def verificar_finalizacoes():
+# 304 se o cabeçalho If-None-Match traz, para cada depósito, a etiqueta do
+# estado que o servidor já tem: nem o corpo precisa ser lido
+def inalterado(request):
+    etiquetas = ler_if_none_match(request.headers.get("if-none-match"))
+    if not etiquetas or any(rastreio_instalacoes.get(chave, {}).get("etiqueta") != etiqueta
+                            for chave, etiqueta in etiquetas.items()):
+        return None
+    return Response(status_code=304, headers={"ETag": request.headers["if-none-match"]})
+
+# Canal de um depósito pelo roteamento: o do próprio MarketID ou o da chave
+# de API (X-Chave-Api) de quem enviou
+def destino_requisicao(request, market_id):
+    destino = roteamento.destino(market_id, request.headers.get("x-chave-api"))
+    if destino is None:
+        raise HTTPException(status_code=403, detail="Chave de API sem canal configurado.")
+    return list(destino)
+
+# Aplica um item do lote; devolve a chave do depósito alterado ou None
+async def aplicar_item(item):
+    entrega = item.get("contribuicao")
+    if entrega is not None:
+        if not livro_contribuicoes.registrar(entrega.get("comandante") or DESCONHECIDO, entrega["market_id"],
+                                             entrega.get("timestamp"), entrega["itens"]):
+            return None
+        chave = chave_deposito(entrega["market_id"], None)
+        return chave if chave in rastreio_instalacoes else None
+    return await aplicar_atualizacao(item.get("market_id"), item["instalacao"], item["materiais"],
+                                     item.get("timestamp"), item.get("completo", True), item.get("fontes"),
+                                     Destino(*item["destino"]) if item.get("destino") else None)
+
+async def processar_lote(lote):
+    # Vários deltas do mesmo depósito no lote viram uma única mensagem
+    alteradas = {}
+    try:
+        # Um item com erro não leva junto o resto do lote
+        for item in lote:
+            try:
+                chave = await aplicar_item(item)
+            except Exception as e:
+                print(f"Erro ao aplicar {item.get('instalacao') or 'contribuição'}: {e}")
+                continue
+            if chave is not None:
+                alteradas[chave] = True
+    finally:
+        for item in lote:
+            if "contribuicao" not in item and item.get("completo", True):
+                _referencia_aplicada(chave_deposito(item.get("market_id"), item["instalacao"]))
+    # Só as entregas novas do lote vão para o banco
+    livro_contribuicoes.salvar()
+    for chave in alteradas:
+        publicar_instalacao(chave)
+
+async def processar_ingestao():
+    global perfilar_proximo_lote
     while True:
-        agora = datetime.datetime.utcnow()
-        for nome, dados in list(rastreio_instalacoes.items()):
-            if not dados["finalizado"]:
-                diff = agora - dados["ultima_atualizacao"]
-                horas = diff.total_seconds() / 3600
-                if horas >= TEMPO_FINALIZACAO_HORAS:
-                    try:
-                        await adicionar_reacao_check(dados["mensagem"], dados["materiais"])
-                        dados["finalizado"] = True
-                        print(f"\u2705 Finalizado automaticamente: {nome}")
-                    except Exception as e:
-                        print(f"Erro ao finalizar {nome}: {e}")
-        await asyncio.sleep(600)
-
-def calcular_porcentagem_conclusao(materiais):
-    total_requisitado = sum(m["RequiredAmount"] for m in materiais)
-    total_fornecido = sum(m["ProvidedAmount"] for m in materiais)
-    if total_requisitado == 0:
-        return 0.0
-    return (total_fornecido / total_requisitado) * 100
-
-
-@app.post("/logdata")
-async def receber_dados(request: Request):
-    if not client.is_ready():
-        raise HTTPException(status_code=503, detail="Bot do Discord ainda não está pronto.")
+        lote = await fila_ingestao.get()
+        try:
+            if perfilar_proximo_lote:
+                perfilar_proximo_lote = False
+                with metricas.perfil():
+                    await processar_lote(lote)
+            else:
+                with TEMPO_LOTE.cronometrar():
+                    await processar_lote(lote)
+        except Exception as e:
+            print(f"Erro ao processar atualização: {e}")
+        finally:
+            fila_ingestao.task_done()
+
 
-    data = await request.json()
+# Os endpoints só validam e enfileiram (202); os trabalhadores de ingestão
+# atualizam o estado e a FilaDiscord publica quando o bot estiver conectado
+@app.post("/logdata", status_code=202)
+async def receber_dados(request: Request):
+    resposta = inalterado(request)
+    if resposta is not None:
+        return resposta
+    try:
+        data = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dados inválidos.")
+    if not isinstance(data, dict) or not leitura_valida(data):
+        raise HTTPException(status_code=400, detail="Dados inválidos.")
     nome_instalacao = data.get("instalacao")
 
     materiais = data.get("materiais")
 
-    porcentagem_conclusao = calcular_porcentagem_conclusao(materiais)
-    porcentagem_formatada = f"{porcentagem_conclusao:.1f}%"
+    enfileirar_ingestao([{
+        "market_id": data.get("market_id"),
+        "instalacao": nome_instalacao,
+        "timestamp": data.get("timestamp"),
+        "completo": True,
+        "materiais": materiais,
+        "destino": destino_requisicao(request, data.get("market_id"))
+    }])
+
+    return JSONResponse(status_code=202, content={"status": "aceito"})
+
+
+def _inteiro(valor):
+    return isinstance(valor, int) and not isinstance(valor, bool)
 
-    if not nome_instalacao or not isinstance(materiais, list):
+# Validado antes de enfileirar: o que passa daqui os trabalhadores conseguem aplicar
+def material_valido(m):
+    return (isinstance(m, dict) and isinstance(m.get("Name") or m.get("Name_Localised"), str)
+            and _inteiro(m.get("RequiredAmount")) and _inteiro(m.get("ProvidedAmount")))
+
+# Leitura de um depósito (/logdata) ou delta (/logdata/delta); clientes antigos não mandam o MarketID
+def leitura_valida(item):
+    market_id = item.get("market_id")
+    materiais = item.get("materiais")
+    return (isinstance(item.get("instalacao"), str) and bool(item["instalacao"])
+            and (market_id is None or _inteiro(market_id))
+            and isinstance(item.get("timestamp") or "", str)
+            and isinstance(materiais, list) and bool(materiais) and all(map(material_valido, materiais))
+            and isinstance(item.get("fontes", []), list))
+
+# Item do lote: delta de um depósito ou {"contribuicao": entrega do LivroContribuicoes}
+def item_valido(item):
+    if not isinstance(item, dict):
+        return False
+    entrega = item.get("contribuicao")
+    if entrega is not None:
+        return (isinstance(entrega, dict) and _inteiro(entrega.get("market_id"))
+                and isinstance(entrega.get("itens"), list)
+                and all(isinstance(i, list) and len(i) == 3 and isinstance(i[2], int) for i in entrega["itens"]))
+    return leitura_valida(item)
+
+
+# Tira do lote os deltas de depósitos que o servidor não conhece (reiniciou
+# sem estado) nem vai conhecer antes deles: sem a leitura completa de
+# referência não há o que aplicar. Devolve (lote, MarketIDs a reenviar).
+def separar_sem_referencia(lote):
+    conhecidas = set()
+    aplicaveis, reenviar = [], []
+    for item in lote:
+        if "contribuicao" not in item:
+            chave = chave_deposito(item.get("market_id"), item["instalacao"])
+            if item.get("completo", True):
+                conhecidas.add(chave)
+            elif chave not in conhecidas and chave not in rastreio_instalacoes and not referencias_na_fila[chave]:
+                if item.get("market_id") not in reenviar:
+                    reenviar.append(item.get("market_id"))
+                continue
+        aplicaveis.append(item)
+    return aplicaveis, reenviar
+
+
+@app.post("/logdata/delta", status_code=202)
+async def receber_delta(request: Request):
+    resposta = inalterado(request)
+    if resposta is not None:
+        return resposta
+    corpo = await request.body()
+    try:
+        if request.headers.get("content-encoding", "").lower() == "gzip":
+            corpo = gzip.decompress(corpo)
+        lote = json.loads(corpo).get("lote")
+    except (OSError, ValueError, AttributeError):
+        raise HTTPException(status_code=400, detail="Dados inválidos.")
+    if not isinstance(lote, list) or not all(map(item_valido, lote)):
         raise HTTPException(status_code=400, detail="Dados inválidos.")
+    for item in lote:
+        if "contribuicao" not in item:
+            item["destino"] = destino_requisicao(request, item.get("market_id"))
 
-    canal = client.get_channel(DISCORD_CHANNEL_ID)
-    porcentagem_formatada = f"{float(porcentagem_conclusao):.1f}%"
-    msg_formatada = formatar_mensagem(nome_instalacao, materiais, porcentagem_formatada)
+    # A resposta deste mesmo POST diz a quem enviou quais depósitos reenviar completos
+    lote, reenviar = separar_sem_referencia(lote)
+    if lote:
+        enfileirar_ingestao(lote)
 
+    return JSONResponse(status_code=202, content={"status": "aceito", "reenviar": reenviar})
 
-    if nome_instalacao in rastreio_instalacoes:
-        dados = rastreio_instalacoes[nome_instalacao]
-        try:
-            await dados["mensagem"].delete()
-        except Exception as e:
-            print(f"Erro ao deletar mensagem anterior: {e}")
 
-    nova_msg = await canal.send(msg_formatada)
-    rastreio_instalacoes[nome_instalacao] = {
-        "mensagem": nova_msg,
-        "materiais": materiais,
-        "ultima_atualizacao": datetime.datetime.utcnow(),
-        "finalizado": False
-    }
-    await adicionar_reacao_check(nova_msg, materiais)
+def _desde(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+# Progresso dos depósitos ao vivo, para painéis e overlays: um retrato
+# completo ao conectar e depois cada depósito que mudar. SSE reconecta
+# sozinho com Last-Event-ID e continua de onde parou.
+@app.get("/ao-vivo")
+async def ao_vivo(request: Request):
+    async def eventos():
+        async for tipo, seq, texto in transmissao.acompanhar(_desde(request.headers.get("last-event-id"))):
+            if tipo == "ping":
+                yield ": ping\n\n"
+            else:
+                yield f"id: {seq}\nevent: {tipo}\ndata: {texto}\n\n"
+    return StreamingResponse(eventos(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 
-    return JSONResponse(content={"status": "ok"})
+# Mesmo conteúdo por WebSocket: {"tipo": "retrato" | "deposito" | "ping", "dados": ...};
+# ?desde=<seq> faz o papel do Last-Event-ID
+@app.websocket("/ao-vivo/ws")
+async def ao_vivo_ws(websocket: WebSocket):
+    await websocket.accept()
+    try:
+        async for tipo, seq, texto in transmissao.acompanhar(_desde(websocket.query_params.get("desde"))):
+            await websocket.send_text(f'{{"tipo": "{tipo}", "dados": {texto or "null"}}}')
+    except WebSocketDisconnect:
+        pass
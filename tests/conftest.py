@@ -0,0 +1,53 @@
+import asyncio
+import importlib
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+# Os módulos do projeto ficam na raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# O servidor abre o banco padrão na importação; nada de botElite.db na pasta do projeto
+os.environ["ARQUIVO_BANCO"] = os.path.join(tempfile.gettempdir(), f"testes-{os.getpid()}.db")
+
+
+def esperar(condicao, timeout=10.0):
+    limite = time.monotonic() + timeout
+    while not condicao():
+        if time.monotonic() > limite:
+            raise AssertionError("condição não atingida a tempo")
+        time.sleep(0.01)
+
+
+# Fábrica do módulo servidor com estado novo: o servidor lê a configuração
+# na importação, então cada chamada recarrega o módulo com o `ambiente`
+# pedido (None remove a variável), um banco vazio em `banco` e o
+# ClienteFalso no lugar do Discord
+@pytest.fixture
+def carregar_servidor(tmp_path, monkeypatch):
+    import metricas
+    registradas = len(metricas.REGISTRO)
+    # O servidor pega o loop atual na importação; asyncio.run() de outro teste o deixa sem nenhum
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    def carregar(banco="servidor.db", **ambiente):
+        from armazenamento import Armazenamento
+        from discord_falso import ClienteFalso
+        for nome, valor in {"DISCORD_CHANNEL_ID": "1", "DISCORD_BOT_TOKEN": "falso", **ambiente}.items():
+            if valor is None:
+                monkeypatch.delenv(nome, raising=False)
+            else:
+                monkeypatch.setenv(nome, valor)
+        import servidor
+        servidor = importlib.reload(servidor)
+        servidor.armazenamento = Armazenamento(str(tmp_path / banco))
+        servidor.client = ClienteFalso(servidor.DISCORD_SHARDS)
+        return servidor
+
+    yield carregar
+    del metricas.REGISTRO[registradas:]
+    asyncio.set_event_loop(None)
+    loop.close()
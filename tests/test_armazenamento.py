@@ -0,0 +1,24 @@
+from armazenamento import Armazenamento
+from discord_falso import ClienteFalso
+
+MATERIAIS = [{"Name": "$steel_name;", "Name_Localised": "Aço", "RequiredAmount": 50, "ProvidedAmount": 10,
+              "Payment": 500}]
+
+
+def test_mensagens_dos_bots_nao_entram_nos_depositos_do_servidor(tmp_path):
+    armazenamento = Armazenamento(str(tmp_path / "botElite.db"))
+    canal = ClienteFalso().get_channel(1)
+    mensagem = canal.get_partial_message(42)
+    armazenamento.salvar_mensagem_enviada(111, 1, mensagem, "Depósito", MATERIAIS)
+    assert armazenamento.depositos() == {} and armazenamento.mensagens() == {}
+    enviadas, finalizadas = armazenamento.mensagens_enviadas(canal)
+    assert enviadas[111][0].id == 42 and enviadas[111][1] == "Depósito" and not finalizadas
+
+
+def test_linhas_antigas_dos_bots_sao_migradas(tmp_path):
+    armazenamento = Armazenamento(str(tmp_path / "botElite.db"))
+    armazenamento.salvar_deposito(111, {"nome": "Depósito", "materiais": MATERIAIS, "finalizado": True})
+    armazenamento.salvar_mensagem(111, 1, 42)
+    _, finalizadas = armazenamento.mensagens_enviadas(ClienteFalso().get_channel(1))
+    assert finalizadas == {111}
+    assert armazenamento.depositos() == {} and armazenamento.mensagens() == {}
@@ -0,0 +1,41 @@
+from deposito_compacto import DepositoCompacto
+from serie_progresso import instante_journal
+
+
+def aluminio(fornecido):
+    return {"Name": "$aluminium_name;", "Name_Localised": "Alumínio", "RequiredAmount": 100,
+            "ProvidedAmount": fornecido}
+
+
+def test_leitura_mais_antiga_nao_sobrescreve():
+    deposito = DepositoCompacto()
+    deposito.aplicar([aluminio(50)], instante_journal("2025-05-20T18:00:00Z"))
+    assert not deposito.aplicar([aluminio(20)], instante_journal("2025-05-20T17:00:00Z"))
+    assert deposito.total_fornecido == 50
+
+
+def test_leitura_sem_instante_nao_avanca_as_marcas():
+    deposito = DepositoCompacto()
+    deposito.aplicar([aluminio(10)], instante_journal("2025-05-20T17:00:00Z"))
+    assert deposito.aplicar([aluminio(20)], None)
+    assert deposito.marcas[0] == instante_journal("2025-05-20T17:00:00Z")
+    # A próxima leitura do journal continua valendo
+    assert deposito.aplicar([aluminio(30)], instante_journal("2025-05-20T17:30:00Z"))
+    assert deposito.total_fornecido == 30
+
+
+def test_localizacao_de_um_deposito_nao_muda_os_outros():
+    from impressao import impressao_materiais
+
+    def aco(localizado, fornecido, pagamento=500):
+        return {"Name": "$steel_name;", "Name_Localised": localizado, "RequiredAmount": 100,
+                "ProvidedAmount": fornecido, "Payment": pagamento}
+
+    a = DepositoCompacto.de_materiais([aco("Aço", 10)])
+    b = DepositoCompacto.de_materiais([aco("Aço", 20)])
+    a.aplicar([aco("Steel", 30, 900)], instante_journal("2025-05-20T18:00:00Z"))
+    assert [m["Name_Localised"] for m in a] == ["Steel"]
+    assert [(m["Name_Localised"], m["Payment"]) for m in b] == [("Aço", 500)]
+    assert len(a) == 1
+    assert a.impressao == impressao_materiais(list(a))
+    assert b.impressao == impressao_materiais(list(b))
@@ -0,0 +1,128 @@
+import gzip
+import json
+import os
+
+import requests
+
+from envio_api import PASTA_REJEITADOS, EnviadorAPI
+
+
+class RespostaFalsa:
+
+    def __init__(self, status_code, dados=None):
+        self.status_code = status_code
+        self.dados = dados or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code}", response=self)
+
+    def json(self):
+        return self.dados
+
+
+# Session.post que devolve as respostas de `respostas` em ordem (a última se
+# repete) e guarda cada lote recebido
+class PostFalso:
+
+    def __init__(self, *respostas):
+        self.respostas = list(respostas)
+        self.lotes = []
+
+    def __call__(self, url, data, **kwargs):
+        self.lotes.append(json.loads(gzip.decompress(data))["lote"])
+        resposta = self.respostas.pop(0) if len(self.respostas) > 1 else self.respostas[0]
+        if isinstance(resposta, Exception):
+            raise resposta
+        return resposta
+
+
+def aluminio(fornecido):
+    return {"Name": "$aluminium_name;", "Name_Localised": "Alumínio", "RequiredAmount": 100,
+            "ProvidedAmount": fornecido, "Payment": 1000}
+
+
+def test_reenvio_completo_leva_timestamp_e_fontes_da_leitura(tmp_path):
+    enviador = EnviadorAPI("http://servidor/logdata/delta", pasta_fila=str(tmp_path / "fila"))
+    fontes = [{"material": "Alumínio", "estacao": "X", "sistema": "Y", "distancia": 1.0, "preco": 300,
+               "timestamp": "2025-05-20T17:00:00Z"}]
+    enviador.atualizar(111, "Depósito", [aluminio(10)], "2025-05-20T17:37:15Z", fontes)
+    enviador.sessao.post = post = PostFalso(RespostaFalsa(202, {"reenviar": [111]}), RespostaFalsa(202))
+    assert enviador.despachar() == 2
+    reenvio = post.lotes[1][0]
+    assert reenvio["completo"]
+    assert reenvio["timestamp"] == "2025-05-20T17:37:15Z"
+    assert reenvio["fontes"] == fontes
+    assert reenvio["instalacao"] == "Depósito"
+
+
+def test_4xx_sai_da_fila_e_nao_segura_o_resto(tmp_path):
+    enviador = EnviadorAPI("http://servidor/logdata/delta", pasta_fila=str(tmp_path / "fila"))
+    enviador.enfileirar({"market_id": 111, "instalacao": "x", "materiais": [1, 2]})
+    enviador.sessao.post = post = PostFalso(RespostaFalsa(400), RespostaFalsa(202))
+    assert enviador.despachar() == 0
+    assert enviador.tamanho_fila == 0
+    assert len(os.listdir(tmp_path / "fila" / PASTA_REJEITADOS)) == 1
+    enviador.atualizar(222, "Depósito", [aluminio(10)], "2025-05-20T17:37:15Z")
+    assert enviador.despachar() == 1
+    assert post.lotes[-1][0]["market_id"] == 222
+
+
+def test_5xx_e_429_ficam_na_fila(tmp_path):
+    enviador = EnviadorAPI("http://servidor/logdata/delta", pasta_fila=str(tmp_path / "fila"))
+    enviador.atualizar(111, "Depósito", [aluminio(10)], "2025-05-20T17:37:15Z")
+    for status in (503, 429):
+        enviador._proxima_tentativa = 0.0
+        enviador.sessao.post = PostFalso(RespostaFalsa(status))
+        assert enviador.despachar() == 0
+        assert enviador.tamanho_fila == 1
+
+
+def test_fila_reenviada_em_ordem_depois_da_queda(tmp_path):
+    enviador = EnviadorAPI("http://servidor/logdata/delta", pasta_fila=str(tmp_path / "fila"))
+    enviador.sessao.post = PostFalso(requests.ConnectionError("fora do ar"))
+    for fornecido in (10, 20, 30):
+        enviador.atualizar(111, "Depósito", [aluminio(fornecido)], f"2025-05-20T17:{fornecido}:00Z")
+        enviador.despachar()
+    assert enviador.tamanho_fila == 3
+
+    enviador._proxima_tentativa = 0.0
+    enviador.sessao.post = post = PostFalso(RespostaFalsa(202))
+    assert enviador.despachar() == 3
+    [lote] = post.lotes
+    assert [item["materiais"][0]["ProvidedAmount"] for item in lote] == [10, 20, 30]
+    assert [item["completo"] for item in lote] == [True, False, False]
+
+
+def test_espera_dobra_a_cada_falha_e_zera_no_sucesso(tmp_path, monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr("envio_api.time.monotonic", lambda: agora[0])
+    enviador = EnviadorAPI("http://servidor/logdata/delta", pasta_fila=str(tmp_path / "fila"))
+    enviador.atualizar(111, "Depósito", [aluminio(10)], "2025-05-20T17:37:15Z")
+    enviador.sessao.post = post = PostFalso(RespostaFalsa(503))
+    esperas = []
+    for _ in range(4):
+        enviador.despachar()
+        esperas.append(enviador._espera)
+        # Antes do prazo nem tenta
+        assert enviador.despachar() == 0
+        agora[0] = enviador._proxima_tentativa
+    assert esperas == [1.0, 2.0, 4.0, 8.0]
+    assert len(post.lotes) == 4
+    enviador.sessao.post = PostFalso(RespostaFalsa(202))
+    assert enviador.despachar() == 1
+    assert enviador._espera == 0.0
+
+
+def test_delta_so_leva_materiais_com_fornecido_alterado(tmp_path):
+    enviador = EnviadorAPI("http://servidor/logdata/delta", pasta_fila=str(tmp_path / "fila"))
+    aco = {"Name": "$steel_name;", "Name_Localised": "Aço", "RequiredAmount": 50, "ProvidedAmount": 0,
+           "Payment": 500}
+    enviador.atualizar(111, "Depósito", [aluminio(10), aco], "2025-05-20T17:37:15Z")
+    assert not enviador.atualizar(111, "Depósito", [aluminio(10), aco], "2025-05-20T17:38:00Z")
+    enviador.atualizar(111, "Depósito", [aluminio(25), aco], "2025-05-20T17:39:00Z")
+    enviador.sessao.post = post = PostFalso(RespostaFalsa(202))
+    enviador.despachar()
+    completo, delta = post.lotes[0]
+    assert len(completo["materiais"]) == 2
+    assert not delta["completo"] and delta["materiais"] == [aluminio(25)]
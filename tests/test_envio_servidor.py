@@ -0,0 +1,104 @@
+import socket
+import threading
+
+import uvicorn
+
+from conftest import esperar
+from envio_api import EnviadorAPI
+
+
+def material(nome, requerido, fornecido):
+    return {"Name": f"${nome}_name;", "Name_Localised": nome.capitalize(), "RequiredAmount": requerido,
+            "ProvidedAmount": fornecido, "Payment": 1000}
+
+
+# O app de verdade (com o ClienteFalso no lugar do Discord) servindo HTTP
+# numa porta local, numa thread; antes de iniciar(), a porta recusa conexões
+class ServidorLocal:
+
+    def __init__(self, servidor):
+        self.servidor = servidor
+        self.socket = socket.socket()
+        self.socket.bind(("127.0.0.1", 0))
+        self.url = f"http://127.0.0.1:{self.socket.getsockname()[1]}/logdata/delta"
+        self.uvicorn = uvicorn.Server(uvicorn.Config(servidor.app, log_level="warning"))
+        self.thread = None
+
+    def iniciar(self):
+        self.thread = threading.Thread(target=self.uvicorn.run, kwargs={"sockets": [self.socket]}, daemon=True)
+        self.thread.start()
+        esperar(lambda: self.uvicorn.started)
+
+    def parar(self):
+        self.uvicorn.should_exit = True
+        self.thread.join(10)
+
+
+def deposito(servidor, market_id):
+    return servidor.rastreio_instalacoes.get(str(market_id))
+
+
+def test_fila_do_cliente_chega_em_ordem_depois_da_queda(carregar_servidor, tmp_path):
+    servidor = carregar_servidor()
+    local = ServidorLocal(servidor)
+    enviador = EnviadorAPI(local.url, pasta_fila=str(tmp_path / "fila"), timeout=5)
+    # Servidor fora do ar: tudo fica na fila em disco
+    for minuto, fornecido in ((37, 10), (40, 25), (45, 60)):
+        enviador.atualizar(111, "Depósito 111", [material("aluminium", 100, fornecido), material("steel", 50, 0)],
+                           f"2025-05-20T17:{minuto}:00Z")
+        assert enviador.despachar() == 0
+    assert enviador.tamanho_fila == 3
+    local.iniciar()
+    try:
+        enviador._proxima_tentativa = 0.0
+        assert enviador.despachar() == 3
+        esperar(lambda: deposito(servidor, 111) and deposito(servidor, 111)["deposito"].total_fornecido == 60)
+        esperar(lambda: servidor.client.operacoes["enviar"] == 1)
+        dados = deposito(servidor, 111)
+        assert dados["timestamp"] == "2025-05-20T17:45:00Z"
+        [canal] = servidor.client.canais.values()
+        [mensagem] = canal.mensagens.values()
+        assert "Aluminium" in mensagem.content
+    finally:
+        local.parar()
+
+
+def test_reenvio_completo_quando_o_servidor_volta_sem_estado(carregar_servidor, tmp_path):
+    servidor = carregar_servidor()
+    local = ServidorLocal(servidor)
+    local.iniciar()
+    enviador = EnviadorAPI(local.url, pasta_fila=str(tmp_path / "fila"), timeout=5)
+    try:
+        enviador.atualizar(111, "Depósito 111", [material("aluminium", 100, 10), material("steel", 50, 0)],
+                           "2025-05-20T17:37:15Z")
+        assert enviador.despachar() == 1
+        esperar(lambda: deposito(servidor, 111) is not None)
+    finally:
+        local.parar()
+
+    # Reinício com banco vazio: o próximo delta não tem referência no servidor
+    servidor = carregar_servidor(banco="vazio.db")
+    local = ServidorLocal(servidor)
+    local.iniciar()
+    try:
+        enviador.url = local.url
+        enviador.atualizar(111, "Depósito 111", [material("aluminium", 100, 30), material("steel", 50, 0)],
+                           "2025-05-20T17:50:00Z")
+        # O delta volta com reenviar e o estado completo sai no mesmo despacho
+        assert enviador.despachar() == 2
+        esperar(lambda: deposito(servidor, 111) is not None)
+        dados = deposito(servidor, 111)
+        assert len(dados["deposito"]) == 2
+        assert dados["deposito"].total_fornecido == 30
+        assert dados["timestamp"] == "2025-05-20T17:50:00Z"
+
+        # O reenvio levou o horário do journal, não o relógio do servidor:
+        # o delta de outro comandante, mais novo no journal, ainda é aplicado
+        outro = EnviadorAPI(local.url, pasta_fila=str(tmp_path / "outro"), timeout=5)
+        outro._base[111] = {m["Name"]: m for m in (material("aluminium", 100, 30), material("steel", 50, 0))}
+        outro.atualizar(111, "Depósito 111", [material("aluminium", 100, 30), material("steel", 50, 20)],
+                        "2025-05-20T17:55:00Z")
+        assert outro.despachar() == 1
+        esperar(lambda: dados["deposito"].total_fornecido == 50)
+    finally:
+        local.parar()
@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+from discord_falso import ClienteFalso, MensagemFalsa
+from fila_discord import FilaDiscord
+
+
+# FilaDiscord com o ClienteFalso: cada chave "<canal>:<nome>" vai para o seu canal
+def montar(cliente, capacidade=1000, limite=None):
+    mensagens = {}
+
+    async def publicada(chave, mensagem):
+        mensagens[chave] = mensagem
+
+    fila = FilaDiscord(lambda chave: cliente.get_channel(int(chave.split(":")[0])), mensagens.get, publicada,
+                       capacidade=capacidade)
+    if limite is not None:
+        for canal in (1, 2):
+            balde = fila.baldes[f"mensagens:{canal}"]
+            balde.capacidade, balde.periodo, balde.fichas = limite
+    return fila, mensagens
+
+
+def test_atualizacoes_seguidas_viram_uma_edicao():
+    async def cenario():
+        cliente = ClienteFalso()
+        fila, mensagens = montar(cliente)
+        for i in range(5):
+            fila.agendar("1:a", f"versão {i}")
+        fila.iniciar()
+        await fila.esvaziar()
+        return cliente, fila, mensagens
+
+    cliente, fila, mensagens = asyncio.run(cenario())
+    assert mensagens["1:a"].content == "versão 4"
+    assert cliente.operacoes["enviar"] == 1
+    assert fila.contadores["coalescidas"] == 4
+
+
+def test_fila_cheia_descarta_e_conta():
+    cliente = ClienteFalso()
+    fila, _ = montar(cliente, capacidade=2)
+    assert fila.agendar("1:a", "a") and fila.agendar("1:b", "b")
+    assert not fila.agendar("1:c", "c")
+    # Chave já pendente ainda é aceita: só troca o conteúdo
+    assert fila.agendar("1:a", "a2")
+    assert fila.contadores["descartadas"] == 1
+
+
+def test_mensagem_apagada_e_enviada_de_novo():
+    async def cenario():
+        cliente = ClienteFalso()
+        fila, mensagens = montar(cliente)
+        mensagens["1:a"] = cliente.get_channel(1).get_partial_message(42)  # ID salvo que não existe mais
+        fila.agendar("1:a", "novo")
+        fila.iniciar()
+        await fila.esvaziar()
+        return cliente, mensagens
+
+    cliente, mensagens = asyncio.run(cenario())
+    assert cliente.operacoes["editar"] == 1 and cliente.operacoes["enviar"] == 1
+    assert mensagens["1:a"].id != 42 and mensagens["1:a"].content == "novo"
+
+
+def test_429_volta_para_a_fila_e_bloqueia_a_rota():
+    async def cenario():
+        cliente = ClienteFalso(taxa_429=1.0, retry_after=0.2)
+        fila, mensagens = montar(cliente)
+        fila.agendar("1:a", "conteúdo")
+        fila.iniciar()
+        await asyncio.sleep(0.05)
+        assert fila.pendentes == {"1:a": "conteúdo"}
+        assert fila.baldes["mensagens:1"].bloqueado_ate > time.monotonic()
+        cliente.taxa_429 = 0.0
+        inicio = time.monotonic()
+        await fila.esvaziar()
+        return cliente, mensagens, time.monotonic() - inicio
+
+    cliente, mensagens, espera = asyncio.run(cenario())
+    assert cliente.operacoes["429"] >= 1
+    assert mensagens["1:a"].content == "conteúdo"
+    assert espera >= 0.1
+
+
+def test_canal_no_limite_nao_segura_os_outros():
+    async def cenario():
+        cliente = ClienteFalso()
+        # 2 chamadas a cada 1 s por canal
+        fila, mensagens = montar(cliente, limite=(2, 1.0, 2.0))
+        for i in range(8):
+            fila.agendar(f"1:{i}", "canal 1")
+        fila.agendar("2:a", "canal 2")
+        fila.iniciar()
+        inicio = time.monotonic()
+        while "2:a" not in mensagens:
+            await asyncio.sleep(0.01)
+        espera_canal_2 = time.monotonic() - inicio
+        pendentes_canal_1 = sum(1 for chave in fila.pendentes if chave.startswith("1:"))
+        for tarefa in list(fila._trabalhadores.values()):
+            tarefa.cancel()
+        return espera_canal_2, pendentes_canal_1
+
+    espera_canal_2, pendentes_canal_1 = asyncio.run(cenario())
+    assert espera_canal_2 < 0.5
+    assert pendentes_canal_1 > 0
@@ -0,0 +1,38 @@
+import asyncio
+import shutil
+import threading
+
+from fluxo_journal import FluxoJournal
+
+JOURNAL = "Journal.2025-05-20T141829.01.log"
+
+
+class ObservadorParado:
+
+    def esperar(self, timeout=None):
+        raise asyncio.CancelledError
+
+
+def test_eventos_le_o_journal_fora_do_loop(tmp_path, monkeypatch):
+    shutil.copy(JOURNAL, tmp_path / JOURNAL)
+    fluxo = FluxoJournal(caminho=str(tmp_path / JOURNAL))
+    threads = set()
+    registros = fluxo.registros
+
+    def registrar_thread(alterados=None):
+        threads.add(threading.current_thread())
+        return registros(alterados)
+
+    monkeypatch.setattr(fluxo, "registros", registrar_thread)
+
+    async def ler():
+        recebidos = []
+        try:
+            async for registro in fluxo.eventos(ObservadorParado()):
+                recebidos.append(registro)
+        except asyncio.CancelledError:
+            pass
+        return recebidos
+
+    assert asyncio.run(ler())
+    assert threading.main_thread() not in threads
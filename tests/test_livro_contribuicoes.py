@@ -0,0 +1,46 @@
+
+from armazenamento import Armazenamento
+from fluxo_journal import FluxoJournal
+from livro_contribuicoes import LivroContribuicoes
+
+JOURNAL = "Journal.2025-05-20T141829.01.log"
+
+
+def ler_com_checkpoint(tmp_path):
+    caminho = str(tmp_path / JOURNAL)
+    armazenamento = Armazenamento(str(tmp_path / "cliente.db"))
+    fluxo = FluxoJournal(caminho=caminho)
+    livro = fluxo.assinar(LivroContribuicoes(enviar=True), "contribuicoes")
+    livro.usar_armazenamento(armazenamento)
+    fluxo.restaurar(armazenamento.checkpoint(caminho))
+    return caminho, armazenamento, fluxo, livro
+
+
+def test_comandante_e_entregas_sobrevivem_ao_reinicio(tmp_path):
+    with open(JOURNAL, encoding="utf-8") as f:
+        linhas = f.readlines()
+    meio = next(i for i, linha in enumerate(linhas) if "ColonisationContribution" in linha) + 1
+    (tmp_path / JOURNAL).write_text("".join(linhas[:meio]), encoding="utf-8")
+
+    caminho, armazenamento, fluxo, livro = ler_com_checkpoint(tmp_path)
+    fluxo.atualizar()
+    armazenamento.salvar_checkpoint(caminho, fluxo.exportar())
+    assert set(livro.por_comandante) == {"Eruel"}
+    assert "eventos" not in fluxo.exportar()["estados"]["contribuicoes"]
+
+    # Reinício no meio da sessão: o resto do journal chega depois do checkpoint
+    with open(tmp_path / JOURNAL, "a", encoding="utf-8") as f:
+        f.writelines(linhas[meio:])
+    caminho, armazenamento, fluxo, livro = ler_com_checkpoint(tmp_path)
+    fluxo.atualizar()
+    assert set(livro.por_comandante) == {"Eruel"}
+    total = sum(livro.por_comandante.values())
+    assert len(armazenamento.contribuicoes()) == len(livro.eventos)
+
+    # Reler o journal inteiro (checkpoint rejeitado) não conta nada duas vezes
+    outro = LivroContribuicoes()
+    outro.usar_armazenamento(armazenamento)
+    fluxo = FluxoJournal(caminho=caminho)
+    fluxo.assinar(outro)
+    fluxo.atualizar()
+    assert sum(outro.por_comandante.values()) == total
@@ -0,0 +1,34 @@
+import threading
+import time
+
+import pytest
+
+from observador_journal import ESPERA_MAXIMA_RAJADA, ObservadorJournal
+
+
+def test_arquivos_do_jogo_nao_seguram_o_aviso(tmp_path):
+    observador = ObservadorJournal(str(tmp_path), debounce=0.2)
+    if not observador.usa_inotify:
+        pytest.skip("inotify indisponível")
+    parar = threading.Event()
+
+    # O jogo reescreve Status.json várias vezes por segundo
+    def status():
+        while not parar.is_set():
+            (tmp_path / "Status.json").write_text("{}")
+            time.sleep(0.02)
+
+    escritor = threading.Thread(target=status)
+    escritor.start()
+    try:
+        journal = tmp_path / "Journal.2025-05-20T141829.01.log"
+        journal.write_text('{"event": "Fileheader"}\n')
+        inicio = time.monotonic()
+        alterados = observador.esperar(timeout=5)
+        duracao = time.monotonic() - inicio
+    finally:
+        parar.set()
+        escritor.join()
+        observador.fechar()
+    assert alterados == {str(journal)}
+    assert duracao < ESPERA_MAXIMA_RAJADA / 2
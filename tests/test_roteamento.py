@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from conftest import esperar
+from discord_falso import ClienteFalso
+from roteamento import Destino, Roteamento, shard_de
+from saida_discord import ProcessosDiscord, SaidaDiscord
+
+ROTAS = {
+    "padrao": {"guild": 1 << 22, "canal": 10},
+    "chaves": {"alfa": {"guild": 2 << 22, "canal": 20}},
+    "depositos": {"111": {"guild": 3 << 22, "canal": 30}},
+}
+
+
+def test_destino_prefere_deposito_depois_chave_depois_padrao():
+    roteamento = Roteamento.carregar(json.dumps(ROTAS))
+    assert roteamento.destino(111, "alfa") == Destino(3 << 22, 30)
+    assert roteamento.destino(222, "alfa") == Destino(2 << 22, 20)
+    assert roteamento.destino(222, "desconhecida") == Destino(1 << 22, 10)
+    assert Roteamento.carregar(json.dumps({"chaves": ROTAS["chaves"]})).destino(222, "beta") is None
+    assert len(roteamento.destinos()) == 3
+
+
+def test_cada_guild_vai_para_a_fila_do_seu_shard():
+    assert shard_de(5 << 22, 4) == 1 and shard_de(5 << 22, 1) == 0
+
+    async def cenario():
+        cliente = ClienteFalso(shard_count=4)
+        saida = SaidaDiscord(cliente, total_shards=4)
+        for guild in range(4):
+            saida.agendar(f"{guild}", Destino(guild << 22, 10 + guild), "texto")
+        return {shard: set(fila.pendentes) for shard, fila in saida.filas.items()}
+
+    assert asyncio.run(cenario()) == {0: {"0"}, 1: {"1"}, 2: {"2"}, 3: {"3"}}
+
+
+def test_cada_shard_tem_um_unico_processo_dono():
+    processos = ProcessosDiscord(2, 5, "falso")
+    assert processos.dono == {0: 0, 1: 1, 2: 0, 3: 1, 4: 0}
+    assert processos._entrada(Destino(3 << 22, 1)) is processos.entradas[1]
+    assert processos._entrada(Destino(4 << 22, 1)) is processos.entradas[0]
+
+
+def test_deposito_sem_canal_nao_quebra_a_publicacao(carregar_servidor):
+    servidor = carregar_servidor(DISCORD_CHANNEL_ID=None)
+    assert servidor.roteamento.padrao is None
+    item = {"market_id": 111, "instalacao": "Depósito", "timestamp": "2025-05-20T17:37:15Z", "completo": True,
+            "materiais": [{"Name": "$steel_name;", "Name_Localised": "Steel", "RequiredAmount": 50,
+                           "ProvidedAmount": 0}]}
+    with TestClient(servidor.app) as http:
+        http.portal.call(servidor.fila_ingestao.put, [item])
+        esperar(lambda: "111" in servidor.rastreio_instalacoes)
+        esperar(lambda: servidor.fila_ingestao.empty())
+        http.portal.call(servidor.verificar_finalizacoes, "111")
+    assert servidor.saida_discord.profundidade == 0
+    assert servidor.client.operacoes["enviar"] == 0
+    assert servidor.armazenamento.depositos()["111"]["destino"] is None
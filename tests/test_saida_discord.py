@@ -0,0 +1,21 @@
+import asyncio
+
+from discord_falso import ClienteFalso
+from roteamento import Destino
+from saida_discord import SaidaDiscord
+
+
+def test_reacao_de_deposito_completo_sai_uma_vez():
+    async def cenario():
+        cliente = ClienteFalso()
+        saida = SaidaDiscord(cliente)
+        saida.iniciar()
+        for i in range(3):
+            saida.agendar("111", Destino(0, 1), f"versão {i}", completo=True)
+            await saida.esvaziar()
+        await saida.finalizar("111", Destino(0, 1), completo=True)
+        return cliente
+
+    cliente = asyncio.run(cenario())
+    assert cliente.operacoes["enviar"] == 1 and cliente.operacoes["editar"] == 2
+    assert cliente.operacoes["reagir"] == 1
@@ -0,0 +1,130 @@
+from fastapi.testclient import TestClient
+
+from conftest import esperar
+
+
+def material(nome, requerido, fornecido):
+    return {"Name": f"${nome}_name;", "Name_Localised": nome.capitalize(), "RequiredAmount": requerido,
+            "ProvidedAmount": fornecido, "Payment": 1000}
+
+
+def delta(market_id, materiais, completo, timestamp="2025-05-20T17:37:15Z"):
+    return {"market_id": market_id, "instalacao": f"Depósito {market_id}", "timestamp": timestamp,
+            "completo": completo, "materiais": materiais}
+
+
+def test_reenvio_vai_na_resposta_de_quem_mandou_o_delta(carregar_servidor):
+    servidor = carregar_servidor()
+    with TestClient(servidor.app) as http:
+        resposta_a = http.post("/logdata/delta", json={"lote": [delta(111, [material("aluminium", 100, 10)], False)]})
+        resposta_b = http.post("/logdata/delta", json={"lote": [delta(222, [material("steel", 50, 0)], True)]})
+        assert resposta_a.status_code == 202
+        assert resposta_a.json()["reenviar"] == [111]
+        assert resposta_b.json()["reenviar"] == []
+        esperar(lambda: "222" in servidor.rastreio_instalacoes)
+        assert "111" not in servidor.rastreio_instalacoes
+
+
+def test_delta_depois_da_leitura_completa_nao_pede_reenvio(carregar_servidor):
+    servidor = carregar_servidor()
+    with TestClient(servidor.app) as http:
+        lote = [delta(111, [material("aluminium", 100, 10)], True),
+                delta(111, [material("aluminium", 100, 30)], False, "2025-05-20T17:40:00Z")]
+        assert http.post("/logdata/delta", json={"lote": lote}).json()["reenviar"] == []
+        resposta = http.post("/logdata/delta", json={"lote": [
+            delta(111, [material("aluminium", 100, 50)], False, "2025-05-20T17:45:00Z")]})
+        assert resposta.json()["reenviar"] == []
+        esperar(lambda: "111" in servidor.rastreio_instalacoes
+                and servidor.rastreio_instalacoes["111"]["deposito"].total_fornecido == 50)
+
+
+def test_leitura_invalida_responde_400(carregar_servidor):
+    servidor = carregar_servidor()
+    with TestClient(servidor.app) as http:
+        invalidos = [
+            {"instalacao": "x", "materiais": [1, 2]},
+            {"instalacao": "x", "materiais": [{"Name": "a", "RequiredAmount": "10", "ProvidedAmount": 0}]},
+            {"instalacao": "x", "market_id": "111", "materiais": [material("aluminium", 100, 10)]},
+        ]
+        for dados in invalidos:
+            assert http.post("/logdata", json=dados).status_code == 400
+            assert http.post("/logdata/delta", json={"lote": [{**dados, "completo": True}]}).status_code == 400
+        assert http.post("/logdata", json={"instalacao": "x", "market_id": 111,
+                                           "materiais": [material("aluminium", 100, 10)]}).status_code == 202
+
+
+def test_leitura_sem_materiais_nao_deixa_deposito_pela_metade(carregar_servidor):
+    servidor = carregar_servidor()
+    with TestClient(servidor.app) as http:
+        assert http.post("/logdata", json={"instalacao": "x", "market_id": 111, "materiais": []}).status_code == 400
+        # Mesmo que chegue aos trabalhadores, uma leitura que não muda nada não cria o depósito
+        http.portal.call(servidor.fila_ingestao.put, [delta(111, [], True)])
+        http.portal.call(servidor.fila_ingestao.put, [delta(222, [material("steel", 50, 0)], True)])
+        esperar(lambda: "222" in servidor.rastreio_instalacoes)
+        assert "111" not in servidor.rastreio_instalacoes
+        assert {"finalizado", "ultima_atualizacao", "nome", "etiqueta"} <= set(servidor.rastreio_instalacoes["222"])
+        servidor.transmissao.retrato()
+
+
+def test_item_com_erro_nao_derruba_o_lote(carregar_servidor, monkeypatch):
+    servidor = carregar_servidor()
+    aplicar = servidor.aplicar_atualizacao
+
+    async def falhar_no_111(market_id, *args, **kwargs):
+        if market_id == 111:
+            raise RuntimeError("falha simulada")
+        return await aplicar(market_id, *args, **kwargs)
+
+    monkeypatch.setattr(servidor, "aplicar_atualizacao", falhar_no_111)
+    with TestClient(servidor.app) as http:
+        lote = [delta(111, [material("aluminium", 100, 10)], True), delta(222, [material("steel", 50, 0)], True)]
+        assert http.post("/logdata/delta", json={"lote": lote}).status_code == 202
+        esperar(lambda: "222" in servidor.rastreio_instalacoes and not servidor.referencias_na_fila)
+        # Sem leitura aplicada nem na fila, o próximo delta do 111 pede reenvio em vez de se perder
+        resposta = http.post("/logdata/delta", json={"lote": [delta(111, [material("aluminium", 100, 20)], False)]})
+        assert resposta.json()["reenviar"] == [111]
+
+
+def test_perfil_so_com_variavel_de_ambiente(carregar_servidor):
+    servidor = carregar_servidor(PERFIL_LOTES=None)
+    with TestClient(servidor.app) as http:
+        assert http.post("/perfil").status_code == 404
+    servidor = carregar_servidor(PERFIL_LOTES="1")
+    with TestClient(servidor.app) as http:
+        assert http.post("/perfil").status_code == 202
+
+
+def test_servidor_ignora_linhas_antigas_dos_bots(carregar_servidor):
+    servidor = carregar_servidor()
+    servidor.armazenamento.salvar_deposito(111, {"nome": "Depósito", "materiais": [material("steel", 50, 0)],
+                                                 "finalizado": False})
+    with TestClient(servidor.app):
+        assert "111" not in servidor.rastreio_instalacoes
+
+
+def test_mudanca_so_nas_fontes_conta_como_mudanca(carregar_servidor):
+    servidor = carregar_servidor()
+    materiais = [material("aluminium", 100, 10)]
+    with TestClient(servidor.app) as http:
+        aplicar = servidor.aplicar_atualizacao
+        assert http.portal.call(aplicar, 111, "Depósito", materiais, "2025-05-20T17:37:15Z", True, []) == "111"
+        assert http.portal.call(aplicar, 111, "Depósito", materiais, "2025-05-20T17:40:00Z", True, []) is None
+        assert http.portal.call(aplicar, 111, "Depósito", materiais, "2025-05-20T17:41:00Z", True,
+                                ["Sol"]) == "111"
+        assert servidor.rastreio_instalacoes["111"]["fontes"] == ["Sol"]
+        assert len(servidor.rastreio_instalacoes["111"]["serie"]) == 1
+
+
+def test_mensagem_cabe_no_limite_do_discord(carregar_servidor):
+    servidor = carregar_servidor()
+    materiais = [material(f"mercadoria{i:02d}", 1000, 10) for i in range(20)]
+    fontes = [{"material": "Aluminium", "estacao": "Estação " + "x" * 60, "sistema": "Sol", "distancia": 1.5,
+               "preco": 300}] * 8
+    lideres = [(f"CMDR {'y' * 30} {i}", 100 - i) for i in range(30)]
+    texto = servidor.formatar_mensagem("Depósito", materiais, "1.0%", fontes=fontes, lideres=lideres)
+    assert len(texto) <= servidor.LIMITE_MENSAGEM
+    assert texto.count("```") == 2
+    assert "🛒 ... e mais" in texto
+    # Sem fontes nem placar demais, nada é cortado
+    curto = servidor.formatar_mensagem("Depósito", materiais[:2], "1.0%", fontes=fontes[:1], lideres=lideres[:2])
+    assert "e mais" not in curto and f"{lideres[1][0]} 99 t" in curto
@@ -0,0 +1,79 @@
+# transmissao.py
+
+import asyncio
+import collections
+import itertools
+import json
+
+CAPACIDADE_TRANSMISSAO = 1024  # eventos guardados para quem está atrasado
+INTERVALO_PING = 15  # segundos sem evento até mandar um ping (mantém a conexão viva)
+
+
+# Buffer de transmissão compartilhado entre todos os espectadores ao vivo
+# (SSE, WebSocket). Cada atualização de depósito é serializada uma vez só
+# e entra num deque com número de sequência; publicar não depende de
+# quantos espectadores existem. Cada espectador só guarda a posição
+# (cursor) em que parou:
+# - atrasado dentro do buffer: recebe só o estado mais recente de cada
+#   depósito pendente, então um espectador lento nunca acumula fila;
+# - atrasado além do buffer (ou recém-conectado): recebe um retrato
+#   completo, montado uma vez por sequência e dividido entre todos.
+#
+# `instantaneo()` devolve a lista com o estado público de cada depósito.
+class Transmissao:
+
+    def __init__(self, instantaneo, capacidade=CAPACIDADE_TRANSMISSAO):
+        self.instantaneo = instantaneo
+        self.eventos = collections.deque(maxlen=capacidade)  # [(seq, chave, texto)]
+        self.seq = 0
+        self.espectadores = 0
+        self._novo = asyncio.Event()
+        self._retrato = (None, None)  # (seq, texto)
+
+    def publicar(self, chave, estado):
+        self.seq += 1
+        self.eventos.append((self.seq, chave, json.dumps({"seq": self.seq, **estado}, ensure_ascii=False)))
+        # Acorda quem está esperando; quem chegar depois espera o próximo
+        novo, self._novo = self._novo, asyncio.Event()
+        novo.set()
+
+    def retrato(self):
+        if self._retrato[0] != self.seq:
+            texto = json.dumps({"seq": self.seq, "depositos": self.instantaneo()}, ensure_ascii=False)
+            self._retrato = (self.seq, texto)
+        return self._retrato
+
+    # Eventos depois de `cursor`; None se alguns já saíram do buffer
+    def _pendentes(self, cursor):
+        if cursor > self.seq:
+            return None  # cursor de antes de o servidor reiniciar
+        if cursor == self.seq:
+            return []
+        primeiro = self.eventos[0][0] if self.eventos else self.seq + 1
+        if cursor < primeiro - 1:
+            return None
+        return list(itertools.islice(self.eventos, cursor - primeiro + 1, None))
+
+    # Gera ("retrato" | "deposito", seq, texto JSON) e ("ping", None, None).
+    # `desde`: último seq recebido numa conexão anterior (Last-Event-ID).
+    async def acompanhar(self, desde=None, intervalo_ping=INTERVALO_PING):
+        self.espectadores += 1
+        try:
+            cursor = desde if desde is not None else -1
+            while True:
+                pendentes = self._pendentes(cursor)
+                if pendentes is None:
+                    cursor, texto = self.retrato()
+                    yield "retrato", cursor, texto
+                elif pendentes:
+                    ultimos = {chave: (seq, texto) for seq, chave, texto in pendentes}
+                    for seq, texto in sorted(ultimos.values()):
+                        yield "deposito", seq, texto
+                    cursor = pendentes[-1][0]
+                else:
+                    try:
+                        await asyncio.wait_for(self._novo.wait(), intervalo_ping)
+                    except asyncio.TimeoutError:
+                        yield "ping", None, None
+        finally:
+            self.espectadores -= 1